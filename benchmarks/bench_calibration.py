@@ -0,0 +1,109 @@
+"""
+Micro-benchmark comparing the list-based calibration interpolation with the
+vectorized NumPy implementation of InterpolationAgent.
+
+Usage:
+    python -m benchmarks.bench_calibration --sizes 25 100 500 2000
+"""
+
+import argparse
+import math
+import random
+import timeit
+from typing import List, Tuple
+
+from src.backend.calibration_agents import InterpolationAgent
+
+
+class ListInterpolationAgent:
+    """
+    Reference copy of the original pure-Python, list-backed interpolation.
+    """
+
+    def __init__(self, position_interpolation_weight: float = 1):
+        self.position_interpolation_weight = position_interpolation_weight
+        self.values = [[] for _ in range(6)]
+
+    def calibration_step(self, *point: float):
+        for values, value in zip(self.values, point):
+            values.append(value)
+
+    def _interpolate(
+        self,
+        position: float,
+        angle: float,
+        calibration_monitor_coordinates: List[float],
+        calibration_head_coordinates: List[float],
+        calibration_angles: List[float],
+    ) -> float:
+        epsilon = 1e-6
+        distances = [
+            math.sqrt(
+                (angle - calib_angle) ** 2
+                + self.position_interpolation_weight * (position - calib_head) ** 2
+            )
+            for calib_angle, calib_head in zip(
+                calibration_angles, calibration_head_coordinates
+            )
+        ]
+        weights = [1 / (d + epsilon) for d in distances]
+        numerator = sum(
+            w * coord for w, coord in zip(weights, calibration_monitor_coordinates)
+        )
+        return numerator / sum(weights)
+
+    def calculate_point_of_regard(
+        self, head_x: float, head_y: float, theta: float, phi: float
+    ) -> Tuple[float, float]:
+        monitor_x, monitor_y, heads_x, heads_y, thetas, phis = self.values
+        return (
+            self._interpolate(head_x, theta, monitor_x, heads_x, thetas),
+            self._interpolate(head_y, phi, monitor_y, heads_y, phis),
+        )
+
+
+def build_agents(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    reference, vectorized = ListInterpolationAgent(), InterpolationAgent()
+    for _ in range(size):
+        point = (
+            rng.uniform(0, 1920),
+            rng.uniform(0, 1080),
+            rng.uniform(200, 400),
+            rng.uniform(150, 300),
+            rng.uniform(-0.5, 0.5),
+            rng.uniform(-0.5, 0.5),
+        )
+        reference.calibration_step(*point)
+        vectorized.calibration_step(*point)
+    return reference, vectorized
+
+
+def time_per_call(fn, repeat: int = 5) -> float:
+    number, _ = timeit.Timer(fn).autorange()
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 100, 500, 2000])
+    args = parser.parse_args()
+
+    query = (300.0, 220.0, 0.05, -0.1)
+    print(f"{'points':>8} {'list (us)':>12} {'numpy (us)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        reference, vectorized = build_agents(size)
+        expected = reference.calculate_point_of_regard(*query)
+        actual = vectorized.calculate_point_of_regard(*query)
+        assert all(math.isclose(e, a, rel_tol=1e-9) for e, a in zip(expected, actual))
+
+        list_time = time_per_call(lambda: reference.calculate_point_of_regard(*query))
+        numpy_time = time_per_call(lambda: vectorized.calculate_point_of_regard(*query))
+        print(
+            f"{size:>8} {list_time * 1e6:>12.1f} {numpy_time * 1e6:>12.1f}"
+            f" {list_time / numpy_time:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
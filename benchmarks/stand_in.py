@@ -0,0 +1,85 @@
+"""
+A deterministic stand-in for the L2CS Pipeline, used when the real weights are absent.
+
+It has the interface GazePredictor relies on and a comparable compute profile: the gaze
+network is a randomly initialized ResNet50 with the two 90-bin L2CS heads, and the
+detector runs a MobileNetV2 feature extractor over the frame before reporting a fixed
+face in the frame center. Timings are representative, predictions are meaningless.
+"""
+
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+import torch
+from l2cs.utils import prep_input_numpy
+from torch import nn
+from torchvision.models import mobilenet_v2, resnet50
+
+from src.backend.inference_backends import logits_to_radians
+
+
+class StandInGazeNet(nn.Module):
+    """A ResNet50 backbone with the pitch and yaw heads of L2CS, over 90 angle bins."""
+
+    def __init__(self, num_bins: int = 90):
+        super().__init__()
+        backbone = resnet50(weights=None)
+        backbone.fc = nn.Identity()
+        self.backbone = backbone
+        self.fc_pitch_gaze = nn.Linear(2048, num_bins)
+        self.fc_yaw_gaze = nn.Linear(2048, num_bins)
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        features = self.backbone(x)
+        return self.fc_pitch_gaze(features), self.fc_yaw_gaze(features)
+
+
+class StandInDetector:
+    """
+    Runs a MobileNetV2 over the frame, then reports one face in the frame center.
+    """
+
+    def __init__(self, input_width: int = 640, face_fraction: float = 0.25):
+        """
+        Initialize the StandInDetector.
+
+        Args:
+            input_width (int): Width frames are resized to before the network.
+            face_fraction (float): Width of the reported face, as a fraction of the frame.
+        """
+        self.input_width = input_width
+        self.face_fraction = face_fraction
+        self.network = mobilenet_v2(weights=None).features.eval()
+
+    def __call__(self, image: np.ndarray) -> List[Tuple[np.ndarray, None, float]]:
+        height, width = image.shape[:2]
+        scale = self.input_width / width
+        resized = cv2.resize(image, (self.input_width, max(int(height * scale), 32)))
+        tensor = torch.from_numpy(resized).permute(2, 0, 1)[None].float() / 255
+        with torch.inference_mode():
+            self.network(tensor)
+
+        size = width * self.face_fraction
+        x_min, y_min = (width - size) / 2, (height - size) / 2
+        box = np.array([x_min, y_min, x_min + size, y_min + size])
+        return [(box, None, 0.99)]
+
+
+class StandInPipeline:
+    """
+    Drop-in replacement for l2cs.Pipeline with seeded random weights.
+    """
+
+    def __init__(self, weights=None, arch: str = "ResNet50", device="cpu", **kwargs):
+        torch.manual_seed(0)
+        self.device = device
+        self.confidence_threshold = 0.5
+        self.model = StandInGazeNet().eval()
+        self.detector = StandInDetector()
+
+    def predict_gaze(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        images = prep_input_numpy(frame, self.device)
+        with torch.inference_mode():
+            pitch, yaw = self.model(images)
+        return logits_to_radians(pitch), logits_to_radians(yaw)
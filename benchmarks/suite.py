@@ -0,0 +1,470 @@
+"""
+End-to-end benchmark suite of the vision tracking service.
+
+Measures frame decoding, face detection, the gaze network forward pass, calibration
+queries for several profile sizes, profile store saves and loads, and full /predict
+requests through the ASGI app. The real L2CS weights are used when present, and a
+deterministic stand-in pipeline with a comparable compute profile otherwise (see
+benchmarks.stand_in). Results hold p50/p95/p99 latencies and throughput as JSON, and
+two result files can be compared to catch regressions.
+
+Usage:
+    python -m benchmarks.suite run --output results.json
+    python -m benchmarks.suite run --only decode calibration --quick
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import torch
+
+from src.app.decoding import decode_image
+from src.backend.calibration_agents import CALIBRATION_AGENTS, create_calibration_agent
+from src.backend.calibration_map import CalibrationMap
+from src.backend.calibration_profile_store import AsyncCalibrationProfileStore
+
+DEFAULT_WEIGHTS = os.path.join("models", "L2CSNet_gaze360.pkl")
+GROUPS = ("decode", "detect", "forward", "calibration", "profile_store", "predict")
+
+# A benchmark is a name, a function to time and the number of items it processes.
+Benchmark = Tuple[str, Callable[[], object], int]
+
+
+@dataclass
+class BenchmarkContext:
+    predictor: object
+    frame: np.ndarray  # A 720p BGR frame.
+    jpeg: bytes  # The frame, JPEG encoded.
+    weights: str
+    backend: str
+    quick: bool
+
+    @property
+    def profile_sizes(self) -> Tuple[int, ...]:
+        return (25, 100) if self.quick else (25, 100, 500, 2000)
+
+    @property
+    def batch_sizes(self) -> Tuple[int, ...]:
+        return (1, 8)
+
+
+def summarize(latencies: List[float], items: int = 1) -> Dict[str, float]:
+    """
+    Summarize the latencies of repeated calls.
+
+    Args:
+        latencies (List[float]): Seconds per call.
+        items (int): Number of items (frames, queries, ...) processed per call.
+
+    Returns:
+        Dict[str, float]: Latency percentiles and mean in milliseconds, and throughput
+        in items per second.
+    """
+    milliseconds = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+    return {
+        "iterations": len(latencies),
+        "items_per_call": items,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(milliseconds.mean()),
+        "throughput": float(items * len(latencies) / np.sum(latencies)),
+    }
+
+
+def measure(
+    fn: Callable[[], object],
+    items: int = 1,
+    min_time: float = 1.0,
+    min_iterations: int = 5,
+    max_iterations: int = 1000,
+    warmup: int = 3,
+) -> Dict[str, float]:
+    """
+    Time repeated calls of a function after a few warm-up calls.
+
+    Calls run until both min_time seconds and min_iterations calls are reached, or
+    max_iterations calls are done.
+    """
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    while len(latencies) < max_iterations and (
+        len(latencies) < min_iterations or time.perf_counter() < deadline
+    ):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, items)
+
+
+def synthetic_frame(width: int = 1280, height: int = 720) -> np.ndarray:
+    """A deterministic frame with smooth gradients and sensor-like noise."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width)[None, :, None]
+    y = np.linspace(0, 255, height)[:, None, None]
+    frame = (x * [0.6, 0.3, 0.1] + y * [0.1, 0.4, 0.5]) + rng.normal(
+        0, 6, (height, width, 3)
+    )
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def calibration_points(size: int) -> np.ndarray:
+    """Calibration points on a screen grid with matching gaze angles, shape (6, n)."""
+    rng = np.random.default_rng(size)
+    monitor = rng.uniform([0, 0], [1920, 1080], (size, 2))
+    head = rng.uniform([200, 150], [400, 300], (size, 2))
+    angles = (monitor - [960, 540]) / [3000, 2500] + rng.normal(0, 0.01, (size, 2))
+    return np.hstack((monitor, head, angles)).T
+
+
+def decode_benchmarks(context: BenchmarkContext) -> Iterator[Benchmark]:
+    yield "decode/jpeg_720p", lambda: decode_image(context.jpeg), 1
+    yield "decode/jpeg_720p_downscale_2", lambda: decode_image(context.jpeg, 2), 1
+
+
+def detect_benchmarks(context: BenchmarkContext) -> Iterator[Benchmark]:
+    yield "detect/720p", lambda: context.predictor._detect_face(context.frame), 1
+
+
+def forward_benchmarks(context: BenchmarkContext) -> Iterator[Benchmark]:
+    rng = np.random.default_rng(0)
+    for batch_size in context.batch_sizes:
+        crop = rng.integers(0, 256, (224, 224, 3), dtype=np.uint8)
+        faces = [(crop, (0, 0, 224, 224))] * batch_size
+        yield (
+            f"forward/batch_{batch_size}",
+            lambda faces=faces: context.predictor._predict_gaze(faces),
+            batch_size,
+        )
+
+
+def calibration_benchmarks(context: BenchmarkContext) -> Iterator[Benchmark]:
+    query = (300.0, 220.0, 0.05, -0.1)
+    for agent_type in CALIBRATION_AGENTS:
+        for size in context.profile_sizes:
+            agent = create_calibration_agent(agent_type)
+            agent.calibration_steps(calibration_points(size))
+            # Lookup tables are built as for a saved or loaded profile. Other derived
+            # state (trees, fits) is built by the warm-up calls.
+            agent.finalize_cal_map()
+            yield (
+                f"calibration/{agent_type}/{size}",
+                lambda agent=agent: agent.calculate_point_of_regard(*query),
+                1,
+            )
+
+
+def profile_store_benchmarks(context: BenchmarkContext) -> Iterator[Benchmark]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        loop = asyncio.new_event_loop()
+        # Without the read-through cache, every call goes to SQLite and the codec.
+        store = AsyncCalibrationProfileStore(
+            f"sqlite+aiosqlite:///{os.path.join(tmpdir, 'bench.db')}", cache_size=0
+        )
+        try:
+            loop.run_until_complete(store.initialize())
+            for size in context.profile_sizes:
+                cal_map = CalibrationMap.from_array(calibration_points(size))
+                name = f"profile_{size}"
+                loop.run_until_complete(store.save_profile(name, cal_map))
+                profile_id = next(
+                    profile["id"]
+                    for profile in loop.run_until_complete(store.list_profiles())
+                    if profile["profile_name"] == name
+                )
+                yield (
+                    f"profile_store/save/{size}",
+                    lambda name=name, cal_map=cal_map: loop.run_until_complete(
+                        store.save_profile(name, cal_map)
+                    ),
+                    1,
+                )
+                yield (
+                    f"profile_store/load/{size}",
+                    lambda profile_id=profile_id: loop.run_until_complete(
+                        store.load_profile(profile_id)
+                    ),
+                    1,
+                )
+        finally:
+            loop.run_until_complete(store.dispose())
+            loop.close()
+
+
+def predict_benchmarks(context: BenchmarkContext) -> Iterator[Benchmark]:
+    from fastapi.testclient import TestClient
+
+    from src.app import routes
+
+    environment = {
+        "MODEL_WEIGHTS": os.path.abspath(context.weights),
+        "GAZE_BACKEND": context.backend,
+        "MODEL_BACKGROUND_LOADING": "0",
+        "MODEL_WARMUP": "1",
+    }
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir, patch.dict(os.environ, environment):
+        # The app creates its profile store database in the working directory.
+        os.chdir(tmpdir)
+        try:
+            with TestClient(routes.app) as client:
+                yield from _predict_benchmarks(client, context)
+        finally:
+            os.chdir(previous_directory)
+
+
+def _predict_benchmarks(client, context: BenchmarkContext) -> Iterator[Benchmark]:
+    # Calibrate from a grid of images named x_<x>_y_<y>.jpg, in one request.
+    files = [
+        ("files", (f"x_{x}_y_{y}.jpg", context.jpeg, "image/jpeg"))
+        for x in range(0, 1920, 384)
+        for y in range(0, 1080, 216)
+    ]
+    client.post("/cal_points", files=files).raise_for_status()
+
+    def predict():
+        response = client.post("/predict", files={"file": ("frame.jpg", context.jpeg)})
+        response.raise_for_status()
+
+    yield "predict/sequential", predict, 1
+
+    concurrency = 8
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        yield (
+            f"predict/concurrent_{concurrency}",
+            lambda: list(pool.map(lambda _: predict(), range(concurrency))),
+            concurrency,
+        )
+
+
+BENCHMARK_GROUPS = {
+    "decode": decode_benchmarks,
+    "detect": detect_benchmarks,
+    "forward": forward_benchmarks,
+    "calibration": calibration_benchmarks,
+    "profile_store": profile_store_benchmarks,
+    "predict": predict_benchmarks,
+}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    groups: List[str],
+    weights: str = DEFAULT_WEIGHTS,
+    backend: str = "eager",
+    stand_in: bool = False,
+    quick: bool = False,
+) -> dict:
+    """
+    Run benchmark groups and collect their results.
+
+    Args:
+        groups (List[str]): Names of the groups to run, keys of BENCHMARK_GROUPS.
+        weights (str): Path to the L2CS weights.
+        backend (str): Inference backend of the gaze network.
+        stand_in (bool): Whether to use the stand-in pipeline even if the weights exist.
+        quick (bool): Fewer profile sizes and shorter timings, e.g. for smoke tests.
+
+    Returns:
+        dict: Run metadata and the summary of each benchmark, keyed by name.
+    """
+    use_stand_in = stand_in or not os.path.exists(weights)
+    with contextlib.ExitStack() as stack:
+        if use_stand_in:
+            from benchmarks.stand_in import StandInPipeline
+
+            stack.enter_context(
+                patch("src.backend.gaze_predictor.Pipeline", StandInPipeline)
+            )
+        # Imported here, as it requires the l2cs package.
+        from src.backend.gaze_predictor import GazePredictor
+
+        frame = synthetic_frame()
+        context = BenchmarkContext(
+            predictor=GazePredictor(weights, backend=backend),
+            frame=frame,
+            jpeg=cv2.imencode(".jpg", frame)[1].tobytes(),
+            weights=weights,
+            backend=backend,
+            quick=quick,
+        )
+
+        results = {}
+        for group in groups:
+            for name, fn, items in BENCHMARK_GROUPS[group](context):
+                results[name] = measure(
+                    fn,
+                    items,
+                    min_time=0.2 if quick else 1.0,
+                    warmup=1 if quick else 3,
+                )
+                print(format_result(name, results[name]), file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "pipeline": "stand-in" if use_stand_in else "l2cs",
+            "backend": backend,
+            "quick": quick,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def format_result(name: str, result: Dict[str, float]) -> str:
+    return (
+        f"{name:<40} p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms"
+        f"  p99 {result['p99_ms']:>9.3f} ms  {result['throughput']:>10.1f}/s"
+    )
+
+
+def compare_runs(
+    baseline: dict, candidate: dict, threshold: float = 0.1, metric: str = "p50_ms"
+) -> List[dict]:
+    """
+    Compare the results of two runs.
+
+    Args:
+        baseline (dict): Results of the reference run, as returned by run_suite.
+        candidate (dict): Results of the run to check.
+        threshold (float): Relative change of the metric beyond which a benchmark is
+            reported as a regression or an improvement.
+        metric (str): Latency metric to compare, e.g. p50_ms or p95_ms.
+
+    Returns:
+        List[dict]: Per benchmark, the metric in both runs, the relative change and a
+        status: ok, regression, improvement, added or removed.
+    """
+    baseline_results, candidate_results = baseline["results"], candidate["results"]
+    rows = []
+    for name in sorted(set(baseline_results) | set(candidate_results)):
+        before = baseline_results.get(name, {}).get(metric)
+        after = candidate_results.get(name, {}).get(metric)
+        row = {"name": name, "baseline": before, "candidate": after, "change": None}
+        if before is None:
+            row["status"] = "added"
+        elif after is None:
+            row["status"] = "removed"
+        else:
+            row["change"] = after / before - 1
+            if row["change"] > threshold:
+                row["status"] = "regression"
+            elif row["change"] < -threshold:
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def run_command(args):
+    groups = args.only or list(GROUPS)
+    results = run_suite(
+        groups,
+        weights=args.weights,
+        backend=args.backend,
+        stand_in=args.stand_in,
+        quick=args.quick,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+def compare_command(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    for key in ("pipeline", "backend", "platform", "cpu_count"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(
+                f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs "
+                f"{candidate['meta'].get(key)}",
+                file=sys.stderr,
+            )
+
+    rows = compare_runs(baseline, candidate, args.threshold, args.metric)
+    print(f"{'benchmark':<40} {'baseline':>10} {'candidate':>10} {'change':>8}  status")
+    for row in rows:
+        before = "-" if row["baseline"] is None else f"{row['baseline']:.3f}"
+        after = "-" if row["candidate"] is None else f"{row['candidate']:.3f}"
+        change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+        print(
+            f"{row['name']:<40} {before:>10} {after:>10} {change:>8}  {row['status']}"
+        )
+    # A non-zero exit status lets CI fail on regressions.
+    return 1 if any(row["status"] == "regression" for row in rows) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("--only", nargs="+", choices=GROUPS)
+    run_parser.add_argument(
+        "--weights", default=os.environ.get("MODEL_WEIGHTS", DEFAULT_WEIGHTS)
+    )
+    run_parser.add_argument("--backend", default="eager")
+    run_parser.add_argument(
+        "--stand-in", action="store_true", help="Use the stand-in pipeline."
+    )
+    run_parser.add_argument("--quick", action="store_true")
+    run_parser.add_argument("--output", help="JSON results file, stdout if omitted.")
+    run_parser.set_defaults(handler=run_command)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two runs.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.add_argument("--metric", default="p50_ms")
+    compare_parser.set_defaults(handler=compare_command)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
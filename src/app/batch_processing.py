@@ -0,0 +1,607 @@
+"""
+Offline gaze estimation over recorded sessions: a video file or a folder of images.
+
+Frames are decoded ahead of inference on background threads into a bounded queue, run
+through the gaze network in batches, and mapped to the screen with the vectorized query
+of the calibration agent. Per-frame results are written to CSV or Parquet, and a
+checkpoint next to the output lets an interrupted run resume where it stopped.
+
+Usage:
+    python -m src.app.batch_processing recording.mp4 gaze.csv --profile alice
+    python -m src.app.batch_processing frames/ gaze.parquet --calibration-dir calibration/
+    python -m src.app.batch_processing recording.mp4 gaze.csv --profile alice --resume
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.app.decoding import decode_image, parse_calibration_filename
+from src.backend.calibration_agents import (
+    CALIBRATION_AGENTS,
+    CalibrationAgent,
+    create_calibration_agent,
+)
+from src.backend.calibration_profile_store import CalibrationProfileStore
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+COLUMNS = (
+    "frame",
+    "name",
+    "timestamp_ms",
+    "face",
+    "head_x",
+    "head_y",
+    "pitch",
+    "yaw",
+    "screen_x",
+    "screen_y",
+)
+
+
+@dataclass
+class FrameRecord:
+    """A frame of a recording, either already decoded or an image file to decode."""
+
+    index: int
+    name: str = ""
+    timestamp_ms: Optional[float] = None
+    frame: Optional[np.ndarray] = None
+    path: Optional[str] = None
+
+
+def list_images(directory: str) -> List[str]:
+    """Return the paths of the images in a directory, sorted by name."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def image_records(paths: List[str], start: int = 0) -> Iterator[FrameRecord]:
+    for index in range(start, len(paths)):
+        yield FrameRecord(index, name=os.path.basename(paths[index]), path=paths[index])
+
+
+def video_records(path: str, start: int = 0) -> Iterator[FrameRecord]:
+    """
+    Read the frames of a video file.
+
+    Args:
+        path (str): The video file.
+        start (int): Index of the first frame to read, e.g. when resuming.
+
+    Yields:
+        FrameRecord: Decoded frames with their timestamp in the video.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video '{path}'.")
+    try:
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC)
+            yield FrameRecord(index, timestamp_ms=timestamp, frame=frame)
+            index += 1
+    finally:
+        capture.release()
+
+
+def load_frame(record: FrameRecord, downscale: int = 1) -> Optional[np.ndarray]:
+    """Decode the frame of a record at 1/downscale resolution, None if undecodable."""
+    if record.path is None:
+        if downscale == 1:
+            return record.frame
+        height, width = record.frame.shape[:2]
+        return cv2.resize(
+            record.frame,
+            (width // downscale, height // downscale),
+            interpolation=cv2.INTER_AREA,
+        )
+    with open(record.path, "rb") as f:
+        return decode_image(f.read(), downscale)
+
+
+_DONE = object()
+
+
+class FramePrefetcher:
+    """
+    Reads frame records on a background thread and decodes them on a thread pool.
+
+    At most `depth` frames are read ahead of the consumer, which bounds memory however
+    long the recording is. Frames are yielded in order.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[FrameRecord],
+        load: Callable[[FrameRecord], Optional[np.ndarray]],
+        depth: int = 64,
+        decode_workers: int = 2,
+    ):
+        """
+        Initialize the FramePrefetcher.
+
+        Args:
+            records (Iterable[FrameRecord]): The frames to read, e.g. video_records.
+            load (Callable): Decodes the frame of a record, run on the thread pool.
+            depth (int): Maximum number of frames read ahead of the consumer.
+            decode_workers (int): Number of decoding threads.
+        """
+        self.records = records
+        self.load = load
+        self._queue = queue.Queue(maxsize=depth)
+        self._executor = ThreadPoolExecutor(
+            max_workers=decode_workers, thread_name_prefix="decode"
+        )
+        self._stopped = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+
+    def __enter__(self) -> "FramePrefetcher":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _put(self, item) -> bool:
+        # Give up when the consumer stopped, instead of blocking on a full queue.
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        records = iter(self.records)
+        try:
+            for record in records:
+                if not self._put((record, self._executor.submit(self.load, record))):
+                    return
+        except Exception as e:
+            self._error = e
+        finally:
+            # Releases the video capture when stopped early, on the thread that used it.
+            if hasattr(records, "close"):
+                records.close()
+            self._put(_DONE)
+
+    def __iter__(self) -> Iterator[Tuple[FrameRecord, Optional[np.ndarray]]]:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                if self._error is not None:
+                    raise self._error
+                return
+            record, future = item
+            yield record, future.result()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class CsvResultWriter:
+    """
+    Appends results to a CSV file. A checkpoint records the file size, and resuming
+    truncates the rows written after it.
+    """
+
+    def __init__(self, path: str, state: Optional[dict] = None):
+        if state is None:
+            self._file = open(path, "w", newline="")
+            csv.writer(self._file).writerow(COLUMNS)
+        else:
+            self._file = open(path, "r+", newline="")
+            self._file.truncate(state["offset"])
+            self._file.seek(state["offset"])
+        self._writer = csv.writer(self._file)
+
+    def write(self, rows: List[tuple]):
+        self._writer.writerows(rows)
+
+    def checkpoint(self) -> dict:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return {"offset": self._file.tell()}
+
+    def finish(self):
+        self._file.close()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """
+    Writes results to Parquet part files, one per checkpoint, merged into the output
+    when the run finishes. Requires pandas with pyarrow or fastparquet.
+    """
+
+    def __init__(self, path: str, state: Optional[dict] = None):
+        # Imported here, as only Parquet output needs the optional engines.
+        import pandas
+
+        self.pandas = pandas
+        self.path = path
+        self.parts_directory = f"{path}.parts"
+        self.parts = list(state["parts"]) if state is not None else []
+        if state is None:
+            shutil.rmtree(self.parts_directory, ignore_errors=True)
+        os.makedirs(self.parts_directory, exist_ok=True)
+        # Parts written after the checkpoint are dropped.
+        for name in set(os.listdir(self.parts_directory)) - set(self.parts):
+            os.remove(os.path.join(self.parts_directory, name))
+        self._rows = []
+
+    def write(self, rows: List[tuple]):
+        self._rows.extend(rows)
+
+    def _frame(self, rows: List[tuple]):
+        frame = self.pandas.DataFrame(rows, columns=COLUMNS)
+        numeric = {column: "float64" for column in COLUMNS[4:]}
+        return frame.astype(
+            {"frame": "int64", "timestamp_ms": "float64", "face": "bool", **numeric}
+        )
+
+    def checkpoint(self) -> dict:
+        if self._rows:
+            name = f"part-{len(self.parts):05d}.parquet"
+            self._frame(self._rows).to_parquet(
+                os.path.join(self.parts_directory, name), index=False
+            )
+            self.parts.append(name)
+            self._rows = []
+        return {"parts": list(self.parts)}
+
+    def finish(self):
+        self.checkpoint()
+        frames = [
+            self.pandas.read_parquet(os.path.join(self.parts_directory, name))
+            for name in self.parts
+        ]
+        results = (
+            self.pandas.concat(frames, ignore_index=True) if frames else self._frame([])
+        )
+        results.to_parquet(self.path, index=False)
+        shutil.rmtree(self.parts_directory)
+
+    def close(self):
+        pass
+
+
+def create_result_writer(path: str, state: Optional[dict] = None):
+    if path.lower().endswith(".parquet"):
+        return ParquetResultWriter(path, state)
+    return CsvResultWriter(path, state)
+
+
+def calibrate_from_directory(
+    cal_agent: CalibrationAgent, gaze_predictor, directory: str, batch_size: int = 8
+) -> int:
+    """
+    Calibrate an agent from a folder of images named like x_<x>_y_<y>.jpg.
+
+    Args:
+        cal_agent (CalibrationAgent): The agent to calibrate.
+        gaze_predictor (GazePredictor): Predicts the gaze vectors of the images.
+        directory (str): The calibration images.
+        batch_size (int): Number of images per forward pass.
+
+    Returns:
+        int: Number of calibration points added, i.e. images with a face.
+    """
+    # Imported here, as the engine requires the l2cs package.
+    from src.backend.vision_tracking_engine import VisionTrackingEngine
+
+    engine = VisionTrackingEngine(gaze_predictor, cal_agent, cps=None)
+    paths = list_images(directory)
+    added = 0
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start : start + batch_size]
+        points = [parse_calibration_filename(path) for path in batch]
+        frames = [cv2.imread(path) for path in batch]
+        added += sum(
+            engine.run_calibration_steps(
+                [(x, y, frame) for (x, y), frame in zip(points, frames)]
+            )
+        )
+    return added
+
+
+def estimate_batch(
+    batch: List[Tuple[FrameRecord, Optional[np.ndarray]]],
+    gaze_predictor,
+    cal_agent: Optional[CalibrationAgent],
+    downscale: int = 1,
+) -> List[tuple]:
+    """
+    Estimate the gaze of a batch of frames.
+
+    Args:
+        batch (List[Tuple[FrameRecord, Optional[np.ndarray]]]): Records and their frames.
+        gaze_predictor (GazePredictor): Predicts the gaze vectors with one forward pass.
+        cal_agent (Optional[CalibrationAgent]): Maps gaze vectors to the screen, the
+            screen coordinates are left empty without one.
+        downscale (int): Factor the frames were shrunk by, undone on the results.
+
+    Returns:
+        List[tuple]: A result row per frame, with the values of COLUMNS.
+    """
+    gaze_vectors = gaze_predictor.predict_gaze_vectors([frame for _, frame in batch])
+    gaze_vectors = np.array(
+        [
+            gaze_predictor.scale_gaze_vector(vector, downscale)
+            for vector in gaze_vectors
+        ],
+        dtype=np.float64,
+    )
+    if cal_agent is not None:
+        points = cal_agent.calculate_points_of_regard(gaze_vectors)
+    else:
+        points = np.full((len(batch), 2), np.nan)
+
+    rows = []
+    for (record, _), gaze_vector, point in zip(batch, gaze_vectors, points):
+        face = not np.isnan(gaze_vector).any()
+        values = [
+            None if np.isnan(value) else float(value)
+            for value in (*gaze_vector, *point)
+        ]
+        rows.append((record.index, record.name, record.timestamp_ms, face, *values))
+    return rows
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def checkpoint_path(output: str) -> str:
+    return f"{output}.checkpoint.json"
+
+
+def write_checkpoint(path: str, checkpoint: dict):
+    # Written to a temporary file first, so a crash never leaves a partial checkpoint.
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+def process_recording(
+    source: str,
+    output: str,
+    gaze_predictor,
+    cal_agent: Optional[CalibrationAgent] = None,
+    settings: Optional[dict] = None,
+    resume: bool = False,
+    batch_size: int = 16,
+    downscale: int = 1,
+    prefetch: int = 64,
+    decode_workers: int = 2,
+    checkpoint_every: int = 1000,
+) -> int:
+    """
+    Estimate the gaze of every frame of a recording and write the results.
+
+    Args:
+        source (str): A video file or a folder of images.
+        output (str): The results file, Parquet if it ends with .parquet, else CSV.
+        gaze_predictor (GazePredictor): Predicts the gaze vectors.
+        cal_agent (Optional[CalibrationAgent]): Maps gaze vectors to the screen.
+        settings (Optional[dict]): Options the results depend on, e.g. the profile.
+            Resuming requires the same settings.
+        resume (bool): Continue from the checkpoint of an interrupted run, if any.
+        batch_size (int): Number of frames per forward pass.
+        downscale (int): Factor frames are shrunk by before inference: 1, 2, 4 or 8.
+        prefetch (int): Maximum number of frames decoded ahead of inference.
+        decode_workers (int): Number of decoding threads.
+        checkpoint_every (int): Number of frames between checkpoints.
+
+    Returns:
+        int: Number of frames processed by this run.
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Cannot find '{source}'.")
+    checkpoint_file = checkpoint_path(output)
+    expected = {
+        "source": os.path.abspath(source),
+        "downscale": downscale,
+        "settings": settings or {},
+    }
+    checkpoint = None
+    if os.path.exists(checkpoint_file):
+        if not resume:
+            raise ValueError(
+                f"Found the checkpoint of an interrupted run ({checkpoint_file}), "
+                "resume it or delete it."
+            )
+        with open(checkpoint_file) as f:
+            checkpoint = json.load(f)
+        if {key: checkpoint.get(key) for key in expected} != expected:
+            raise ValueError(
+                "The checkpoint was written for another source or other settings."
+            )
+    start = checkpoint["next_frame"] if checkpoint else 0
+
+    if os.path.isdir(source):
+        records = image_records(list_images(source), start)
+    else:
+        records = video_records(source, start)
+    writer = create_result_writer(output, checkpoint["writer"] if checkpoint else None)
+
+    processed = 0
+    next_frame = start
+    started = time.perf_counter()
+    finished = False
+    try:
+        with FramePrefetcher(
+            records,
+            lambda record: load_frame(record, downscale),
+            depth=prefetch,
+            decode_workers=decode_workers,
+        ) as prefetcher:
+            since_checkpoint = 0
+            for batch in _batches(prefetcher, batch_size):
+                writer.write(
+                    estimate_batch(batch, gaze_predictor, cal_agent, downscale)
+                )
+                next_frame = batch[-1][0].index + 1
+                processed += len(batch)
+                since_checkpoint += len(batch)
+                if since_checkpoint >= checkpoint_every:
+                    since_checkpoint = 0
+                    write_checkpoint(
+                        checkpoint_file,
+                        {
+                            **expected,
+                            "next_frame": next_frame,
+                            "writer": writer.checkpoint(),
+                        },
+                    )
+                    elapsed = time.perf_counter() - started
+                    print(
+                        f"{next_frame} frames, {processed / elapsed:.1f} frames/s",
+                        file=sys.stderr,
+                    )
+        writer.finish()
+        finished = True
+    finally:
+        if finished:
+            if os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+        elif processed or checkpoint:
+            # Results up to the last complete batch are kept for a resumed run.
+            write_checkpoint(
+                checkpoint_file,
+                {**expected, "next_frame": next_frame, "writer": writer.checkpoint()},
+            )
+        if not finished:
+            writer.close()
+    return processed
+
+
+def load_calibration_agent(args, gaze_predictor) -> Optional[CalibrationAgent]:
+    if args.profile is None and args.profile_id is None and not args.calibration_dir:
+        return None
+    cal_agent = create_calibration_agent(args.agent)
+    if args.calibration_dir:
+        added = calibrate_from_directory(
+            cal_agent, gaze_predictor, args.calibration_dir, args.batch_size
+        )
+        print(f"Calibrated from {added} images.", file=sys.stderr)
+        cal_agent.finalize_cal_map()
+        return cal_agent
+
+    store = CalibrationProfileStore(args.db_url, cache_size=0, read_only=True)
+    try:
+        if args.profile_id is not None:
+            calibration_map = store.load_profile(args.profile_id)
+        else:
+            calibration_map = store.load_profile_by_name(args.profile)
+    finally:
+        store.engine.dispose()
+    if calibration_map is None:
+        raise ValueError("Profile not found.")
+    cal_agent.calibration_map = calibration_map
+    cal_agent.finalize_cal_map()
+    return cal_agent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="Video file or folder of images.")
+    parser.add_argument("output", help="Results file, .csv or .parquet.")
+    profile = parser.add_mutually_exclusive_group()
+    profile.add_argument("--profile", help="Name of a saved calibration profile.")
+    profile.add_argument("--profile-id", type=int, help="ID of a saved profile.")
+    profile.add_argument(
+        "--calibration-dir", help="Folder of calibration images x_<x>_y_<y>.jpg."
+    )
+    parser.add_argument("--db-url", default="sqlite:///calibration.db")
+    parser.add_argument(
+        "--agent",
+        default=os.environ.get("CALIBRATION_AGENT", "interpolation"),
+        choices=sorted(CALIBRATION_AGENTS),
+    )
+    parser.add_argument(
+        "--weights",
+        default=os.environ.get(
+            "MODEL_WEIGHTS", os.path.join("models", "L2CSNet_gaze360.pkl")
+        ),
+    )
+    parser.add_argument("--backend", default=os.environ.get("GAZE_BACKEND", "eager"))
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--downscale", type=int, default=1, choices=(1, 2, 4, 8))
+    parser.add_argument("--prefetch", type=int, default=64)
+    parser.add_argument("--decode-workers", type=int, default=2)
+    parser.add_argument("--checkpoint-every", type=int, default=1000)
+    parser.add_argument(
+        "--resume", action="store_true", help="Continue an interrupted run."
+    )
+    args = parser.parse_args()
+
+    # Imported here, as it requires the l2cs package.
+    from src.backend.gaze_predictor import GazePredictor
+
+    gaze_predictor = GazePredictor(
+        args.weights, backend=args.backend, max_batch_size=args.batch_size
+    )
+    try:
+        cal_agent = load_calibration_agent(args, gaze_predictor)
+        processed = process_recording(
+            args.source,
+            args.output,
+            gaze_predictor,
+            cal_agent,
+            settings={
+                "profile": args.profile,
+                "profile_id": args.profile_id,
+                "calibration_dir": args.calibration_dir,
+                "agent": args.agent,
+            },
+            resume=args.resume,
+            batch_size=args.batch_size,
+            downscale=args.downscale,
+            prefetch=args.prefetch,
+            decode_workers=args.decode_workers,
+            checkpoint_every=args.checkpoint_every,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Processed {processed} frames into {args.output}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
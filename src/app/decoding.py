@@ -0,0 +1,148 @@
+import asyncio
+import io
+import os
+import re
+import zipfile
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+# imdecode flags per downscale factor. Reduced JPEG decodes skip most of the inverse
+# DCT work instead of decoding at full resolution and resizing.
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def decode_image(image_bytes: bytes, downscale: int = 1) -> np.ndarray:
+    """
+    Decode an encoded image (JPEG, PNG, ...) into an OpenCV image.
+
+    Args:
+        image_bytes (bytes): The encoded image.
+        downscale (int): Factor the image is shrunk by while decoding: 1, 2, 4 or 8.
+
+    Returns:
+        np.ndarray: The decoded image in BGR format, or None if it cannot be decoded.
+    """
+    try:
+        flags = DECODE_FLAGS[downscale]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported downscale factor {downscale}, expected one of "
+            f"{sorted(DECODE_FLAGS)}."
+        ) from None
+
+    # Convert bytes to a NumPy array
+    nparr = np.frombuffer(image_bytes, np.uint8)
+
+    # Decode the image array into an OpenCV image (BGR format)
+    return cv2.imdecode(nparr, flags)
+
+
+async def decode_images(
+    images_bytes: List[bytes], downscale: int = 1
+) -> List[np.ndarray]:
+    """
+    Decode several images in parallel on the worker thread pool.
+
+    OpenCV releases the GIL while decoding, so the images are decoded concurrently.
+
+    Args:
+        images_bytes (List[bytes]): The encoded images.
+        downscale (int): Factor the images are shrunk by while decoding: 1, 2, 4 or 8.
+
+    Returns:
+        List[np.ndarray]: The decoded images, in order.
+    """
+    return list(
+        await asyncio.gather(
+            *(
+                run_in_threadpool(decode_image, image_bytes, downscale)
+                for image_bytes in images_bytes
+            )
+        )
+    )
+
+
+RAW_FRAME_CHANNELS = {"bgr": 3, "gray": 1}
+
+
+def decode_raw_frame(
+    frame_bytes: bytes, width: int, height: int, frame_format: str = "bgr"
+) -> np.ndarray:
+    """
+    Wrap a raw, uncompressed frame as an image without copying it.
+
+    Args:
+        frame_bytes (bytes): The raw pixel data, row-major and 8 bits per channel.
+        width (int): Width of the frame in pixels.
+        height (int): Height of the frame in pixels.
+        frame_format (str): Pixel format of the frame, "bgr" or "gray".
+
+    Returns:
+        np.ndarray: A read-only (height, width, channels) view over the bytes.
+    """
+    try:
+        channels = RAW_FRAME_CHANNELS[frame_format.lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported raw frame format '{frame_format}', expected one of "
+            f"{sorted(RAW_FRAME_CHANNELS)}."
+        ) from None
+    expected = width * height * channels
+    if len(frame_bytes) != expected:
+        raise ValueError(
+            f"Raw frame has {len(frame_bytes)} bytes, expected {expected} for a "
+            f"{width}x{height} {frame_format} frame."
+        )
+    return np.frombuffer(frame_bytes, np.uint8).reshape(height, width, channels)
+
+
+def extract_archive(
+    archive_bytes: bytes, max_entries: int = 256, max_size: int = 256 * 1024 * 1024
+) -> List[Tuple[str, bytes]]:
+    """
+    Read the files of a zip archive.
+
+    Args:
+        archive_bytes (bytes): The zip archive.
+        max_entries (int): Maximum number of files in the archive.
+        max_size (int): Maximum total uncompressed size of the files, in bytes.
+
+    Returns:
+        List[Tuple[str, bytes]]: The name and content of each file, in archive order.
+            Directories are skipped.
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(archive_bytes)) as archive:
+            entries = [entry for entry in archive.infolist() if not entry.is_dir()]
+            if len(entries) > max_entries:
+                raise ValueError(
+                    f"Archive has {len(entries)} files, at most {max_entries} allowed."
+                )
+            # The declared sizes are checked before anything is decompressed.
+            if sum(entry.file_size for entry in entries) > max_size:
+                raise ValueError(f"Archive is larger than {max_size} bytes.")
+            return [(entry.filename, archive.read(entry)) for entry in entries]
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {e}") from None
+
+
+# Screen coordinates of calibration images named like x_<x>_y_<y>.jpg
+CALIBRATION_FILENAME = re.compile(r"x_(-?\d+(?:\.\d+)?)_y_(-?\d+(?:\.\d+)?)\.\w+$")
+
+
+def parse_calibration_filename(name: str) -> Tuple[float, float]:
+    match = CALIBRATION_FILENAME.search(os.path.basename(name))
+    if match is None:
+        raise ValueError(
+            f"Cannot read the screen coordinates of '{name}', expected a file named "
+            "like x_<x>_y_<y>.jpg."
+        )
+    return float(match.group(1)), float(match.group(2))
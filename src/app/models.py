@@ -16,3 +16,33 @@ class ProfileListResponse(BaseModel):
 
 class GazePredictionResponse(BaseModel):
     prediction: List[Optional[float]]
+
+
+class FacePrediction(BaseModel):
+    bounding_box: List[float]
+    head: List[float]
+    pitch: float
+    yaw: float
+    confidence: float
+    prediction: List[Optional[float]]
+
+
+class FacesPredictionResponse(BaseModel):
+    faces: List[FacePrediction]
+
+
+class GazeBatchPredictionResponse(BaseModel):
+    predictions: List[List[Optional[float]]]
+
+
+class CalibrationPointResult(BaseModel):
+    name: str
+    x: float
+    y: float
+    added: bool
+    detail: Optional[str] = None
+
+
+class CalibrationPointsResponse(BaseModel):
+    added: int
+    results: List[CalibrationPointResult]
@@ -0,0 +1,44 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class Readiness:
+    """
+    Tracks the startup of the inference stack for readiness probes.
+
+    Startup runs through named stages (e.g. loading, warming_up) whose durations are
+    recorded, and ends either ready or failed.
+    """
+
+    def __init__(self):
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.durations: Dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @contextmanager
+    def stage(self, name: str):
+        """Enter a startup stage and record how long it takes."""
+        self.state = name
+        start = time.perf_counter()
+        yield
+        self.durations[name] = time.perf_counter() - start
+
+    def set_ready(self):
+        self.state = "ready"
+
+    def set_failed(self, error: BaseException):
+        self.state = "failed"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "error": self.error,
+            "durations": dict(self.durations),
+        }
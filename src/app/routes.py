@@ -1,115 +1,867 @@
+import asyncio
+import functools
+import json
 import os
 from contextlib import asynccontextmanager
+from typing import Callable, List, Optional, Tuple
 
-import cv2
 import numpy as np
-from fastapi import FastAPI, File, Form, UploadFile
-
-from src.app.models import GazePredictionResponse, ProfileListResponse
-from src.backend.calibration_agents import InterpolationAgent
-from src.backend.calibration_profile_store import CalibrationProfileStore
-from src.backend.gaze_predictor import GazePredictor
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.app.decoding import (
+    decode_image,
+    decode_images,
+    decode_raw_frame,
+    extract_archive,
+    parse_calibration_filename,
+)
+from src.app.models import (
+    CalibrationPointResult,
+    CalibrationPointsResponse,
+    FacePrediction,
+    FacesPredictionResponse,
+    GazeBatchPredictionResponse,
+    GazePredictionResponse,
+    ProfileListResponse,
+)
+from src.app.readiness import Readiness
+from src.app.streaming import FrameMailbox, StreamItem
+from src.backend.calibration_agents import create_calibration_agent
+from src.backend.calibration_profile_store import AsyncCalibrationProfileStore
+from src.backend.calibration_session_cache import CalibrationSessionCache
+from src.backend.gaze_predictor import FaceTracker, GazePredictor
+from src.backend.inference_pool import InferencePool
+from src.backend.inference_scheduler import InferenceScheduler, QueueFullError
+from src.backend.metrics import (
+    CALIBRATION_SESSIONS,
+    METRICS,
+    MOTION_GATE_SKIP_RATE,
+    QUEUE_DEPTH,
+    READY,
+    STARTUP_STAGE_SECONDS,
+    time_stage,
+)
+from src.backend.motion_gate import MotionGate, MotionGates
+from src.backend.profiling import RequestProfiler
 from src.backend.vision_tracking_engine import VisionTrackingEngine
 
 # Dictionary to hold the VisionTrackingEngine instance
 resources = {}
 
 
+def new_calibration_agent():
+    # The calibration agent is selected by name, see CALIBRATION_AGENTS.
+    return create_calibration_agent(
+        os.environ.get("CALIBRATION_AGENT", "interpolation")
+    )
+
+
+def warmup_batch_sizes() -> Tuple[int, ...]:
+    # Warm up single frames and full batches, unless disabled.
+    if os.environ.get("MODEL_WARMUP", "1") == "0":
+        return ()
+    max_batch_size = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 8))
+    return tuple(sorted({1, max_batch_size}))
+
+
+async def start_inference(
+    readiness: Readiness,
+    vision_engine: VisionTrackingEngine,
+    new_gaze_predictor: Callable[..., GazePredictor],
+):
+    """
+    Load and warm up the gaze model, then start the inference scheduler.
+
+    Progress is tracked by readiness, and inference routes answer 503 until it is ready.
+    """
+    try:
+        with readiness.stage("loading"):
+            gp = await run_in_threadpool(new_gaze_predictor)
+        batch_sizes = warmup_batch_sizes()
+        if batch_sizes:
+            with readiness.stage("warming_up"):
+                await run_in_threadpool(gp.warm_up, batch_sizes)
+        vision_engine.gaze_predictor = gp
+
+        # Optionally run batches on worker processes, each with its own model copy
+        predict_batch = gp.predict_gaze_vectors
+        num_workers = int(os.environ.get("INFERENCE_WORKERS", 0))
+        if num_workers > 0:
+            with readiness.stage("starting_workers"):
+                pool = InferencePool(
+                    functools.partial(
+                        new_gaze_predictor, warmup_batch_sizes=batch_sizes
+                    ),
+                    num_workers=num_workers,
+                    threads_per_worker=int(
+                        os.environ.get("INFERENCE_WORKER_THREADS", 1)
+                    ),
+                    # Without workers left, inference routes answer 503 again
+                    on_failure=readiness.set_failed,
+                )
+                resources["inference_pool"] = pool
+                await run_in_threadpool(pool.start)
+            predict_batch = pool.predict_batch
+        resources["predict_batch"] = predict_batch
+
+        # Micro-batch concurrent inference requests on a dedicated inference thread
+        scheduler = InferenceScheduler(
+            predict_batch,
+            max_batch_size=int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 8)),
+            max_wait=float(os.environ.get("INFERENCE_MAX_WAIT_MS", 5)) / 1000,
+            max_queue_size=int(os.environ.get("INFERENCE_MAX_QUEUE_SIZE", 64)),
+        )
+        await scheduler.start()
+        resources["scheduler"] = scheduler
+        readiness.set_ready()
+    except Exception as e:
+        readiness.set_failed(e)
+        print(f"Inference startup failed: {readiness.error}")
+        raise
+
+
+def collect_metrics():
+    # Gauges read the current state of the app's components at scrape time.
+    readiness = resources.get("readiness")
+    READY.set(int(readiness is not None and readiness.ready))
+    if readiness is not None:
+        for stage, duration in readiness.durations.items():
+            STARTUP_STAGE_SECONDS.set(duration, stage=stage)
+    scheduler = resources.get("scheduler")
+    QUEUE_DEPTH.set(scheduler.queue_depth if scheduler is not None else 0)
+    gates = resources.get("motion_gates")
+    if gates is not None:
+        MOTION_GATE_SKIP_RATE.set(gates.stats()["skip_rate"])
+    vision_engine = resources.get("vision_engine")
+    if vision_engine is not None and vision_engine.sessions is not None:
+        CALIBRATION_SESSIONS.set(vision_engine.sessions.stats()["size"])
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize the VisionTrackingEngine
 
-    ia = InterpolationAgent()
-    cps = CalibrationProfileStore(db_url="sqlite:///calibration.db")
-    gp = GazePredictor(filepath=os.path.join("models", "L2CSNet_gaze360.pkl"))
-    resources["vision_engine"] = VisionTrackingEngine(gp, ia, cps)
+    # Stage latencies and counters are only recorded when metrics are enabled
+    if os.environ.get("METRICS_ENABLED", "0") == "1":
+        METRICS.enable()
+        METRICS.add_collector("app", collect_metrics)
+    else:
+        METRICS.disable()
+
+    ca = new_calibration_agent()
+    cps = AsyncCalibrationProfileStore(
+        db_url="sqlite+aiosqlite:///calibration.db",
+        cache_size=int(os.environ.get("PROFILE_CACHE_SIZE", 128)),
+        cache_ttl=float(os.environ.get("PROFILE_CACHE_TTL", 300)),
+    )
+    await cps.initialize()
+    new_gaze_predictor = functools.partial(
+        GazePredictor,
+        filepath=os.environ.get(
+            "MODEL_WEIGHTS", os.path.join("models", "L2CSNet_gaze360.pkl")
+        ),
+        backend=os.environ.get("GAZE_BACKEND", "eager"),
+        max_batch_size=int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 8)),
+    )
+    # Calibration agents of named sessions, evicted back to the profile store
+    sessions = CalibrationSessionCache(
+        cps,
+        new_calibration_agent,
+        capacity=int(os.environ.get("SESSION_CACHE_SIZE", 128)),
+    )
+    # The gaze predictor is attached once loaded, profile routes work meanwhile
+    vision_engine = VisionTrackingEngine(None, ca, cps, sessions)
+    resources["vision_engine"] = vision_engine
+
+    # Load the model in the background, so the app answers probes while it loads
+    readiness = Readiness()
+    resources["readiness"] = readiness
+    startup = asyncio.create_task(
+        start_inference(readiness, vision_engine, new_gaze_predictor)
+    )
+    if os.environ.get("MODEL_BACKGROUND_LOADING", "1") == "0":
+        await startup
+
+    # Profile 1 in N /predict and /cal_point requests, adjustable through /profiling
+    resources["profiler"] = RequestProfiler(
+        directory=os.environ.get("PROFILING_DIR", "profiles"),
+        sample_every=int(os.environ.get("PROFILING_SAMPLE_EVERY", 0)),
+        mode=os.environ.get("PROFILING_MODE", "cprofile"),
+        max_traces=int(os.environ.get("PROFILING_MAX_TRACES", 20)),
+    )
+
+    # Optionally reuse the last gaze vector of a session for near-identical frames
+    motion_threshold = float(os.environ.get("MOTION_GATE_THRESHOLD", 0))
+    if motion_threshold > 0:
+        resources["motion_gates"] = MotionGates(
+            threshold=motion_threshold,
+            max_skips=int(os.environ.get("MOTION_GATE_MAX_SKIPS", 30)),
+        )
     try:
         yield
     finally:
         # Clean up the VisionTrackingEngine
+        startup.cancel()
+        try:
+            await startup
+        except (asyncio.CancelledError, Exception):
+            pass
+        if "scheduler" in resources:
+            await resources["scheduler"].stop()
+        if "inference_pool" in resources:
+            await run_in_threadpool(resources["inference_pool"].close)
+        await sessions.flush()
+        await cps.dispose()
         resources.clear()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+async def infer_gaze_vector(frame, response: Response, route: str):
+    """
+    Run a frame through the inference scheduler and report its timing.
+
+    The queue and compute times are reported in the Server-Timing header. Frames sampled
+    by the profiler run alone on the inference thread under the profilers instead, and
+    the X-Profile-Trace header names their traces.
+    """
+    scheduler = resources.get("scheduler")
+    profiler = resources.get("profiler")
+    if profiler is not None and profiler.sample():
+        gaze_predictor = resources.get("vision_engine").gaze_predictor
+        gaze_vector, trace = await scheduler.run(
+            profiler.profile_call, route, gaze_predictor.predict_gaze_vector, frame
+        )
+        response.headers["X-Profile-Trace"] = trace
+        return gaze_vector
+    try:
+        gaze_vector, timing = await scheduler.submit(frame)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Inference queue is full.")
+    response.headers["Server-Timing"] = timing.server_timing()
+    return gaze_vector
+
+
+async def infer_gated_gaze_vector(
+    frame, scale: int, response: Response, session_id: Optional[str]
+):
+    """
+    Infer the gaze vector of a frame, scaled back to full resolution, unless the motion
+    gate of the session serves it from its last inferred frame.
+
+    Frames without a session always run inference: those of different clients would
+    otherwise be compared to each other.
+    """
+    gates = resources.get("motion_gates")
+    gate = None
+    if gates is not None and session_id is not None:
+        gate = gates.get(f"session:{session_id}")
+    signature = None
+    if gate is not None:
+        gaze_vector, signature = await run_in_threadpool(gate.lookup, frame)
+        if gaze_vector is not None:
+            response.headers["Server-Timing"] = "motion_gate;desc=cached"
+            return gaze_vector
+
+    gaze_vector = await infer_gaze_vector(frame, response, "predict")
+    gaze_vector = GazePredictor.scale_gaze_vector(gaze_vector, scale)
+    if gate is not None:
+        gate.update(signature, gaze_vector)
+    return gaze_vector
+
+
+def decode_downscale(downscale: Optional[int]) -> int:
+    # Encoded frames are decoded at full resolution unless configured otherwise.
+    if downscale is None:
+        downscale = int(os.environ.get("DECODE_DOWNSCALE", 1))
+    return downscale
+
+
+async def read_frame(
+    request: Request, file: Optional[UploadFile], downscale: int
+) -> Tuple[np.ndarray, int]:
+    """
+    Read the frame of a request, along with the factor it was downscaled by.
+
+    Frames are either an uploaded encoded image, decoded at 1/downscale resolution, or
+    an application/octet-stream body of raw pixels described by the X-Frame-Width,
+    X-Frame-Height and X-Frame-Format ("bgr" or "gray") headers, used without copying.
+    """
+    try:
+        if file is not None:
+            image_bytes = await file.read()
+            with time_stage("decode"):
+                frame = decode_image(image_bytes, downscale)
+            return frame, downscale
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/octet-stream"):
+            body = await request.body()
+            with time_stage("decode"):
+                frame = decode_raw_frame(
+                    body,
+                    int(request.headers["x-frame-width"]),
+                    int(request.headers["x-frame-height"]),
+                    request.headers.get("x-frame-format", "bgr"),
+                )
+            return frame, 1
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Missing header {e}.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    raise HTTPException(
+        status_code=422,
+        detail="Expected an uploaded file or an application/octet-stream body.",
+    )
+
+
 @app.get("/health")
 def health_check():
     return {"status": "OK"}
 
 
+@app.get("/ready")
+def readiness_probe(response: Response):
+    readiness = resources.get("readiness")
+    if not readiness.ready:
+        response.status_code = 503
+    return readiness.status()
+
+
+def require_ready():
+    # Inference routes need the model, which loads in the background at startup.
+    readiness = resources.get("readiness")
+    if readiness is None or not readiness.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="The gaze model is not ready yet.",
+            headers={"Retry-After": "1"},
+        )
+
+
+@app.get("/sessions")
+def calibration_session_stats():
+    vision_engine = resources.get("vision_engine")
+    return vision_engine.sessions.stats()
+
+
+@app.get("/motion_gate")
+def motion_gate_stats():
+    gates = resources.get("motion_gates")
+    if gates is None:
+        return {"enabled": False}
+    return {"enabled": True, **gates.stats()}
+
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format, see src/backend/metrics.py
+    if not METRICS.enabled:
+        raise HTTPException(
+            status_code=404, detail="Metrics are disabled, set METRICS_ENABLED=1."
+        )
+    return PlainTextResponse(
+        METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/profiling")
+def profiling_status():
+    return resources.get("profiler").status()
+
+
+@app.post("/profiling")
+def configure_profiling(
+    sample_every: Optional[int] = None,
+    mode: Optional[str] = None,
+    max_traces: Optional[int] = None,
+):
+    """
+    Change request profiling at runtime, e.g. sample_every=100 to profile 1 in 100
+    /predict and /cal_point requests, or sample_every=0 to stop.
+
+    Only allowed with PROFILING_RUNTIME_CONFIG=1, and max_traces cannot exceed
+    PROFILING_MAX_TRACES, which bounds the disk used by traces.
+    """
+    if os.environ.get("PROFILING_RUNTIME_CONFIG", "0") != "1":
+        raise HTTPException(
+            status_code=403,
+            detail="Profiling changes are disabled, set PROFILING_RUNTIME_CONFIG=1.",
+        )
+    max_traces_limit = int(os.environ.get("PROFILING_MAX_TRACES", 20))
+    if max_traces is not None and max_traces > max_traces_limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"max_traces cannot exceed {max_traces_limit}, the value of "
+            "PROFILING_MAX_TRACES.",
+        )
+    profiler = resources.get("profiler")
+    try:
+        profiler.configure(sample_every, mode, max_traces)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.status()
+
+
+@app.get("/profiling/traces/{name}")
+def download_profiling_trace(name: str):
+    # Only files listed by the profiler are served, never arbitrary paths
+    try:
+        path = resources.get("profiler").trace_path(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Trace not found.")
+    return FileResponse(path, filename=name)
+
+
 @app.post("/save_profile")
-def save_current_profile(name: str):
+async def save_current_profile(name: str, session_id: Optional[str] = None):
     vision_engine = resources.get("vision_engine")
-    vision_engine.save_profile(name)
+    await vision_engine.save_profile(name, session_id)
     return {"message": f"Profile '{name}' saved successfully."}
 
 
 @app.get("/list_profiles")
-def list_calibration_profiles():
+async def list_calibration_profiles():
     vision_engine = resources.get("vision_engine")
-    profiles = vision_engine.list_profiles()
+    profiles = await vision_engine.list_profiles()
     return ProfileListResponse(profiles=profiles)
 
 
 @app.post("/load_profile")
-def load_calibration_profile(profile_id: int):
+async def load_calibration_profile(profile_id: int, session_id: Optional[str] = None):
     vision_engine = resources.get("vision_engine")
-    vision_engine.load_profile(profile_id)
+    if not await vision_engine.load_profile(profile_id, session_id):
+        raise HTTPException(status_code=404, detail="Profile not found.")
     return {"message": "Profile loaded successfully."}
 
 
 @app.post("/delete_profile")
-def delete_calibration_profile(profile_id: int):
+async def delete_calibration_profile(profile_id: int):
     vision_engine = resources.get("vision_engine")
-    vision_engine.delete_profile(profile_id)
+    await vision_engine.delete_profile(profile_id)
     return {"message": "Profile deleted successfully."}
 
 
 @app.post("/reset_profile")
-def reset_calibration_profile():
+async def reset_calibration_profile(session_id: Optional[str] = None):
     vision_engine = resources.get("vision_engine")
-    vision_engine.cal_agent.initialize_cal_map()
+    await vision_engine.reset_profile(session_id)
     return {"message": "Profile reset successfully."}
 
 
-@app.post("/cal_point")
+@app.post("/cal_point", dependencies=[Depends(require_ready)])
 async def add_calibration_point(
-    x: float = Form(...),  # Explicitly define x as a form field
-    y: float = Form(...),  # Explicitly define y as a form field
-    file: UploadFile = File(...),  # Accept the uploaded image
+    request: Request,
+    response: Response,
+    x: Optional[float] = Form(None),  # Explicitly define x as a form field
+    y: Optional[float] = Form(None),  # Explicitly define y as a form field
+    file: Optional[UploadFile] = File(None),  # Accept the uploaded image
+    session_id: Optional[str] = None,
+    downscale: Optional[int] = None,
+    # Raw frames have no form fields, their screen coordinates are query parameters
+    query_x: Optional[float] = Query(None, alias="x"),
+    query_y: Optional[float] = Query(None, alias="y"),
 ):
-    # Read the uploaded file's content as bytes
-    image_bytes = await file.read()
+    x = x if x is not None else query_x
+    y = y if y is not None else query_y
+    if x is None or y is None:
+        raise HTTPException(status_code=422, detail="Missing x or y coordinate.")
 
-    # Convert bytes to a NumPy array
-    nparr = np.frombuffer(image_bytes, np.uint8)
+    # Read the uploaded image or the raw frame (BGR format)
+    frame, scale = await read_frame(request, file, decode_downscale(downscale))
 
-    # Decode the image array into an OpenCV image (BGR format)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    gaze_vector = await infer_gaze_vector(frame, response, "cal_point")
+    gaze_vector = GazePredictor.scale_gaze_vector(gaze_vector, scale)
 
+    # Sessions missing from the cache are loaded from the profile store
     vision_engine = resources.get("vision_engine")
-
-    vision_engine.run_single_calibration_step(x, y, frame)
+    cal_agent = await vision_engine.get_agent(session_id)
+    added = await run_in_threadpool(
+        vision_engine.add_calibration_point, x, y, gaze_vector, cal_agent
+    )
+    if not added:
+        return {"message": "No face detected, calibration point not added."}
     return {
         "message": f"Calibration point added successfully with parameters x: {x}, y: {y}."
     }
 
 
-@app.post("/predict")
-async def predict_point_of_regard(
-    file: UploadFile = File(...),  # Accept the uploaded image
+async def read_calibration_files(
+    files: List[UploadFile],
+) -> List[Tuple[str, bytes]]:
+    """
+    Read uploaded calibration images, expanding zip archives into their images.
+    """
+    entries = []
+    for file in files:
+        content = await file.read()
+        if (file.filename or "").lower().endswith(".zip") or file.content_type in (
+            "application/zip",
+            "application/x-zip-compressed",
+        ):
+            entries.extend(await run_in_threadpool(extract_archive, content))
+        else:
+            entries.append((file.filename or "", content))
+    return entries
+
+
+@app.post("/cal_points", dependencies=[Depends(require_ready)])
+async def add_calibration_points(
+    files: List[UploadFile] = File(...),  # Images, or zip archives of images
+    x: Optional[List[float]] = Form(None),  # Screen coordinates per image, in order
+    y: Optional[List[float]] = Form(None),
+    session_id: Optional[str] = None,
+    downscale: Optional[int] = None,
 ):
-    # Read the uploaded file's content as bytes
-    image_bytes = await file.read()
+    """
+    Add many calibration points in one request.
 
-    # Convert bytes to a NumPy array
-    nparr = np.frombuffer(image_bytes, np.uint8)
+    Screen coordinates are either given as x and y form fields, one per image in upload
+    order, or read from the image names (x_<x>_y_<y>.jpg). Images are decoded in
+    parallel and predicted in batches, then all points with a face are added at once.
+    """
+    try:
+        entries = await read_calibration_files(files)
+        if not entries:
+            raise ValueError("No calibration images.")
+        if x is not None or y is not None:
+            if len(x or []) != len(entries) or len(y or []) != len(entries):
+                raise ValueError(
+                    f"Got {len(entries)} images but {len(x or [])} x and "
+                    f"{len(y or [])} y coordinates."
+                )
+            monitor_points = list(zip(x, y))
+        else:
+            monitor_points = [parse_calibration_filename(name) for name, _ in entries]
+        downscale = decode_downscale(downscale)
+        with time_stage("decode_batch"):
+            frames = await decode_images([content for _, content in entries], downscale)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Split the frames into scheduler-sized batches, so other requests interleave
+    scheduler = resources.get("scheduler")
+    gaze_vectors = []
+    for start in range(0, len(frames), scheduler.max_batch_size):
+        batch = frames[start : start + scheduler.max_batch_size]
+        gaze_vectors.extend(await scheduler.run(resources.get("predict_batch"), batch))
+    gaze_vectors = [
+        GazePredictor.scale_gaze_vector(vector, downscale) for vector in gaze_vectors
+    ]
 
-    # Decode the image array into an OpenCV image (BGR format)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    vision_engine = resources.get("vision_engine")
+    cal_agent = await vision_engine.get_agent(session_id)
+    added = await run_in_threadpool(
+        vision_engine.add_calibration_points, monitor_points, gaze_vectors, cal_agent
+    )
+    results = []
+    for (name, _), (point_x, point_y), frame, point_added in zip(
+        entries, monitor_points, frames, added
+    ):
+        detail = None
+        if frame is None:
+            detail = "Could not decode image."
+        elif not point_added:
+            detail = "No face detected."
+        results.append(
+            CalibrationPointResult(
+                name=name, x=point_x, y=point_y, added=point_added, detail=detail
+            )
+        )
+    return CalibrationPointsResponse(added=sum(added), results=results)
+
+
+@app.post("/predict", dependencies=[Depends(require_ready)])
+async def predict_point_of_regard(
+    request: Request,
+    response: Response,
+    file: Optional[UploadFile] = File(None),  # Accept the uploaded image
+    session_id: Optional[str] = None,
+    downscale: Optional[int] = None,
+):
+    # Read the uploaded image or the raw frame (BGR format)
+    frame, scale = await read_frame(request, file, decode_downscale(downscale))
+
+    gaze_vector = await infer_gated_gaze_vector(frame, scale, response, session_id)
 
+    # Sessions missing from the cache are loaded from the profile store
     vision_engine = resources.get("vision_engine")
-    predictions = vision_engine.predict_gaze_position(frame)
+    cal_agent = await vision_engine.get_agent(session_id)
+    predictions = await run_in_threadpool(
+        vision_engine.estimate_point_of_regard, gaze_vector, cal_agent
+    )
 
     return GazePredictionResponse(prediction=predictions)
+
+
+@app.post("/predict_faces", dependencies=[Depends(require_ready)])
+async def predict_faces_points_of_regard(
+    request: Request,
+    file: Optional[UploadFile] = File(None),  # Accept the uploaded image
+    session_id: Optional[str] = None,
+    downscale: Optional[int] = None,
+    max_faces: Optional[int] = Query(None, ge=1),
+    min_face_size: Optional[float] = Query(None, ge=0),
+):
+    """
+    Predict the point of regard of every face in a frame.
+
+    max_faces keeps the most confident faces only, and min_face_size (in full resolution
+    pixels) ignores small, distant faces, which bounds the gaze network batch.
+    """
+    if max_faces is None and "MAX_FACES" in os.environ:
+        max_faces = int(os.environ["MAX_FACES"])
+    if min_face_size is None:
+        min_face_size = float(os.environ.get("MIN_FACE_SIZE", 0))
+
+    # Read the uploaded image or the raw frame (BGR format)
+    frame, scale = await read_frame(request, file, decode_downscale(downscale))
+
+    # All faces go through the gaze network in one batch, on the inference thread
+    scheduler = resources.get("scheduler")
+    vision_engine = resources.get("vision_engine")
+    faces = await scheduler.run(
+        vision_engine.gaze_predictor.predict_faces,
+        frame,
+        max_faces,
+        min_face_size / scale,
+    )
+    faces = [face.scaled(scale) for face in faces]
+
+    cal_agent = await vision_engine.get_agent(session_id)
+    predictions = await run_in_threadpool(
+        vision_engine.estimate_points_of_regard,
+        [face.gaze_vector for face in faces],
+        cal_agent,
+    )
+    return FacesPredictionResponse(
+        faces=[
+            FacePrediction(
+                bounding_box=list(face.bounding_box),
+                head=[face.head_x, face.head_y],
+                pitch=face.pitch,
+                yaw=face.yaw,
+                confidence=face.confidence,
+                prediction=list(prediction),
+            )
+            for face, prediction in zip(faces, predictions)
+        ]
+    )
+
+
+@app.post("/predict_batch", dependencies=[Depends(require_ready)])
+async def predict_points_of_regard(
+    files: List[UploadFile] = File(...),  # Accept several uploaded images
+    session_id: Optional[str] = None,
+    downscale: Optional[int] = None,
+):
+    # Read all uploaded files, then decode them in parallel
+    images_bytes = [await file.read() for file in files]
+    downscale = decode_downscale(downscale)
+    try:
+        with time_stage("decode_batch"):
+            frames = await decode_images(images_bytes, downscale)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Run the whole batch on the inference thread, next to the scheduled batches
+    scheduler = resources.get("scheduler")
+    vision_engine = resources.get("vision_engine")
+    gaze_vectors = await scheduler.run(resources.get("predict_batch"), frames)
+    gaze_vectors = [
+        GazePredictor.scale_gaze_vector(vector, downscale) for vector in gaze_vectors
+    ]
+    cal_agent = await vision_engine.get_agent(session_id)
+    predictions = await run_in_threadpool(
+        vision_engine.estimate_points_of_regard, gaze_vectors, cal_agent
+    )
+
+    return GazeBatchPredictionResponse(predictions=predictions)
+
+
+async def receive_stream(websocket: WebSocket, mailbox: FrameMailbox):
+    """
+    Read frames and commands from a stream and hand them to its processor.
+    """
+    frame_format = {"format": "encoded"}
+    calibration_point = None
+    sequence = 0
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+        if message.get("text") is not None:
+            try:
+                command = json.loads(message["text"])
+                action = command["action"]
+                if action == "configure":
+                    frame_format = command
+                elif action == "calibrate":
+                    calibration_point = (float(command["x"]), float(command["y"]))
+                elif action == "reset":
+                    mailbox.put(StreamItem(action="reset"))
+                else:
+                    raise ValueError(f"Unknown action '{action}'.")
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+            continue
+
+        sequence += 1
+        item = StreamItem(
+            action="calibrate" if calibration_point else "predict",
+            sequence=sequence,
+            data=message.get("bytes") or b"",
+            frame_format=frame_format,
+            calibration_point=calibration_point,
+        )
+        if calibration_point:
+            # The frame following a calibrate command is a calibration frame.
+            mailbox.put(item)
+            calibration_point = None
+        else:
+            mailbox.put_latest(item)
+
+
+def new_face_tracker() -> Optional[FaceTracker]:
+    # Face tracking on streams is disabled with a redetect interval of 0.
+    redetect_interval = int(os.environ.get("FACE_TRACKING_REDETECT_INTERVAL", 10))
+    if redetect_interval <= 0:
+        return None
+    return FaceTracker(
+        redetect_interval=redetect_interval,
+        margin=float(os.environ.get("FACE_TRACKING_MARGIN", 0.25)),
+    )
+
+
+async def process_stream(
+    websocket: WebSocket,
+    vision_engine: VisionTrackingEngine,
+    mailbox: FrameMailbox,
+    gate: Optional[MotionGate] = None,
+):
+    """
+    Run the work received on a stream and send back the results as they complete.
+
+    A failed item, e.g. an undecodable frame or an inference error, is answered with an
+    error message and the stream goes on.
+    """
+    tracker = new_face_tracker()
+    while True:
+        item = await mailbox.get()
+        try:
+            message = await run_stream_item(item, vision_engine, mailbox, tracker, gate)
+        except Exception as e:
+            message = {"type": "error", "frame": item.sequence, "detail": str(e)}
+        await websocket.send_json(message)
+
+
+async def run_stream_item(
+    item: StreamItem,
+    vision_engine: VisionTrackingEngine,
+    mailbox: FrameMailbox,
+    tracker: Optional[FaceTracker],
+    gate: Optional[MotionGate],
+) -> dict:
+    """Run an item of a stream, and return the message answering it."""
+    if item.action == "reset":
+        vision_engine.cal_agent.initialize_cal_map()
+        return {"type": "reset"}
+
+    scheduler = resources.get("scheduler")
+    frame = await run_in_threadpool(item.decode)
+    if item.action == "calibrate":
+        added = await scheduler.run(
+            vision_engine.run_single_calibration_step,
+            *item.calibration_point,
+            frame,
+            tracker,
+        )
+        return {"type": "calibration", "frame": item.sequence, "added": added}
+
+    prediction = await scheduler.run(
+        vision_engine.predict_gaze_position, frame, tracker, gate
+    )
+    return {
+        "type": "prediction",
+        "frame": item.sequence,
+        "prediction": list(prediction),
+        "dropped": mailbox.dropped,
+    }
+
+
+@app.websocket("/stream")
+async def stream_gaze_predictions(
+    websocket: WebSocket, profile_id: Optional[int] = None
+):
+    """
+    Continuous gaze tracking over a WebSocket.
+
+    Binary messages are frames, encoded (JPEG, PNG, ...) by default. Text messages are
+    JSON commands:
+        {"action": "configure", "format": "raw", "width": w, "height": h,
+         "pixel_format": "bgr" | "gray"}: Following frames are raw pixels.
+        {"action": "configure", "format": "encoded"}: Following frames are encoded.
+        {"action": "calibrate", "x": x, "y": y}: The next frame is a calibration frame.
+        {"action": "reset"}: Reset the calibration of the stream.
+
+    Each connection keeps its own calibration, optionally starting from a saved profile.
+    Prediction frames that arrive while the server is busy replace each other, so only
+    the latest one is processed.
+    """
+    await websocket.accept()
+    readiness = resources.get("readiness")
+    if not readiness.ready:
+        # 1013: try again later
+        await websocket.close(code=1013, reason="The gaze model is not ready yet.")
+        return
+    shared_engine = resources.get("vision_engine")
+    vision_engine = VisionTrackingEngine(
+        shared_engine.gaze_predictor, new_calibration_agent(), shared_engine.cps
+    )
+    if profile_id is not None:
+        await vision_engine.load_profile(profile_id)
+
+    # Each stream has its own motion gate, as frames of different cameras never match
+    gates = resources.get("motion_gates")
+    gate_key = f"stream:{id(websocket)}"
+    gate = gates.get(gate_key) if gates is not None else None
+
+    mailbox = FrameMailbox()
+    processor = asyncio.create_task(
+        process_stream(websocket, vision_engine, mailbox, gate)
+    )
+    receiver = asyncio.create_task(receive_stream(websocket, mailbox))
+    try:
+        done, _ = await asyncio.wait(
+            {receiver, processor}, return_when=asyncio.FIRST_COMPLETED
+        )
+        if processor in done and not receiver.done():
+            # Nothing would answer the frames still being received. 1011: server error
+            try:
+                await websocket.close(code=1011, reason="Stream processing stopped.")
+            except RuntimeError:
+                pass
+    finally:
+        for task in (receiver, processor):
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                pass
+        if gates is not None:
+            gates.remove(gate_key)
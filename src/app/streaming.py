@@ -0,0 +1,75 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.app.decoding import decode_image, decode_raw_frame
+
+
+@dataclass
+class StreamItem:
+    """
+    A unit of work received on a gaze tracking stream.
+    """
+
+    action: str  # "predict", "calibrate" or "reset".
+    sequence: int = 0  # Index of the frame on the stream.
+    data: bytes = b""
+    frame_format: dict = field(default_factory=dict)
+    calibration_point: Optional[Tuple[float, float]] = None
+
+    def decode(self) -> np.ndarray:
+        """
+        Decode the frame according to the format configured on the stream.
+
+        Returns:
+            np.ndarray: The decoded frame, or None if an encoded frame cannot be decoded.
+        """
+        if self.frame_format.get("format", "encoded") == "raw":
+            return decode_raw_frame(
+                self.data,
+                int(self.frame_format["width"]),
+                int(self.frame_format["height"]),
+                self.frame_format.get("pixel_format", "bgr"),
+            )
+        return decode_image(self.data)
+
+
+class FrameMailbox:
+    """
+    Hands work from a stream's receiver to its processor.
+
+    Prediction frames are latest-wins: a new frame replaces one that has not been
+    processed yet, so a slow server drops stale frames instead of queueing them.
+    Calibration frames and commands are never dropped and are processed first, in order.
+    """
+
+    def __init__(self):
+        self._ordered = deque()
+        self._latest = None
+        self._available = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item: StreamItem):
+        """Queue an item that must not be dropped."""
+        self._ordered.append(item)
+        self._available.set()
+
+    def put_latest(self, item: StreamItem):
+        """Offer a prediction frame, replacing any unprocessed one."""
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = item
+        self._available.set()
+
+    async def get(self) -> StreamItem:
+        """Wait for the next item, ordered items first."""
+        while not self._ordered and self._latest is None:
+            self._available.clear()
+            await self._available.wait()
+        if self._ordered:
+            return self._ordered.popleft()
+        item, self._latest = self._latest, None
+        return item
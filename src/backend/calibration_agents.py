@@ -1,8 +1,16 @@
-import math
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from itertools import combinations_with_replacement
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
 
 from src.backend.calibration_map import CalibrationMap
+from src.backend.lookup_table import LookupTable
+
+# Largest number of (query, calibration point) pairs interpolated in one pass.
+QUERY_CHUNK_ELEMENTS = 1 << 20
 
 
 class CalibrationAgent(ABC):
@@ -10,6 +18,9 @@ class CalibrationAgent(ABC):
     Abstract base class for calibration agents.
     """
 
+    # Registry name of the agent, stored in the header of saved profiles.
+    agent_type = None
+
     @abstractmethod
     def calculate_point_of_regard(
         self, head_x: float, head_y: float, theta: float, phi: float
@@ -26,12 +37,56 @@ class CalibrationAgent(ABC):
         """
         pass
 
+    def finalize_cal_map(self):
+        """
+        Prepare any derived state that should be persisted with the calibration map.
+
+        Called before a profile is saved and after one is loaded. Agents without
+        persistent state do nothing.
+        """
+        pass
+
+    def calculate_points_of_regard(self, gaze_vectors: np.ndarray) -> np.ndarray:
+        """
+        Calculate the points of regard of many gaze vectors at once.
+
+        Args:
+            gaze_vectors (np.ndarray): Rows of head_x, head_y, theta and phi, shape
+                (n, 4). Rows holding NaN, e.g. frames without a face, are skipped.
+
+        Returns:
+            np.ndarray: Screen coordinates (x, y) per row, NaN for skipped rows,
+            shape (n, 2).
+        """
+        gaze_vectors = np.asarray(gaze_vectors, dtype=np.float64).reshape(-1, 4)
+        points = np.full((len(gaze_vectors), 2), np.nan)
+        valid = ~np.isnan(gaze_vectors).any(axis=1)
+        if valid.any():
+            points[valid] = self._calculate_points_of_regard(gaze_vectors[valid])
+        return points
+
+    def _calculate_points_of_regard(self, gaze_vectors: np.ndarray) -> np.ndarray:
+        # Agents without a vectorized query answer one gaze vector at a time.
+        return np.array(
+            [
+                self.calculate_point_of_regard(*gaze_vector)
+                for gaze_vector in gaze_vectors
+            ]
+        )
+
 
 class InterpolationAgent(CalibrationAgent):
     """
     An interpolation based implementation of a CalibrationAgent assuming static head position.
+
+    The calibration map is an immutable snapshot: calibration steps publish a new map
+    in a single assignment, serialized by a writer lock, and queries read the map once
+    and compute against that snapshot. Queries therefore run lock-free in parallel with
+    calibration, resets and profile loads.
     """
 
+    agent_type = "interpolation"
+
     def __init__(self, position_interpolation_weight: float = 1):
         """
         Initialize the InterpolationAgent.
@@ -40,8 +95,21 @@ class InterpolationAgent(CalibrationAgent):
         # Defines how much the head position is accounte for during interpolation
         self.position_interpolation_weight = position_interpolation_weight
 
+        # Reentrant, so that writers can publish while holding it
+        self._write_lock = threading.RLock()
         self.initialize_cal_map()
 
+    @property
+    def calibration_map(self) -> CalibrationMap:
+        """The current calibration map snapshot."""
+        return self._calibration_map
+
+    @calibration_map.setter
+    def calibration_map(self, calibration_map: CalibrationMap):
+        # Publishing is a single assignment, readers hold on to the previous snapshot.
+        with self._write_lock:
+            self._calibration_map = calibration_map
+
     def initialize_cal_map(self):
         self.calibration_map = CalibrationMap()
 
@@ -63,17 +131,31 @@ class InterpolationAgent(CalibrationAgent):
             theta (float): Horizontal gaze angle.
             phi (float): Vertical gaze angle.
         """
-        self.calibration_map.add_calibration_point(
-            monitor_x, monitor_y, head_x, head_y, theta, phi
+        self.calibration_steps(
+            np.array([[monitor_x], [monitor_y], [head_x], [head_y], [theta], [phi]])
         )
 
+    def calibration_steps(self, points: np.ndarray):
+        """
+        Add several calibration points at once.
+
+        The points are appended to a new snapshot of the calibration map, published in
+        a single assignment: queries see either none or all of the points.
+
+        Args:
+            points (np.ndarray): Rows of monitor_x, monitor_y, head_x, head_y, theta and
+                phi, shape (6, m).
+        """
+        with self._write_lock:
+            self.calibration_map = self.calibration_map.with_points(points)
+
     def _interpolate(
         self,
         position: float,
         angle: float,
-        calibration_monitor_coordinates: List[float],
-        calibration_head_coordinates: List[float],
-        calibration_angles: List[float],
+        calibration_monitor_coordinates: Sequence[float],
+        calibration_head_coordinates: Sequence[float],
+        calibration_angles: Sequence[float],
     ) -> float:
         """
         Interpolate the screen coordinate based on both head position and gaze angle.
@@ -81,31 +163,60 @@ class InterpolationAgent(CalibrationAgent):
         Args:
             position (float): The current head position.
             angle (float): The current gaze angle.
-            calibration_monitor_coordinates (List[float]): Corresponding screen coordinates.
-            calibration_head_coordinates (List[float]): Corresponding head positions.
-            calibration_angles (List[float]): Corresponding gaze angles.
+            calibration_monitor_coordinates (Sequence[float]): Corresponding screen coordinates.
+            calibration_head_coordinates (Sequence[float]): Corresponding head positions.
+            calibration_angles (Sequence[float]): Corresponding gaze angles.
 
         Returns:
             float: Interpolated screen coordinate.
         """
+        return float(
+            self._interpolate_axes(
+                np.array([position], dtype=np.float64),
+                np.array([angle], dtype=np.float64),
+                np.asarray(calibration_monitor_coordinates, dtype=np.float64)[None],
+                np.asarray(calibration_head_coordinates, dtype=np.float64)[None],
+                np.asarray(calibration_angles, dtype=np.float64)[None],
+            )[0]
+        )
+
+    def _interpolate_axes(
+        self,
+        positions: np.ndarray,
+        angles: np.ndarray,
+        calibration_monitor_coordinates: np.ndarray,
+        calibration_head_coordinates: np.ndarray,
+        calibration_angles: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Interpolate several screen axes at once using inverse distance weighting.
+
+        Args:
+            positions (np.ndarray): Current head position per axis, shape (k,).
+            angles (np.ndarray): Current gaze angle per axis, shape (k,).
+            calibration_monitor_coordinates (np.ndarray): Screen coordinates, shape (k, n).
+            calibration_head_coordinates (np.ndarray): Head positions, shape (k, n).
+            calibration_angles (np.ndarray): Gaze angles, shape (k, n).
+
+        Returns:
+            np.ndarray: Interpolated screen coordinate per axis, shape (k,).
+        """
+        if calibration_monitor_coordinates.shape[-1] == 0:
+            raise ZeroDivisionError("Cannot interpolate without calibration points.")
+
         epsilon = 1e-6
         # Calculate the combined Euclidean distance in the (position, angle) space.
-        distances = [
-            math.sqrt(
-                (angle - calib_angle) ** 2
-                + self.position_interpolation_weight * (position - calib_head) ** 2
-            )
-            for calib_angle, calib_head in zip(
-                calibration_angles, calibration_head_coordinates
-            )
-        ]
+        angle_deltas = calibration_angles - angles[:, None]
+        position_deltas = calibration_head_coordinates - positions[:, None]
+        distances = np.sqrt(
+            angle_deltas * angle_deltas
+            + self.position_interpolation_weight * (position_deltas * position_deltas)
+        )
         # Compute weights inversely proportional to the combined distance.
-        weights = [1 / (d + epsilon) for d in distances]
+        weights = 1 / (distances + epsilon)
         # Weighted sum of monitor coordinates.
-        numerator = sum(
-            w * coord for w, coord in zip(weights, calibration_monitor_coordinates)
-        )
-        return numerator / sum(weights)
+        numerator = np.einsum("ij,ij->i", weights, calibration_monitor_coordinates)
+        return numerator / weights.sum(axis=1)
 
     def calculate_point_of_regard(
         self, head_x: float, head_y: float, theta: float, phi: float
@@ -113,25 +224,568 @@ class InterpolationAgent(CalibrationAgent):
         """
         Calculate the screen coordinates for a given gaze angle.
 
+        Both screen axes are interpolated in a single vectorized pass over the map.
+
+        Args:
+            head_x (float): Horizontal head position.
+            head_y (float): Vertical head position.
+            theta (float): Horizontal gaze angle.
+            phi (float): Vertical gaze angle.
+
+        Returns:
+            Tuple[float, float]: Screen coordinates (x, y).
+        """
+        # float() raises a TypeError for missing (None) gaze vectors.
+        positions = np.array([float(head_x), float(head_y)])
+        angles = np.array([float(theta), float(phi)])
+        cal_map = self.calibration_map
+        x_screen, y_screen = self._interpolate_axes(
+            positions,
+            angles,
+            cal_map.monitor_coordinates,
+            cal_map.head_coordinates,
+            cal_map.angles,
+        )
+        return float(x_screen), float(y_screen)
+
+    def _calculate_points_of_regard(self, gaze_vectors: np.ndarray) -> np.ndarray:
+        cal_map = self.calibration_map
+        points = np.empty((len(gaze_vectors), 2))
+        # Chunks bound the size of the (queries, calibration points) distance matrices.
+        chunk_size = max(1, QUERY_CHUNK_ELEMENTS // max(len(cal_map), 1))
+        for start in range(0, len(gaze_vectors), chunk_size):
+            chunk = gaze_vectors[start : start + chunk_size]
+            shape = (len(chunk), len(cal_map))
+            for axis in range(2):
+                points[start : start + chunk_size, axis] = self._interpolate_axes(
+                    chunk[:, axis],
+                    chunk[:, 2 + axis],
+                    np.broadcast_to(cal_map.monitor_coordinates[axis], shape),
+                    np.broadcast_to(cal_map.head_coordinates[axis], shape),
+                    np.broadcast_to(cal_map.angles[axis], shape),
+                )
+        return points
+
+
+class NearestNeighbourAgent(InterpolationAgent):
+    """
+    An interpolation agent that only weighs the k nearest calibration points.
+
+    A KD-tree is built per screen axis over the (angle, weighted head position) space,
+    so queries are logarithmic in the profile size. The trees are rebuilt lazily on the
+    first query after the calibration map changes.
+    """
+
+    agent_type = "nearest_neighbour"
+
+    def __init__(self, position_interpolation_weight: float = 1, k: int = 8):
+        """
+        Initialize the NearestNeighbourAgent.
+
         Args:
+            position_interpolation_weight (float): How much the head position is accounted for.
+            k (int): Number of nearest calibration points used for interpolation.
+        """
+        if k < 1:
+            raise ValueError("k must be a positive integer.")
+        self.k = k
+        self._index = None
+        super().__init__(position_interpolation_weight)
+
+    def _get_index(
+        self, cal_map: CalibrationMap
+    ) -> Tuple[CalibrationMap, int, Tuple[cKDTree, cKDTree]]:
+        """
+        Return the KD-trees for a calibration map snapshot, rebuilding them if stale.
+
+        Args:
+            cal_map (CalibrationMap): The snapshot the query runs against.
+
+        Returns:
+            Tuple[CalibrationMap, int, Tuple[cKDTree, cKDTree]]: The indexed map, the
+            number of indexed points and one tree per screen axis (x, y).
+        """
+        index = self._index
+        # Calibration maps are immutable snapshots, so identity identifies a state.
+        if index is None or index[0] is not cal_map:
+            scale = np.sqrt(self.position_interpolation_weight)
+            trees = tuple(
+                cKDTree(
+                    np.column_stack(
+                        (cal_map.angles[axis], scale * cal_map.head_coordinates[axis])
+                    )
+                )
+                for axis in range(2)
+            )
+            index = (cal_map, len(cal_map), trees)
+            self._index = index
+        return index
+
+    def calculate_point_of_regard(
+        self, head_x: float, head_y: float, theta: float, phi: float
+    ) -> Tuple[float, float]:
+        """
+        Calculate the screen coordinates from the k nearest calibration points.
+
+        Args:
+            head_x (float): Horizontal head position.
+            head_y (float): Vertical head position.
             theta (float): Horizontal gaze angle.
             phi (float): Vertical gaze angle.
 
         Returns:
             Tuple[float, float]: Screen coordinates (x, y).
         """
-        x_screen = self._interpolate(
-            head_x,
-            theta,
-            self.calibration_map.monitor_x_values,
-            self.calibration_map.head_x_values,
-            self.calibration_map.theta_values,
+        # float() raises a TypeError for missing (None) gaze vectors.
+        positions = (float(head_x), float(head_y))
+        angles = (float(theta), float(phi))
+        cal_map = self.calibration_map
+        if len(cal_map) == 0:
+            raise ZeroDivisionError("Cannot interpolate without calibration points.")
+
+        cal_map, size, trees = self._get_index(cal_map)
+        k = min(self.k, size)
+        scale = np.sqrt(self.position_interpolation_weight)
+        epsilon = 1e-6
+        screen = []
+        for axis, tree in enumerate(trees):
+            distances, indices = tree.query(
+                (angles[axis], scale * positions[axis]), k=k
+            )
+            weights = 1 / (np.atleast_1d(distances) + epsilon)
+            coordinates = cal_map.monitor_coordinates[axis, np.atleast_1d(indices)]
+            screen.append(float(weights @ coordinates / weights.sum()))
+        return screen[0], screen[1]
+
+    def _calculate_points_of_regard(self, gaze_vectors: np.ndarray) -> np.ndarray:
+        cal_map = self.calibration_map
+        if len(cal_map) == 0:
+            raise ZeroDivisionError("Cannot interpolate without calibration points.")
+
+        cal_map, size, trees = self._get_index(cal_map)
+        k = min(self.k, size)
+        scale = np.sqrt(self.position_interpolation_weight)
+        epsilon = 1e-6
+        points = np.empty((len(gaze_vectors), 2))
+        for axis, tree in enumerate(trees):
+            distances, indices = tree.query(
+                np.column_stack(
+                    (gaze_vectors[:, 2 + axis], scale * gaze_vectors[:, axis])
+                ),
+                k=k,
+            )
+            distances = distances.reshape(len(gaze_vectors), k)
+            indices = indices.reshape(len(gaze_vectors), k)
+            weights = 1 / (distances + epsilon)
+            coordinates = cal_map.monitor_coordinates[axis, indices]
+            points[:, axis] = (weights * coordinates).sum(axis=1) / weights.sum(axis=1)
+        return points
+
+
+class LookupTableAgent(InterpolationAgent):
+    """
+    An interpolation agent answering queries from a precomputed lookup grid.
+
+    The grid is filled with InterpolationAgent results and refined until bilinear lookups
+    match exact interpolation within the tolerance, or the maximum resolution is reached.
+    Inverse distance weighting has sharp peaks at the calibration points themselves, so the
+    tolerance applies to a quantile of the validation error rather than its maximum.
+    It is attached to the calibration map so that saved profiles carry it along.
+
+    The table is only built by finalize_cal_map, when a profile is saved or loaded.
+    Until then, e.g. while calibrating, queries are answered by exact interpolation, as
+    are queries outside of the table bounds, where a lookup would clamp to the edges.
+    """
+
+    agent_type = "lookup_table"
+
+    def __init__(
+        self,
+        position_interpolation_weight: float = 1,
+        resolution: int = 64,
+        max_resolution: int = 256,
+        tolerance: float = 2.0,
+        tolerance_quantile: float = 0.95,
+        margin: float = 0.1,
+    ):
+        """
+        Initialize the LookupTableAgent.
+
+        Args:
+            position_interpolation_weight (float): How much the head position is accounted for.
+            resolution (int): Initial number of grid nodes along each dimension.
+            max_resolution (int): Upper bound on the grid resolution during refinement.
+            tolerance (float): Allowed deviation from exact interpolation, in screen units.
+            tolerance_quantile (float): Quantile of the validation errors held to the tolerance.
+            margin (float): Fraction of the calibrated range added around the grid bounds.
+        """
+        if resolution < 2 or max_resolution < resolution:
+            raise ValueError("resolution must be >= 2 and <= max_resolution.")
+        self.resolution = resolution
+        self.max_resolution = max_resolution
+        self.tolerance = tolerance
+        self.tolerance_quantile = tolerance_quantile
+        self.margin = margin
+        super().__init__(position_interpolation_weight)
+
+    @property
+    def build_parameters(self) -> Tuple[float, ...]:
+        return (
+            self.resolution,
+            self.max_resolution,
+            self.tolerance,
+            self.tolerance_quantile,
+            self.margin,
         )
-        y_screen = self._interpolate(
-            head_y,
-            phi,
-            self.calibration_map.monitor_y_values,
-            self.calibration_map.head_y_values,
-            self.calibration_map.phi_values,
+
+    def _is_current(self, table: LookupTable, cal_map: CalibrationMap) -> bool:
+        return (
+            table is not None
+            and table.num_points == len(cal_map)
+            and table.position_interpolation_weight
+            == self.position_interpolation_weight
+            and table.build_parameters == self.build_parameters
+        )
+
+    def _evaluate_grid(
+        self, cal_map: CalibrationMap, positions: np.ndarray, angles: np.ndarray
+    ) -> np.ndarray:
+        """
+        Run exact interpolation over every node of a grid.
+
+        Args:
+            cal_map (CalibrationMap): The calibration map to interpolate from.
+            positions (np.ndarray): Node head positions per axis, shape (2, r).
+            angles (np.ndarray): Node gaze angles per axis, shape (2, r).
+
+        Returns:
+            np.ndarray: Screen coordinates per axis and node, shape (2, r, r).
+        """
+        size = len(cal_map)
+        # Bound the (nodes x points) distance matrix to roughly 4M entries per chunk.
+        chunk = max(1, 4_000_000 // size)
+        values = np.empty((2, positions.shape[1], angles.shape[1]))
+        for axis in range(2):
+            node_positions = np.repeat(positions[axis], angles.shape[1])
+            node_angles = np.tile(angles[axis], positions.shape[1])
+            flat = values[axis].reshape(-1)
+            for start in range(0, flat.size, chunk):
+                stop = min(start + chunk, flat.size)
+                shape = (stop - start, size)
+                flat[start:stop] = self._interpolate_axes(
+                    node_positions[start:stop],
+                    node_angles[start:stop],
+                    np.broadcast_to(cal_map.monitor_coordinates[axis], shape),
+                    np.broadcast_to(cal_map.head_coordinates[axis], shape),
+                    np.broadcast_to(cal_map.angles[axis], shape),
+                )
+        return values
+
+    def _bounds(self, values: np.ndarray) -> np.ndarray:
+        low, high = values.min(axis=1), values.max(axis=1)
+        padding = np.maximum((high - low) * self.margin, 1e-3)
+        return np.column_stack((low - padding, high + padding))
+
+    def build_lookup_table(self, cal_map: CalibrationMap) -> LookupTable:
+        """
+        Build a lookup table for a calibration map.
+
+        Args:
+            cal_map (CalibrationMap): A non-empty calibration map.
+
+        Returns:
+            LookupTable: The refined lookup table.
+        """
+        position_bounds = self._bounds(cal_map.head_coordinates)
+        angle_bounds = self._bounds(cal_map.angles)
+        resolution = self.resolution
+        while True:
+            positions, angles = LookupTable.grid_coordinates(
+                position_bounds, angle_bounds, resolution
+            )
+            table = LookupTable(
+                position_bounds=position_bounds,
+                angle_bounds=angle_bounds,
+                values=self._evaluate_grid(cal_map, positions, angles),
+                num_points=len(cal_map),
+                position_interpolation_weight=self.position_interpolation_weight,
+                max_error=np.inf,
+                quantile_error=np.inf,
+                build_parameters=self.build_parameters,
+            )
+
+            # Validate at the cell centres, where bilinear interpolation is least exact.
+            centre_positions = (positions[:, 1:] + positions[:, :-1]) / 2
+            centre_angles = (angles[:, 1:] + angles[:, :-1]) / 2
+            exact = self._evaluate_grid(cal_map, centre_positions, centre_angles)
+            approx = table.lookup(
+                centre_positions[:, :, None], centre_angles[:, None, :]
+            )
+            errors = np.abs(approx - exact)
+            table.max_error = float(errors.max())
+            table.quantile_error = float(np.quantile(errors, self.tolerance_quantile))
+
+            if (
+                table.quantile_error <= self.tolerance
+                or resolution >= self.max_resolution
+            ):
+                return table
+            resolution = min(2 * resolution - 1, self.max_resolution)
+
+    def _current_lookup_table(self, cal_map: CalibrationMap) -> Optional[LookupTable]:
+        table = cal_map.lookup_table
+        return table if self._is_current(table, cal_map) else None
+
+    def finalize_cal_map(self):
+        """
+        Build the lookup table, unless the map already has one built with the same
+        parameters, so that it is saved with the profile and answers queries.
+        """
+        cal_map = self.calibration_map
+        if len(cal_map) > 0 and self._current_lookup_table(cal_map) is None:
+            # The table only derives from the snapshot's points, attaching it is safe.
+            cal_map.lookup_table = self.build_lookup_table(cal_map)
+
+    def calculate_point_of_regard(
+        self, head_x: float, head_y: float, theta: float, phi: float
+    ) -> Tuple[float, float]:
+        """
+        Calculate the screen coordinates with a bilinear lookup, or by exact
+        interpolation until the lookup table is built or outside of its bounds.
+
+        Args:
+            head_x (float): Horizontal head position.
+            head_y (float): Vertical head position.
+            theta (float): Horizontal gaze angle.
+            phi (float): Vertical gaze angle.
+
+        Returns:
+            Tuple[float, float]: Screen coordinates (x, y).
+        """
+        # float() raises a TypeError for missing (None) gaze vectors.
+        positions = np.array([float(head_x), float(head_y)])
+        angles = np.array([float(theta), float(phi)])
+        cal_map = self.calibration_map
+        if len(cal_map) == 0:
+            raise ZeroDivisionError("Cannot interpolate without calibration points.")
+
+        table = self._current_lookup_table(cal_map)
+        if table is None or not table.contains(positions, angles):
+            return super().calculate_point_of_regard(head_x, head_y, theta, phi)
+        x_screen, y_screen = table.lookup(positions, angles)
+        return float(x_screen), float(y_screen)
+
+    def _calculate_points_of_regard(self, gaze_vectors: np.ndarray) -> np.ndarray:
+        cal_map = self.calibration_map
+        if len(cal_map) == 0:
+            raise ZeroDivisionError("Cannot interpolate without calibration points.")
+
+        table = self._current_lookup_table(cal_map)
+        if table is None:
+            return super()._calculate_points_of_regard(gaze_vectors)
+        positions, angles = gaze_vectors[:, :2].T, gaze_vectors[:, 2:].T
+        inside = table.contains(positions, angles)
+        if inside.all():
+            return table.lookup(positions, angles).T
+        points = np.empty((len(gaze_vectors), 2))
+        points[inside] = table.lookup(positions[:, inside], angles[:, inside]).T
+        points[~inside] = super()._calculate_points_of_regard(gaze_vectors[~inside])
+        return points
+
+
+class RegressionAgent(InterpolationAgent):
+    """
+    A calibration agent fitting a polynomial ridge regression from
+    (head_x, head_y, theta, phi) to (monitor_x, monitor_y).
+
+    The normal equations are accumulated with a rank-one update per calibration step, so
+    adding a point costs the same regardless of profile size. The closed-form solution is
+    recomputed lazily on the next query, after which a prediction is a single dot product.
+    """
+
+    agent_type = "regression"
+
+    def __init__(self, degree: int = 2, ridge: float = 1e-3):
+        """
+        Initialize the RegressionAgent.
+
+        Args:
+            degree (int): Degree of the polynomial features, including cross terms.
+            ridge (float): Ridge penalty applied to the column-normalized features.
+        """
+        if degree < 1:
+            raise ValueError("degree must be a positive integer.")
+        self.degree = degree
+        self.ridge = ridge
+        # Each feature is the product of the inputs at these indices (empty: intercept).
+        self._monomials = [
+            combination
+            for order in range(degree + 1)
+            for combination in combinations_with_replacement(range(4), order)
+        ]
+        self._state = None
+        super().__init__()
+
+    def _features(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Expand inputs into polynomial features.
+
+        Args:
+            inputs (np.ndarray): Rows of (head_x, head_y, theta, phi), shape (m, 4).
+
+        Returns:
+            np.ndarray: Polynomial features, shape (m, p).
+        """
+        features = np.ones((inputs.shape[0], len(self._monomials)))
+        for column, monomial in enumerate(self._monomials):
+            for index in monomial:
+                features[:, column] *= inputs[:, index]
+        return features
+
+    def _fit_map(self, cal_map: CalibrationMap) -> dict:
+        """
+        Accumulate the normal equations for a whole calibration map.
+        """
+        features = self._features(
+            np.vstack((cal_map.head_coordinates, cal_map.angles)).T
         )
-        return x_screen, y_screen
+        return {
+            "map": cal_map,
+            "size": len(cal_map),
+            "gram": features.T @ features,
+            "moments": features.T @ cal_map.monitor_coordinates.T,
+            "weights": None,
+        }
+
+    def _get_state(self, cal_map: CalibrationMap) -> dict:
+        state = self._state
+        # Calibration maps are immutable snapshots, so identity identifies a state.
+        if state is None or state["map"] is not cal_map:
+            state = self._fit_map(cal_map)
+            self._state = state
+        return state
+
+    def calibration_step(
+        self,
+        monitor_x: float,
+        monitor_y: float,
+        head_x: float,
+        head_y: float,
+        theta: float,
+        phi: float,
+    ):
+        """
+        Add a calibration point and update the normal equations with a rank-one update.
+
+        The updated equations are a new state keyed by the new map snapshot, so queries
+        against the previous snapshot keep using the previous state.
+
+        Args:
+            monitor_x (float): X coordinate on the screen.
+            monitor_y (float): Y coordinate on the screen.
+            head_x (float): Horizontal head position.
+            head_y (float): Vertical head position.
+            theta (float): Horizontal gaze angle.
+            phi (float): Vertical gaze angle.
+        """
+        with self._write_lock:
+            cal_map = self.calibration_map
+            state = self._get_state(cal_map)
+            cal_map = cal_map.with_points(
+                np.array([[monitor_x], [monitor_y], [head_x], [head_y], [theta], [phi]])
+            )
+            feature = self._features(
+                np.array([[head_x, head_y, theta, phi]], dtype=float)
+            )
+            self._state = {
+                "map": cal_map,
+                "size": state["size"] + 1,
+                "gram": state["gram"] + feature.T @ feature,
+                "moments": state["moments"]
+                + feature.T @ np.array([[monitor_x, monitor_y]], dtype=float),
+                "weights": None,
+            }
+            self.calibration_map = cal_map
+
+    def _solve(self, state: dict) -> np.ndarray:
+        """
+        Solve the ridge regression on column-normalized features.
+
+        Normalizing by the feature norms keeps the penalty independent of input units.
+        """
+        gram = state["gram"]
+        scale = 1 / np.sqrt(np.maximum(np.diag(gram), 1e-12))
+        normalized = gram * np.outer(scale, scale)
+        normalized[np.diag_indices_from(normalized)] += self.ridge
+        solution = np.linalg.solve(normalized, state["moments"] * scale[:, None])
+        return solution * scale[:, None]
+
+    def calculate_point_of_regard(
+        self, head_x: float, head_y: float, theta: float, phi: float
+    ) -> Tuple[float, float]:
+        """
+        Calculate the screen coordinates from the fitted regression.
+
+        Args:
+            head_x (float): Horizontal head position.
+            head_y (float): Vertical head position.
+            theta (float): Horizontal gaze angle.
+            phi (float): Vertical gaze angle.
+
+        Returns:
+            Tuple[float, float]: Screen coordinates (x, y).
+        """
+        # float() raises a TypeError for missing (None) gaze vectors.
+        inputs = np.array([[float(head_x), float(head_y), float(theta), float(phi)]])
+        x_screen, y_screen = self._features(inputs)[0] @ self._get_weights()
+        return float(x_screen), float(y_screen)
+
+    def _calculate_points_of_regard(self, gaze_vectors: np.ndarray) -> np.ndarray:
+        return self._features(gaze_vectors) @ self._get_weights()
+
+    def _get_weights(self) -> np.ndarray:
+        """Return the regression weights of the current calibration map."""
+        state = self._get_state(self.calibration_map)
+        if state["size"] == 0:
+            raise ZeroDivisionError(
+                "Cannot fit a regression without calibration points."
+            )
+
+        weights = state["weights"]
+        if weights is None:
+            # Solving the same state twice gives the same weights, racing is harmless.
+            weights = self._solve(state)
+            state["weights"] = weights
+        return weights
+
+
+CALIBRATION_AGENTS = {
+    agent_class.agent_type: agent_class
+    for agent_class in (
+        InterpolationAgent,
+        NearestNeighbourAgent,
+        LookupTableAgent,
+        RegressionAgent,
+    )
+}
+
+
+def create_calibration_agent(name: str, **kwargs) -> CalibrationAgent:
+    """
+    Create a calibration agent by name.
+
+    Args:
+        name (str): One of the keys of CALIBRATION_AGENTS.
+        **kwargs: Keyword arguments forwarded to the agent constructor.
+
+    Returns:
+        CalibrationAgent: The new calibration agent.
+    """
+    try:
+        agent_class = CALIBRATION_AGENTS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown calibration agent '{name}', expected one of "
+            f"{sorted(CALIBRATION_AGENTS)}."
+        ) from None
+    return agent_class(**kwargs)
@@ -1,19 +1,196 @@
-from dataclasses import dataclass, field
-from typing import List
+import threading
+
+import numpy as np
+
+# Row layout of the calibration point buffer.
+MONITOR_X, MONITOR_Y, HEAD_X, HEAD_Y, THETA, PHI = range(6)
+NUM_FIELDS = 6
+
+_LEGACY_FIELDS = (
+    "monitor_x_values",
+    "monitor_y_values",
+    "head_x_values",
+    "head_y_values",
+    "theta_values",
+    "phi_values",
+)
+
+# Serializes claims on the free tail of shared buffers, see CalibrationMap.with_points.
+_claim_lock = threading.Lock()
 
 
-@dataclass
 class CalibrationMap:
     """
-    A data class to store calibration points.
+    An array-backed store of calibration points.
+
+    Points are kept in a single contiguous (6, capacity) buffer so that each field
+    is a contiguous row, and the buffer grows geometrically to amortize appends.
+
+    Maps shared with readers are treated as immutable snapshots: with_points returns a
+    new map instead of changing this one, and the field views are read-only. A new map
+    reuses the free tail of the buffer when no other map claimed it, so extending the
+    latest snapshot stays amortized O(1) while older snapshots never see the change.
     """
 
-    monitor_x_values: List[float] = field(default_factory=list)
-    monitor_y_values: List[float] = field(default_factory=list)
-    head_x_values: List[float] = field(default_factory=list)
-    head_y_values: List[float] = field(default_factory=list)
-    theta_values: List[float] = field(default_factory=list)
-    phi_values: List[float] = field(default_factory=list)
+    def __init__(self, initial_capacity: int = 16, dtype: np.dtype = np.float64):
+        """
+        Initialize an empty CalibrationMap.
+
+        Args:
+            initial_capacity (int): Number of points to preallocate.
+            dtype (np.dtype): Floating point type of the buffer (float64 or float32).
+        """
+        self._data = np.empty((NUM_FIELDS, max(initial_capacity, 1)), dtype=dtype)
+        self._size = 0
+        # Number of buffer columns claimed by the maps sharing the buffer.
+        self._claimed = [0]
+        # Optional precomputed LookupTable persisted alongside the points.
+        self.lookup_table = None
+
+    @classmethod
+    def from_array(cls, points: np.ndarray, copy: bool = True) -> "CalibrationMap":
+        """
+        Build a CalibrationMap from a (6, n) array of calibration points.
+
+        Args:
+            points (np.ndarray): Rows ordered as monitor_x, monitor_y, head_x, head_y, theta, phi.
+            copy (bool): Whether to copy the points. Otherwise the map wraps the array
+                itself, which may be read-only: it is full, so the first added point
+                moves the map to a new buffer.
+
+        Returns:
+            CalibrationMap: A map holding the points.
+        """
+        points = np.asarray(points)
+        if points.ndim != 2 or points.shape[0] != NUM_FIELDS:
+            raise ValueError(
+                f"Expected an array of shape ({NUM_FIELDS}, n), got {points.shape}."
+            )
+        dtype = points.dtype if points.dtype in (np.float32, np.float64) else np.float64
+        if not copy and points.dtype == dtype:
+            cal_map = cls(initial_capacity=0, dtype=dtype)
+            cal_map._data = points
+            cal_map._size = points.shape[1]
+            cal_map._claimed = [points.shape[1]]
+            return cal_map
+        cal_map = cls(initial_capacity=points.shape[1], dtype=dtype)
+        cal_map._data[:, : points.shape[1]] = points
+        cal_map._size = cal_map._claimed[0] = points.shape[1]
+        return cal_map
+
+    def with_points(self, points: np.ndarray) -> "CalibrationMap":
+        """
+        Return a new map holding the points of this map followed by more points.
+
+        Args:
+            points (np.ndarray): Points to append, shape (6, m), rows ordered as in
+                from_array.
+
+        Returns:
+            CalibrationMap: The new map. This map is left unchanged.
+        """
+        points = np.asarray(points)
+        if points.ndim != 2 or points.shape[0] != NUM_FIELDS:
+            raise ValueError(
+                f"Expected an array of shape ({NUM_FIELDS}, m), got {points.shape}."
+            )
+        cal_map = CalibrationMap.__new__(CalibrationMap)
+        cal_map._data, cal_map._size, cal_map._claimed = (
+            self._data,
+            self._size,
+            self._claimed,
+        )
+        cal_map.lookup_table = None
+        cal_map._append(points)
+        return cal_map
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CalibrationMap):
+            return NotImplemented
+        return np.array_equal(self.points, other.points)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    def _view(self, rows) -> np.ndarray:
+        view = self._data[rows, : self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def points(self) -> np.ndarray:
+        """A read-only (6, n) view over the stored calibration points."""
+        return self._view(slice(None))
+
+    @property
+    def monitor_coordinates(self) -> np.ndarray:
+        """A read-only (2, n) view over the monitor x and y coordinates."""
+        return self._view(slice(MONITOR_X, MONITOR_Y + 1))
+
+    @property
+    def head_coordinates(self) -> np.ndarray:
+        """A read-only (2, n) view over the head x and y positions."""
+        return self._view(slice(HEAD_X, HEAD_Y + 1))
+
+    @property
+    def angles(self) -> np.ndarray:
+        """A read-only (2, n) view over the theta and phi gaze angles."""
+        return self._view(slice(THETA, PHI + 1))
+
+    @property
+    def monitor_x_values(self) -> np.ndarray:
+        return self._view(MONITOR_X)
+
+    @property
+    def monitor_y_values(self) -> np.ndarray:
+        return self._view(MONITOR_Y)
+
+    @property
+    def head_x_values(self) -> np.ndarray:
+        return self._view(HEAD_X)
+
+    @property
+    def head_y_values(self) -> np.ndarray:
+        return self._view(HEAD_Y)
+
+    @property
+    def theta_values(self) -> np.ndarray:
+        return self._view(THETA)
+
+    @property
+    def phi_values(self) -> np.ndarray:
+        return self._view(PHI)
+
+    def _claim(self, count: int) -> bool:
+        """Claim the buffer columns following this map's points, unless already taken."""
+        with _claim_lock:
+            if (
+                self._claimed[0] != self._size
+                or self._size + count > self._data.shape[1]
+                or not self._data.flags.writeable
+            ):
+                return False
+            self._claimed[0] += count
+            return True
+
+    def _append(self, points: np.ndarray):
+        """
+        Append points in place, moving to a new buffer if the tail is not free.
+
+        Only for maps no reader holds yet, like those being built by with_points.
+        """
+        count = points.shape[1]
+        if not self._claim(count):
+            capacity = max(self._size + count, 2 * self._data.shape[1])
+            data = np.empty((NUM_FIELDS, capacity), dtype=self._data.dtype)
+            data[:, : self._size] = self._data[:, : self._size]
+            self._data, self._claimed = data, [self._size + count]
+        self._data[:, self._size : self._size + count] = points
+        self._size += count
 
     def add_calibration_point(
         self,
@@ -25,17 +202,46 @@ class CalibrationMap:
         phi_value: float,
     ):
         """
-        Add a calibration point to the map.
+        Add a calibration point to the map in place.
+
+        Only for maps no reader holds yet, shared maps are extended with with_points.
 
         Args:
-            x_value (float): X coordinate of the screen.
-            y_value (float): Y coordinate of the screen.
+            monitor_x_value (float): X coordinate of the screen.
+            monitor_y_value (float): Y coordinate of the screen.
+            head_x_value (float): X position of the head in the image.
+            head_y_value (float): Y position of the head in the image.
             theta_value (float): Gaze angle in horizontal direction.
             phi_value (float): Gaze angle in vertical direction.
         """
-        self.monitor_x_values.append(monitor_x_value)
-        self.monitor_y_values.append(monitor_y_value)
-        self.head_x_values.append(head_x_value)
-        self.head_y_values.append(head_y_value)
-        self.theta_values.append(theta_value)
-        self.phi_values.append(phi_value)
+        self._append(
+            np.array(
+                [
+                    [monitor_x_value],
+                    [monitor_y_value],
+                    [head_x_value],
+                    [head_y_value],
+                    [theta_value],
+                    [phi_value],
+                ]
+            )
+        )
+
+    def __getstate__(self) -> dict:
+        return {"points": self.points.copy(), "lookup_table": self.lookup_table}
+
+    def __setstate__(self, state: dict):
+        if "points" in state:
+            points = state["points"]
+        else:
+            # Profiles pickled before the map was array-backed hold six lists.
+            points = np.array(
+                [state.get(name, []) for name in _LEGACY_FIELDS], dtype=np.float64
+            ).reshape(NUM_FIELDS, -1)
+        restored = CalibrationMap.from_array(points)
+        self._data, self._size = restored._data, restored._size
+        self._claimed = restored._claimed
+        self.lookup_table = state.get("lookup_table")
+
+    def __repr__(self) -> str:
+        return f"CalibrationMap(size={self._size}, dtype={self._data.dtype})"
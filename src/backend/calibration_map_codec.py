@@ -0,0 +1,203 @@
+"""
+Compact, versioned binary encoding of calibration maps.
+
+Layout (little-endian):
+
+    header      magic "GZCM" | version u16 | dtype code u8 | flags u8 | point count u32
+                | agent type length u16 | agent type (utf-8) | zero padding to 8 bytes
+    points      (6, n) array of the header dtype, one contiguous row per field
+    lookup      only when FLAG_LOOKUP_TABLE is set:
+                resolution u32 | num points u32 | padding u64
+                | position weight, max error, quantile error f64
+                | build parameters (5,) f64, NaN when unknown (version 2 and up)
+                | position bounds (2, 2) f64 | angle bounds (2, 2) f64
+                | values (2, resolution, resolution) f64
+
+Every array starts on an 8 byte boundary, so decoding wraps the buffer with
+np.frombuffer instead of copying it.
+"""
+
+import pickle
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.backend.calibration_map import NUM_FIELDS, CalibrationMap
+from src.backend.lookup_table import LookupTable
+
+MAGIC = b"GZCM"
+VERSION = 2
+FLAG_LOOKUP_TABLE = 1
+
+_HEADER = struct.Struct("<4sHBBIH")
+_LOOKUP_HEADER = struct.Struct("<IIQ")
+_DTYPE_CODES = {np.dtype("<f4"): 1, np.dtype("<f8"): 2}
+_CODE_DTYPES = {code: dtype for dtype, code in _DTYPE_CODES.items()}
+# Number of lookup table build parameters, see LookupTableAgent.build_parameters.
+_NUM_BUILD_PARAMETERS = 5
+
+
+@dataclass
+class CalibrationMapHeader:
+    """
+    The header of an encoded calibration map.
+    """
+
+    version: int
+    dtype: np.dtype
+    flags: int
+    num_points: int
+    agent_type: Optional[str]
+    data_offset: int  # Byte offset of the points.
+
+
+def _padding(offset: int) -> int:
+    return -offset % 8
+
+
+def is_encoded(blob: bytes) -> bool:
+    """Return whether a blob holds an encoded calibration map (rather than a pickle)."""
+    return bytes(blob[: len(MAGIC)]) == MAGIC
+
+
+def encode_calibration_map(
+    calibration_map: CalibrationMap, agent_type: Optional[str] = None
+) -> bytes:
+    """
+    Encode a calibration map, and its lookup table if any.
+
+    Args:
+        calibration_map (CalibrationMap): The calibration map to encode.
+        agent_type (Optional[str]): Name of the calibration agent the map was built with.
+
+    Returns:
+        bytes: The encoded calibration map.
+    """
+    points = calibration_map.points
+    dtype = points.dtype.newbyteorder("<")
+    agent_bytes = (agent_type or "").encode("utf-8")
+    table = calibration_map.lookup_table
+    flags = FLAG_LOOKUP_TABLE if table is not None else 0
+
+    header = _HEADER.pack(
+        MAGIC, VERSION, _DTYPE_CODES[dtype], flags, points.shape[1], len(agent_bytes)
+    )
+    header += agent_bytes
+    parts = [header, bytes(_padding(len(header))), points.astype(dtype).tobytes()]
+    parts.append(bytes(_padding(points.nbytes)))
+
+    if table is not None:
+        parts.append(_LOOKUP_HEADER.pack(table.resolution, table.num_points, 0))
+        scalars = [
+            table.position_interpolation_weight,
+            table.max_error,
+            table.quantile_error,
+            *(table.build_parameters or [np.nan] * _NUM_BUILD_PARAMETERS),
+        ]
+        for array in (scalars, table.position_bounds, table.angle_bounds, table.values):
+            parts.append(np.asarray(array, dtype="<f8").tobytes())
+    return b"".join(parts)
+
+
+def read_header(blob: bytes) -> CalibrationMapHeader:
+    """
+    Read the header of an encoded calibration map.
+
+    Args:
+        blob (bytes): The encoded calibration map.
+
+    Returns:
+        CalibrationMapHeader: The decoded header.
+    """
+    if not is_encoded(blob):
+        raise ValueError("Not an encoded calibration map.")
+    _, version, dtype_code, flags, num_points, agent_length = _HEADER.unpack_from(blob)
+    if version > VERSION:
+        raise ValueError(f"Unsupported calibration map version {version}.")
+    offset = _HEADER.size
+    agent_type = bytes(blob[offset : offset + agent_length]).decode("utf-8") or None
+    offset += agent_length
+    return CalibrationMapHeader(
+        version=version,
+        dtype=_CODE_DTYPES[dtype_code],
+        flags=flags,
+        num_points=num_points,
+        agent_type=agent_type,
+        data_offset=offset + _padding(offset),
+    )
+
+
+def _decode_lookup_table(blob: bytes, offset: int, version: int) -> LookupTable:
+    resolution, num_points, _ = _LOOKUP_HEADER.unpack_from(blob, offset)
+    offset += _LOOKUP_HEADER.size
+
+    def take(shape: Tuple[int, ...]) -> np.ndarray:
+        nonlocal offset
+        count = int(np.prod(shape))
+        array = np.frombuffer(blob, dtype="<f8", count=count, offset=offset)
+        offset += count * 8
+        return array.reshape(shape)
+
+    weight, max_error, quantile_error = take((3,))
+    build_parameters = None
+    if version >= 2:
+        parameters = take((_NUM_BUILD_PARAMETERS,))
+        if not np.isnan(parameters).any():
+            build_parameters = tuple(float(value) for value in parameters)
+    return LookupTable(
+        position_bounds=take((2, 2)),
+        angle_bounds=take((2, 2)),
+        values=take((2, resolution, resolution)),
+        num_points=num_points,
+        position_interpolation_weight=float(weight),
+        max_error=float(max_error),
+        quantile_error=float(quantile_error),
+        build_parameters=build_parameters,
+    )
+
+
+def decode_calibration_map(blob: bytes) -> CalibrationMap:
+    """
+    Decode a calibration map without copying its arrays.
+
+    The points and lookup table are read-only views over the blob. Adding a point to
+    the decoded map moves its points to a new, writable buffer.
+
+    Args:
+        blob (bytes): The encoded calibration map.
+
+    Returns:
+        CalibrationMap: The decoded calibration map.
+    """
+    header = read_header(blob)
+    count = NUM_FIELDS * header.num_points
+    points = np.frombuffer(
+        blob, dtype=header.dtype, count=count, offset=header.data_offset
+    ).reshape(NUM_FIELDS, header.num_points)
+    calibration_map = CalibrationMap.from_array(points, copy=False)
+
+    if header.flags & FLAG_LOOKUP_TABLE:
+        offset = header.data_offset + points.nbytes
+        offset += _padding(offset)
+        calibration_map.lookup_table = _decode_lookup_table(
+            blob, offset, header.version
+        )
+    return calibration_map
+
+
+def convert_pickled_calibration_map(blob: bytes) -> Optional[bytes]:
+    """
+    Convert a pickled calibration map, as stored by earlier versions, to the encoding.
+
+    Args:
+        blob (bytes): The pickled calibration map.
+
+    Returns:
+        Optional[bytes]: The encoded calibration map, or None if the pickle holds no map.
+    """
+    calibration_map = pickle.loads(blob)
+    if not isinstance(calibration_map, CalibrationMap):
+        return None
+    return encode_calibration_map(calibration_map)
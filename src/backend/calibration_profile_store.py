@@ -1,14 +1,32 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
 from sqlalchemy import (
     Column,
     DateTime,
     Integer,
-    PickleType,
+    LargeBinary,
     String,
     create_engine,
+    event,
     func,
+    select,
 )
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from src.backend.calibration_map import CalibrationMap
+from src.backend.calibration_map_codec import (
+    MAGIC,
+    convert_pickled_calibration_map,
+    decode_calibration_map,
+    encode_calibration_map,
+    is_encoded,
+)
+from src.backend.metrics import time_stage
+
 Base = declarative_base()
 
 
@@ -18,63 +36,388 @@ class CalibrationProfile(Base):
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     profile_name = Column(String, unique=True, nullable=False, index=True)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
-    calibration_map = Column(PickleType)  # Storing dict as binary
+    # Encoded with src.backend.calibration_map_codec. Rows written by earlier versions
+    # hold pickles and are converted when the store is opened.
+    calibration_map = Column(LargeBinary)
+
+
+class ProfileCache:
+    """
+    A thread-safe LRU cache whose entries expire after a time to live.
+
+    Missing profiles are cached as None, so the owner must invalidate a key whenever the
+    profile it refers to is created, updated or deleted.
+    """
+
+    def __init__(self, capacity: int = 128, ttl: float = 300.0):
+        """
+        Initialize the ProfileCache.
+
+        Args:
+            capacity (int): Maximum number of entries, 0 disables the cache.
+            ttl (float): Seconds an entry stays valid.
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so that values read from the database before a
+        # concurrent write are not cached after it.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return whether the key is cached, and its value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Cache a value, unless the cache was invalidated since `generation`."""
+        if self.capacity < 1:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+# Favour concurrent reads and cheap commits: profiles are small and frequently read.
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def _sqlite_pragma_listener(pragmas: Dict[str, Any]):
+    """Return a connect event listener running the pragmas on new SQLite connections."""
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return set_pragmas
+
+
+def _convert_pickled_profile(blob: bytes) -> bytes:
+    encoded = convert_pickled_calibration_map(blob)
+    if encoded is None:
+        # Not a calibration map: fall back to an empty profile.
+        encoded = encode_calibration_map(CalibrationMap())
+    return encoded
+
+
+# Profiles still to migrate, filtered by the database so that startup does not read
+# every encoded blob.
+PICKLED_PROFILES = select(CalibrationProfile).where(
+    func.substr(CalibrationProfile.calibration_map, 1, len(MAGIC)) != MAGIC
+)
+
+
+def _migrate_pickled_profiles(profiles) -> int:
+    """Convert pickled calibration maps in place, returning the number of profiles changed."""
+    migrated = 0
+    for profile in profiles:
+        blob = profile.calibration_map
+        if blob is None or is_encoded(blob):
+            continue
+        profile.calibration_map = _convert_pickled_profile(blob)
+        migrated += 1
+    return migrated
+
+
+def _profile_list(profiles) -> List[dict]:
+    return [
+        {"id": p.id, "profile_name": p.profile_name, "updated_at": p.updated_at}
+        for p in profiles
+    ]
 
 
 class CalibrationProfileStore:
     """Handles database interactions for calibration profiles."""
 
-    def __init__(self, db_url="sqlite:///calibration.db"):
-        self.engine = create_engine(db_url)
-        Base.metadata.create_all(self.engine)
+    def __init__(
+        self,
+        db_url="sqlite:///calibration.db",
+        cache_size: int = 128,
+        cache_ttl: float = 300.0,
+        sqlite_pragmas: Optional[Dict[str, Any]] = None,
+        read_only: bool = False,
+        **engine_kwargs,
+    ):
+        """
+        Initialize the CalibrationProfileStore.
+
+        Args:
+            db_url (str): SQLAlchemy database URL.
+            cache_size (int): Maximum number of cached profile lookups, 0 disables caching.
+            cache_ttl (float): Seconds a cached profile lookup stays valid.
+            sqlite_pragmas (Optional[Dict[str, Any]]): Pragmas run on every new SQLite
+                connection, DEFAULT_SQLITE_PRAGMAS if None. Ignored for other databases.
+            read_only (bool): Only read profiles: tables are neither created nor migrated,
+                and SQLite connections run query_only instead of sqlite_pragmas, keeping
+                the journal mode of the database. Pickled profiles are converted on load.
+            **engine_kwargs: Forwarded to create_engine, e.g. pool_size or pool_pre_ping.
+        """
+        self.read_only = read_only
+        self.engine = create_engine(db_url, **engine_kwargs)
+        if self.engine.dialect.name == "sqlite":
+            if read_only:
+                pragmas = {"query_only": "ON"}
+            elif sqlite_pragmas is None:
+                pragmas = DEFAULT_SQLITE_PRAGMAS
+            else:
+                pragmas = sqlite_pragmas
+            event.listen(self.engine, "connect", _sqlite_pragma_listener(pragmas))
         self.Session = sessionmaker(bind=self.engine)
+        self.cache = ProfileCache(capacity=cache_size, ttl=cache_ttl)
+        if not read_only:
+            Base.metadata.create_all(self.engine)
+            self.migrate_pickled_profiles()
 
-    def save_profile(self, profile_name: str, calibration_map: dict):
-        """Save a calibration profile by name, updating it if it already exists."""
+    def migrate_pickled_profiles(self) -> int:
+        """Convert profiles stored as pickles to the binary encoding, returning their count."""
         session = self.Session()
-        existing_profile = (
-            session.query(CalibrationProfile)
-            .filter_by(profile_name=profile_name)
-            .first()
-        )
-
-        if existing_profile:
-            existing_profile.calibration_map = calibration_map
-        else:
-            new_profile = CalibrationProfile(
-                profile_name=profile_name, calibration_map=calibration_map
-            )
-            session.add(new_profile)
-
+        migrated = _migrate_pickled_profiles(session.scalars(PICKLED_PROFILES))
         session.commit()
         session.close()
+        self.cache.clear()
+        return migrated
 
-    def load_profile(self, profile_id: int) -> dict:
-        """Load a calibration profile by ID."""
-        session = self.Session()
-        profile = session.query(CalibrationProfile).filter_by(id=profile_id).first()
-        session.close()
-        return profile.calibration_map if profile else {}
+    def save_profile(
+        self,
+        profile_name: str,
+        calibration_map: CalibrationMap,
+        agent_type: Optional[str] = None,
+    ):
+        """Save a calibration profile by name, updating it if it already exists."""
+        with time_stage("profile_save"):
+            calibration_map = encode_calibration_map(calibration_map, agent_type)
+            session = self.Session()
+            existing_profile = (
+                session.query(CalibrationProfile)
+                .filter_by(profile_name=profile_name)
+                .first()
+            )
+
+            if existing_profile:
+                existing_profile.calibration_map = calibration_map
+                profile_id = existing_profile.id
+            else:
+                new_profile = CalibrationProfile(
+                    profile_name=profile_name, calibration_map=calibration_map
+                )
+                session.add(new_profile)
+                session.flush()
+                profile_id = new_profile.id
+
+            session.commit()
+            session.close()
+        self.cache.invalidate(("id", profile_id), ("name", profile_name), "list")
+
+    def _load(self, key: Tuple[str, Any], **filters) -> Optional[CalibrationMap]:
+        # Encoded blobs are cached rather than maps: decoding is zero-copy, and every
+        # caller gets its own map to append to.
+        with time_stage("profile_load"):
+            generation = self.cache.generation
+            cached, blob = self.cache.get(key)
+            if not cached:
+                session = self.Session()
+                profile = session.query(CalibrationProfile).filter_by(**filters).first()
+                session.close()
+                blob = profile.calibration_map if profile else None
+                if blob is not None and not is_encoded(blob):
+                    # Only read-only stores hold pickles: the others migrate them.
+                    blob = _convert_pickled_profile(blob)
+                self.cache.put(key, blob, generation)
+            return decode_calibration_map(blob) if blob is not None else None
+
+    def load_profile(self, profile_id: int) -> Optional[CalibrationMap]:
+        """Load a calibration profile by ID, or return None if it does not exist."""
+        return self._load(("id", profile_id), id=profile_id)
+
+    def load_profile_by_name(self, profile_name: str) -> Optional[CalibrationMap]:
+        """Load a calibration profile by name, or return None if it does not exist."""
+        return self._load(("name", profile_name), profile_name=profile_name)
 
     def list_profiles(self) -> list:
         """Return a list of available profiles with their IDs and names."""
-        session = self.Session()
-        profiles = session.query(
-            CalibrationProfile.id,
-            CalibrationProfile.profile_name,
-            CalibrationProfile.updated_at,
-        ).all()
-        session.close()
-        return [
-            {"id": p.id, "profile_name": p.profile_name, "updated_at": p.updated_at}
-            for p in profiles
-        ]
+        generation = self.cache.generation
+        cached, profiles = self.cache.get("list")
+        if not cached:
+            session = self.Session()
+            profiles = session.query(
+                CalibrationProfile.id,
+                CalibrationProfile.profile_name,
+                CalibrationProfile.updated_at,
+            ).all()
+            session.close()
+            self.cache.put("list", profiles, generation)
+        return _profile_list(profiles)
 
     def delete_profile(self, profile_id: int):
         """Delete a calibration profile by ID."""
         session = self.Session()
         profile = session.query(CalibrationProfile).filter_by(id=profile_id).first()
         if profile:
+            profile_name = profile.profile_name
             session.delete(profile)
             session.commit()
+            self.cache.invalidate(("id", profile_id), ("name", profile_name), "list")
         session.close()
+
+
+class AsyncCalibrationProfileStore:
+    """
+    Handles database interactions for calibration profiles on SQLAlchemy's asyncio engine.
+
+    Offers the API of CalibrationProfileStore as coroutines, so that profile I/O does not
+    hold a worker thread. Call initialize() before use and dispose() when done.
+    """
+
+    def __init__(
+        self,
+        db_url="sqlite+aiosqlite:///calibration.db",
+        cache_size: int = 128,
+        cache_ttl: float = 300.0,
+        sqlite_pragmas: Optional[Dict[str, Any]] = None,
+        **engine_kwargs,
+    ):
+        """
+        Initialize the AsyncCalibrationProfileStore.
+
+        Args:
+            db_url (str): SQLAlchemy database URL with an asyncio driver, e.g. aiosqlite.
+            cache_size (int): Maximum number of cached profile lookups, 0 disables caching.
+            cache_ttl (float): Seconds a cached profile lookup stays valid.
+            sqlite_pragmas (Optional[Dict[str, Any]]): Pragmas run on every new SQLite
+                connection, DEFAULT_SQLITE_PRAGMAS if None. Ignored for other databases.
+            **engine_kwargs: Forwarded to create_async_engine, e.g. pool_size.
+        """
+        self.engine = create_async_engine(db_url, **engine_kwargs)
+        if self.engine.dialect.name == "sqlite":
+            pragmas = (
+                DEFAULT_SQLITE_PRAGMAS if sqlite_pragmas is None else sqlite_pragmas
+            )
+            event.listen(
+                self.engine.sync_engine, "connect", _sqlite_pragma_listener(pragmas)
+            )
+        self.Session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.cache = ProfileCache(capacity=cache_size, ttl=cache_ttl)
+
+    async def initialize(self):
+        """Create the tables and convert profiles stored as pickles."""
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        await self.migrate_pickled_profiles()
+
+    async def dispose(self):
+        """Close all pooled connections."""
+        await self.engine.dispose()
+
+    async def migrate_pickled_profiles(self) -> int:
+        """Convert profiles stored as pickles to the binary encoding, returning their count."""
+        async with self.Session() as session:
+            profiles = await session.scalars(PICKLED_PROFILES)
+            migrated = _migrate_pickled_profiles(profiles)
+            await session.commit()
+        self.cache.clear()
+        return migrated
+
+    async def save_profile(
+        self,
+        profile_name: str,
+        calibration_map: CalibrationMap,
+        agent_type: Optional[str] = None,
+    ):
+        """Save a calibration profile by name, updating it if it already exists."""
+        with time_stage("profile_save"):
+            calibration_map = encode_calibration_map(calibration_map, agent_type)
+            async with self.Session() as session:
+                profile = await session.scalar(
+                    select(CalibrationProfile).filter_by(profile_name=profile_name)
+                )
+                if profile:
+                    profile.calibration_map = calibration_map
+                else:
+                    profile = CalibrationProfile(
+                        profile_name=profile_name, calibration_map=calibration_map
+                    )
+                    session.add(profile)
+                    await session.flush()
+                profile_id = profile.id
+                await session.commit()
+        self.cache.invalidate(("id", profile_id), ("name", profile_name), "list")
+
+    async def _load(self, key: Tuple[str, Any], **filters) -> Optional[CalibrationMap]:
+        with time_stage("profile_load"):
+            generation = self.cache.generation
+            cached, blob = self.cache.get(key)
+            if not cached:
+                async with self.Session() as session:
+                    blob = await session.scalar(
+                        select(CalibrationProfile.calibration_map).filter_by(**filters)
+                    )
+                self.cache.put(key, blob, generation)
+            return decode_calibration_map(blob) if blob is not None else None
+
+    async def load_profile(self, profile_id: int) -> Optional[CalibrationMap]:
+        """Load a calibration profile by ID, or return None if it does not exist."""
+        return await self._load(("id", profile_id), id=profile_id)
+
+    async def load_profile_by_name(self, profile_name: str) -> Optional[CalibrationMap]:
+        """Load a calibration profile by name, or return None if it does not exist."""
+        return await self._load(("name", profile_name), profile_name=profile_name)
+
+    async def list_profiles(self) -> list:
+        """Return a list of available profiles with their IDs and names."""
+        generation = self.cache.generation
+        cached, profiles = self.cache.get("list")
+        if not cached:
+            async with self.Session() as session:
+                result = await session.execute(
+                    select(
+                        CalibrationProfile.id,
+                        CalibrationProfile.profile_name,
+                        CalibrationProfile.updated_at,
+                    )
+                )
+                profiles = result.all()
+            self.cache.put("list", profiles, generation)
+        return _profile_list(profiles)
+
+    async def delete_profile(self, profile_id: int):
+        """Delete a calibration profile by ID."""
+        async with self.Session() as session:
+            profile = await session.get(CalibrationProfile, profile_id)
+            if profile:
+                profile_name = profile.profile_name
+                await session.delete(profile)
+                await session.commit()
+                self.cache.invalidate(
+                    ("id", profile_id), ("name", profile_name), "list"
+                )
@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from src.backend.calibration_agents import CalibrationAgent
+from src.backend.calibration_profile_store import AsyncCalibrationProfileStore
+
+
+class CalibrationSessionCache:
+    """
+    A bounded LRU cache of live calibration agents, one per session.
+
+    Each session is persisted as the calibration profile named after the session id.
+    Sessions missing from the cache are loaded from the AsyncCalibrationProfileStore, and
+    the least recently used sessions are saved back to it when evicted. Until its save
+    completes, an evicted session is revived from memory rather than reloaded, so the
+    store is never read before it holds the latest calibration.
+    """
+
+    def __init__(
+        self,
+        cps: AsyncCalibrationProfileStore,
+        agent_factory: Callable[[], CalibrationAgent],
+        capacity: int = 128,
+    ):
+        """
+        Initialize the CalibrationSessionCache.
+
+        Args:
+            cps (AsyncCalibrationProfileStore): Store the sessions are loaded from and saved to.
+            agent_factory (Callable[[], CalibrationAgent]): Creates the agent of a new session.
+            capacity (int): Maximum number of sessions kept in memory.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be a positive integer.")
+        self.cps = cps
+        self.agent_factory = agent_factory
+        self.capacity = capacity
+
+        self._agents: "OrderedDict[str, CalibrationAgent]" = OrderedDict()
+        # Evicted sessions whose saves are still in progress, with the number of saves.
+        self._saving: Dict[str, Tuple[CalibrationAgent, int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._agents
+
+    async def get_agent(self, session_id: str) -> CalibrationAgent:
+        """
+        Return the calibration agent of a session, loading it on a cache miss.
+
+        Args:
+            session_id (str): The session identifier, also used as the profile name.
+
+        Returns:
+            CalibrationAgent: The live agent of the session.
+        """
+        with self._lock:
+            agent = self._agents.get(session_id)
+            if agent is not None:
+                self._agents.move_to_end(session_id)
+                self.hits += 1
+                return agent
+            self.misses += 1
+            agent, _ = self._saving.get(session_id, (None, 0))
+            if agent is not None:
+                # Evicted but not saved yet: the store may still hold an older profile.
+                evicted = self._insert(session_id, agent)
+
+        if agent is None:
+            agent = self.agent_factory()
+            calibration_map = await self.cps.load_profile_by_name(session_id)
+            if calibration_map is not None:
+                agent.calibration_map = calibration_map
+                await run_in_threadpool(agent.finalize_cal_map)
+            with self._lock:
+                # Another request may have loaded the same session in the meantime.
+                if session_id in self._agents:
+                    agent = self._agents[session_id]
+                elif session_id in self._saving:
+                    agent, _ = self._saving[session_id]
+                evicted = self._insert(session_id, agent)
+
+        await self._save_evicted(evicted)
+        return agent
+
+    def _insert(
+        self, session_id: str, agent: CalibrationAgent
+    ) -> List[Tuple[str, CalibrationAgent]]:
+        # Called with the lock held. Evicted sessions stay in _saving until saved.
+        self._agents[session_id] = agent
+        self._agents.move_to_end(session_id)
+        evicted = []
+        while len(self._agents) > self.capacity:
+            evicted_id, evicted_agent = self._agents.popitem(last=False)
+            saving, saves = self._saving.get(evicted_id, (None, 0))
+            saves = saves + 1 if saving is evicted_agent else 1
+            self._saving[evicted_id] = (evicted_agent, saves)
+            evicted.append((evicted_id, evicted_agent))
+            self.evictions += 1
+        return evicted
+
+    async def _save_evicted(self, evicted: List[Tuple[str, CalibrationAgent]]):
+        try:
+            await self._save(evicted)
+        finally:
+            with self._lock:
+                for session_id, agent in evicted:
+                    # The session may have been evicted again meanwhile.
+                    saving, saves = self._saving.get(session_id, (None, 0))
+                    if saving is not agent:
+                        continue
+                    if saves > 1:
+                        self._saving[session_id] = (agent, saves - 1)
+                    else:
+                        del self._saving[session_id]
+
+    async def reset(self, session_id: str):
+        """
+        Reset the calibration of a session.
+
+        Empty sessions are not saved on eviction, so the stored profile is overwritten
+        right away rather than reloaded with the old calibration.
+
+        Args:
+            session_id (str): The session identifier.
+        """
+        agent = await self.get_agent(session_id)
+        agent.initialize_cal_map()
+        await self.cps.save_profile(
+            session_id, agent.calibration_map, agent_type=agent.agent_type
+        )
+
+    async def flush(self):
+        """Save every live session back to the store, keeping them in the cache."""
+        with self._lock:
+            sessions = list(self._agents.items())
+        await self._save(sessions)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters."""
+        return {
+            "size": len(self._agents),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    async def _save(self, sessions: List[Tuple[str, CalibrationAgent]]):
+        for session_id, agent in sessions:
+            # Empty sessions are not worth a profile.
+            if len(agent.calibration_map) == 0:
+                continue
+            await run_in_threadpool(agent.finalize_cal_map)
+            await self.cps.save_profile(
+                session_id, agent.calibration_map, agent_type=agent.agent_type
+            )
@@ -1,8 +1,22 @@
+import threading
 import warnings
-from typing import Tuple
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
 
+import cv2
+import numpy as np
 import torch
 from l2cs import Pipeline
+from l2cs.utils import prep_input_numpy
+
+from src.backend.inference_backends import (
+    EagerBackend,
+    create_inference_backend,
+    validate_backend,
+)
+from src.backend.metrics import time_stage
+from src.backend.model_weights import mmap_loading
+from src.backend.preprocessing import FacePreprocessor
 
 warnings.filterwarnings(
     "ignore",
@@ -11,23 +25,226 @@ warnings.filterwarnings(
 )
 
 
+class FaceTracker:
+    """
+    Tracks a face across consecutive frames of a stream.
+
+    Between full-frame detections, faces are only searched for in the previous bounding
+    box expanded by a margin. A full-frame detection runs every `redetect_interval`
+    frames, and whenever the face is lost.
+    """
+
+    def __init__(self, redetect_interval: int = 10, margin: float = 0.25):
+        """
+        Initialize the FaceTracker.
+
+        Args:
+            redetect_interval (int): Number of frames between full-frame detections.
+            margin (float): Fraction of the box width and height added on each side.
+        """
+        if redetect_interval < 1:
+            raise ValueError("redetect_interval must be a positive integer.")
+        self.redetect_interval = redetect_interval
+        self.margin = margin
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked face, so the next frame runs a full-frame detection."""
+        self.bounding_box = None
+        self.frames_since_detection = 0
+
+    def region_of_interest(
+        self, image_shape: Tuple[int, ...]
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Return the region to search for the face in the next frame.
+
+        Args:
+            image_shape (Tuple[int, ...]): Shape of the next frame.
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: The region [x_min, y_min, x_max, y_max],
+            or None if a full-frame detection is due.
+        """
+        if (
+            self.bounding_box is None
+            or self.frames_since_detection >= self.redetect_interval
+        ):
+            return None
+        x_min, y_min, x_max, y_max = self.bounding_box
+        margin_x = (x_max - x_min) * self.margin
+        margin_y = (y_max - y_min) * self.margin
+        height, width = image_shape[:2]
+        return (
+            max(int(x_min - margin_x), 0),
+            max(int(y_min - margin_y), 0),
+            min(int(x_max + margin_x), width),
+            min(int(y_max + margin_y), height),
+        )
+
+    def update(self, bounding_box: Optional[np.ndarray], full_frame: bool):
+        """
+        Record the outcome of a detection.
+
+        Args:
+            bounding_box (Optional[np.ndarray]): The detected box, or None if lost.
+            full_frame (bool): Whether the detection ran on the full frame.
+        """
+        if bounding_box is None:
+            self.reset()
+            return
+        self.bounding_box = bounding_box
+        self.frames_since_detection = (
+            0 if full_frame else self.frames_since_detection + 1
+        )
+
+
+@dataclass
+class FaceGaze:
+    """
+    Gaze of one of the faces detected in an image.
+    """
+
+    bounding_box: Tuple[float, float, float, float]  # [x_min, y_min, x_max, y_max]
+    head_x: float  # Bounding box center, with the x-axis inverted as for gaze vectors.
+    head_y: float
+    pitch: float
+    yaw: float
+    confidence: float  # Face detection score.
+
+    @property
+    def gaze_vector(self) -> Tuple[float, float, float, float]:
+        return self.head_x, self.head_y, self.pitch, self.yaw
+
+    def scaled(self, scale: float) -> "FaceGaze":
+        """Map the face back to full resolution coordinates, see scale_gaze_vector."""
+        if scale == 1:
+            return self
+        return FaceGaze(
+            tuple(value * scale for value in self.bounding_box),
+            self.head_x * scale,
+            self.head_y * scale,
+            self.pitch,
+            self.yaw,
+            self.confidence,
+        )
+
+
 class GazePredictor:
     """
     A wrapper for the gaze prediction pipeline.
     """
 
-    def __init__(self, filepath: str):
+    def __init__(
+        self,
+        filepath: str,
+        backend: str = "eager",
+        validate: bool = True,
+        warmup_batch_sizes: Sequence[int] = (),
+        max_batch_size: int = 8,
+    ):
         """
         Initialize the GazePredictor pipeline.
 
         Args:
-            filepath (str): Path to the model weights file.
+            filepath (str): Path to the model weights file. Weights converted with
+                src.backend.model_weights are memory-mapped instead of read in full.
+            backend (str): Runtime of the gaze network, one of INFERENCE_BACKENDS.
+            validate (bool): Whether to check the backend against eager predictions
+                within its ANGULAR_TOLERANCES entry.
+            warmup_batch_sizes (Sequence[int]): Batch sizes to warm up once loaded,
+                see warm_up. Empty to skip the warm-up.
+            max_batch_size (int): Number of faces per forward pass, the size of the
+                preprocessing buffers. Larger batches are split.
         """
-        self.gaze_pipeline = Pipeline(
-            weights=filepath,
-            arch="ResNet50",
-            device=torch.device("cpu"),  # Use 'gpu' if available
+        self.device = torch.device("cpu")  # Use 'gpu' if available
+        with mmap_loading(filepath):
+            self.gaze_pipeline = Pipeline(
+                weights=filepath,
+                arch="ResNet50",
+                device=self.device,
+            )
+
+        # Faces are preprocessed into reused buffers instead of by the pipeline.
+        self.preprocessor = FacePreprocessor(max_batch_size, device=self.device)
+        self._preprocessing_lock = threading.Lock()
+        self.backend = create_inference_backend(backend, self.gaze_pipeline.model)
+        if backend != "eager" and validate:
+            self.validate_backend()
+        if warmup_batch_sizes:
+            self.warm_up(warmup_batch_sizes)
+
+    def validate_backend(self, num_samples: int = 8) -> float:
+        """
+        Compare the backend against eager predictions on random face crops.
+
+        Args:
+            num_samples (int): Number of crops to compare on.
+
+        Returns:
+            float: The largest angular error in degrees.
+
+        Raises:
+            BackendValidationError: If the error exceeds the backend's tolerance.
+        """
+        generator = np.random.default_rng(0)
+        crops = generator.integers(0, 256, (num_samples, 224, 224, 3), dtype=np.uint8)
+        images = prep_input_numpy(crops, self.device)
+        reference = EagerBackend(self.gaze_pipeline.model)
+        return validate_backend(self.backend, reference, images)
+
+    def warm_up(
+        self,
+        batch_sizes: Sequence[int] = (1,),
+        frame_shape: Tuple[int, int, int] = (480, 640, 3),
+    ):
+        """
+        Run the face detector and the gaze network once on synthetic inputs.
+
+        The first passes pay for lazy initialization, memory allocation and, with the
+        compiled backend, compilation, which would otherwise delay the first requests.
+        Synthetic frames hold no face, so the gaze network is run on random crops.
+
+        Args:
+            batch_sizes (Sequence[int]): Batch sizes to run the gaze network at.
+            frame_shape (Tuple[int, int, int]): Shape of the synthetic frame.
+        """
+        generator = np.random.default_rng(0)
+        self.gaze_pipeline.detector(
+            generator.integers(0, 256, frame_shape, dtype=np.uint8)
         )
+        for batch_size in batch_sizes:
+            crop = generator.integers(0, 256, (224, 224, 3), dtype=np.uint8)
+            self._predict_gaze([(crop, (0, 0, 224, 224))] * batch_size)
+
+    def _predict_gaze(
+        self, faces: Sequence[Tuple[np.ndarray, Sequence[float]]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run faces through the gaze network, max_batch_size faces per forward pass.
+
+        Args:
+            faces (Sequence[Tuple[np.ndarray, Sequence[float]]]): The image and the
+                bounding box [x_min, y_min, x_max, y_max] of each face.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Pitch and yaw in radians, one per face.
+        """
+        batch_size = self.preprocessor.max_batch_size
+        pitches, yaws = [], []
+        with self._preprocessing_lock, torch.inference_mode():
+            for start in range(0, len(faces), batch_size):
+                batch = faces[start : start + batch_size]
+                for index, (image, box) in enumerate(batch):
+                    self.preprocessor.crop(index, image, box)
+                pitch, yaw = self.backend.predict_gaze(
+                    self.preprocessor.prepare(len(batch))
+                )
+                pitches.append(pitch)
+                yaws.append(yaw)
+        if len(pitches) == 1:
+            return pitches[0], yaws[0]
+        return np.concatenate(pitches), np.concatenate(yaws)
 
     @staticmethod
     def find_bounding_box_center(
@@ -48,26 +265,214 @@ class GazePredictor:
         y_center = (y_min + y_max) / 2
         return x_center, y_center
 
+    @staticmethod
+    def scale_gaze_vector(
+        gaze_vector: Tuple[float, float, float, float], scale: float
+    ) -> Tuple[float, float, float, float]:
+        """
+        Map the head position of a gaze vector predicted on a downscaled image back to
+        the coordinates of the full resolution image.
+
+        Args:
+            gaze_vector (Tuple[float, float, float, float]): Gaze vector (x, y, pitch, yaw).
+            scale (float): Factor the image was downscaled by.
+
+        Returns:
+            Tuple[float, float, float, float]: The gaze vector in full resolution
+            coordinates. Reduced decodes round the image size up, so x may be off by
+            less than `scale` pixels.
+        """
+        x, y, pitch, yaw = gaze_vector
+        if x is None or scale == 1:
+            return gaze_vector
+        return x * scale, y * scale, pitch, yaw
+
+    def _find_faces(
+        self, image: np.ndarray, region: Optional[Tuple[int, int, int, int]] = None
+    ) -> List[Tuple[np.ndarray, float]]:
+        """
+        Run the face detector and return the faces above the confidence threshold.
+
+        Args:
+            image (np.ndarray): Input image (BGR).
+            region (Optional[Tuple[int, int, int, int]]): Restrict detection to this region.
+
+        Returns:
+            List[Tuple[np.ndarray, float]]: The bounding box in full image coordinates
+            and the score of each face, in detector order.
+        """
+        x_offset, y_offset = 0, 0
+        if region is not None:
+            x_offset, y_offset, x_max, y_max = region
+            image = image[y_offset:y_max, x_offset:x_max]
+        faces = self.gaze_pipeline.detector(image)
+        if faces is None:
+            return []
+        found = []
+        for box, _, score in faces:
+            if score < self.gaze_pipeline.confidence_threshold:
+                continue
+            box = np.array(box[:4], dtype=np.float64)
+            box[[0, 2]] += x_offset
+            box[[1, 3]] += y_offset
+            found.append((box, float(score)))
+        return found
+
+    def _first_face(
+        self, image: np.ndarray, region: Optional[Tuple[int, int, int, int]] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Run the face detector and return the first face above the confidence threshold.
+
+        Args:
+            image (np.ndarray): Input image (BGR).
+            region (Optional[Tuple[int, int, int, int]]): Restrict detection to this region.
+
+        Returns:
+            Optional[np.ndarray]: The bounding box in full image coordinates, or None.
+        """
+        faces = self._find_faces(image, region)
+        return faces[0][0] if faces else None
+
+    @staticmethod
+    def _to_bgr(image: np.ndarray) -> np.ndarray:
+        if image.ndim == 2 or image.shape[2] == 1:
+            # Raw grayscale frames: the detector expects three channels.
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        return image
+
+    def _detect_face(
+        self, image: np.ndarray, tracker: Optional[FaceTracker] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Detect the most prominent face in an image, as the L2CS pipeline does.
+
+        Args:
+            image (np.ndarray): Input image (BGR).
+            tracker (Optional[FaceTracker]): Tracking state of the stream the image
+                belongs to. When given, detection is restricted to the tracked region.
+
+        Returns:
+            Optional[np.ndarray]: The bounding box of the first detection above the
+            confidence threshold, or None.
+        """
+        if image is None:
+            return None
+        image = self._to_bgr(image)
+
+        region = tracker.region_of_interest(image.shape) if tracker else None
+        with time_stage("detect"):
+            box = self._first_face(image, region)
+            if box is None and region is not None:
+                # The face left the tracked region, fall back to a full-frame detection.
+                region = None
+                box = self._first_face(image)
+        if tracker is not None:
+            tracker.update(box, full_frame=region is None)
+        return box
+
+    def predict_faces(
+        self,
+        image: np.ndarray,
+        max_faces: Optional[int] = None,
+        min_face_size: float = 0,
+    ) -> List[FaceGaze]:
+        """
+        Predict the gaze of every face in an image with one batched forward pass.
+
+        Args:
+            image (np.ndarray): Input image (BGR).
+            max_faces (Optional[int]): Keep at most this many faces, the most confident
+                first. None keeps them all.
+            min_face_size (float): Ignore faces whose bounding box is narrower or
+                shorter than this, in pixels.
+
+        Returns:
+            List[FaceGaze]: The gaze of each face, by decreasing detection confidence.
+        """
+        if image is None:
+            return []
+        with time_stage("detect"):
+            detections = self._find_faces(self._to_bgr(image))
+        faces = [
+            (box, score)
+            for box, score in detections
+            if min(box[2] - box[0], box[3] - box[1]) >= min_face_size
+        ]
+        faces.sort(key=lambda face: face[1], reverse=True)
+        faces = faces[:max_faces]
+        if not faces:
+            return []
+
+        with time_stage("forward"):
+            pitch, yaw = self._predict_gaze([(image, box) for box, _ in faces])
+        predictions = []
+        for index, (box, score) in enumerate(faces):
+            x, y = self.find_bounding_box_center(box, image.shape[1])
+            predictions.append(
+                FaceGaze(
+                    tuple(float(value) for value in box),
+                    float(x),
+                    float(y),
+                    float(pitch[index]),
+                    float(yaw[index]),
+                    score,
+                )
+            )
+        return predictions
+
+    def predict_gaze_vectors(
+        self,
+        images: List[np.ndarray],
+        trackers: Optional[List[Optional[FaceTracker]]] = None,
+    ) -> List[Tuple[float, float, float, float]]:
+        """
+        Predict the gaze vectors for several images with one batched forward pass.
+
+        Faces are detected in each image, and all face crops go through the gaze
+        network as a single batch.
+
+        Args:
+            images (List[np.ndarray]): Input images (BGR).
+            trackers (Optional[List[Optional[FaceTracker]]]): Optional face tracker per image.
+
+        Returns:
+            List[Tuple[float, float, float, float]]: Predicted gaze vector (x, y, pitch, yaw)
+            per image, in order. Images without a face yield (None, None, None, None).
+        """
+        trackers = trackers or [None] * len(images)
+        boxes = [
+            self._detect_face(image, tracker)
+            for image, tracker in zip(images, trackers)
+        ]
+        faces = [(image, box) for image, box in zip(images, boxes) if box is not None]
+        if faces:
+            with time_stage("forward"):
+                pitch, yaw = self._predict_gaze(faces)
+
+        gaze_vectors = []
+        face_index = 0
+        for image, box in zip(images, boxes):
+            if box is None:
+                print("No face detected.")
+                gaze_vectors.append((None, None, None, None))
+                continue
+            x, y = self.find_bounding_box_center(box, image.shape[1])
+            gaze_vectors.append((x, y, pitch[face_index], yaw[face_index]))
+            face_index += 1
+        return gaze_vectors
+
     def predict_gaze_vector(
-        self, image: torch.Tensor
+        self, image: np.ndarray, tracker: Optional[FaceTracker] = None
     ) -> Tuple[float, float, float, float]:
         """
         Predict the gaze vector for a given image.
 
         Args:
-            image (torch.Tensor): Input image tensor.
+            image (np.ndarray): Input image (BGR).
+            tracker (Optional[FaceTracker]): Face tracking state for streamed frames.
 
         Returns:
             Tuple[float, float, float, float]: Predicted gaze vector (x, y, pitch, yaw).
         """
-        try:
-            result = self.gaze_pipeline.step(image)
-        except ValueError:
-            print("No face detected.")
-            return None, None, None, None
-
-        bounding_box = result.bboxes[0]
-        image_width = image.shape[1]
-        x, y = self.find_bounding_box_center(bounding_box, image_width)
-
-        return x, y, result.pitch[0], result.yaw[0]
+        return self.predict_gaze_vectors([image], [tracker])[0]
@@ -0,0 +1,285 @@
+import copy
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+from torch import nn
+
+# Maximum angular deviation from eager fp32 gaze predictions, in degrees, that each
+# backend is allowed at validation. Compiled and ONNX graphs only differ by floating
+# point reordering; int8 weights of the gaze heads cost a fraction of a degree.
+ANGULAR_TOLERANCES = {
+    "eager": 0.0,
+    "quantized": 2.0,
+    "compiled": 0.1,
+    "onnx": 0.1,
+}
+
+
+class BackendValidationError(RuntimeError):
+    """Raised when a backend deviates from eager predictions beyond its tolerance."""
+
+
+def logits_to_radians(logits: torch.Tensor) -> np.ndarray:
+    """
+    Convert binned L2CS gaze logits to continuous angles, as the L2CS pipeline does.
+
+    Args:
+        logits (torch.Tensor): Logits over the 4 degree angle bins, shape (n, bins).
+
+    Returns:
+        np.ndarray: Angles in radians, shape (n,).
+    """
+    probabilities = torch.softmax(logits.float(), dim=1)
+    bins = torch.arange(logits.shape[1], dtype=torch.float32)
+    degrees = torch.sum(probabilities * bins, dim=1) * 4 - 180
+    return degrees.cpu().numpy() * np.pi / 180.0
+
+
+def angular_error(
+    pitch: np.ndarray,
+    yaw: np.ndarray,
+    reference_pitch: np.ndarray,
+    reference_yaw: np.ndarray,
+) -> np.ndarray:
+    """
+    Angles in degrees between gaze directions given as pitch and yaw, in radians.
+    """
+
+    def directions(pitch, yaw):
+        pitch, yaw = np.asarray(pitch, np.float64), np.asarray(yaw, np.float64)
+        return np.stack(
+            [
+                -np.cos(pitch) * np.sin(yaw),
+                -np.sin(pitch),
+                -np.cos(pitch) * np.cos(yaw),
+            ]
+        )
+
+    cosine = np.sum(
+        directions(pitch, yaw) * directions(reference_pitch, reference_yaw), axis=0
+    )
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+class InferenceBackend(ABC):
+    """
+    Abstract base class for the runtimes of the L2CS gaze network.
+
+    Backends take preprocessed (n, 3, 448, 448) face crops and return the pitch and yaw
+    logits of the network.
+    """
+
+    name = None
+
+    @abstractmethod
+    def forward(self, images: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Run the gaze network.
+
+        Args:
+            images (torch.Tensor): Preprocessed face crops, shape (n, 3, 448, 448).
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor]: Pitch and yaw logits, each (n, bins).
+        """
+        pass
+
+    def predict_gaze(self, images: torch.Tensor) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict gaze angles for preprocessed face crops.
+
+        Args:
+            images (torch.Tensor): Preprocessed face crops, shape (n, 3, 448, 448).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Pitch and yaw in radians, each (n,).
+        """
+        pitch, yaw = self.forward(images)
+        return logits_to_radians(pitch), logits_to_radians(yaw)
+
+
+class EagerBackend(InferenceBackend):
+    """
+    The fp32 network run eagerly by PyTorch, the reference for the other backends.
+    """
+
+    name = "eager"
+
+    def __init__(self, model: nn.Module):
+        self.model = model.eval()
+
+    def forward(self, images: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        with torch.inference_mode():
+            return self.model(images)
+
+
+class QuantizedBackend(EagerBackend):
+    """
+    The network with dynamically quantized int8 gaze heads.
+
+    Weights are quantized ahead of time and activations on the fly, so no calibration
+    data is needed. Only the Linear gaze heads are quantized: convolutions are not
+    supported by dynamic quantization, so the ResNet backbone, nearly all of the
+    compute, stays fp32 and this backend is not meant as a speedup.
+    """
+
+    name = "quantized"
+
+    def __init__(self, model: nn.Module):
+        quantized = torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8
+        )
+        super().__init__(quantized)
+
+
+class CompiledBackend(EagerBackend):
+    """
+    The network compiled with torch.compile.
+
+    Compilation happens lazily on the first batches, and dynamic shapes avoid
+    recompiling for every batch size.
+    """
+
+    name = "compiled"
+
+    def __init__(self, model: nn.Module, compile_backend: str = "inductor"):
+        """
+        Initialize the CompiledBackend.
+
+        Args:
+            model (nn.Module): The gaze network.
+            compile_backend (str): The torch.compile backend.
+        """
+        super().__init__(model)
+        self.model = torch.compile(self.model, backend=compile_backend, dynamic=True)
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    The network exported to ONNX and run by ONNX Runtime on the CPU.
+
+    Requires the optional onnx (for the export) and onnxruntime packages.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model: nn.Module,
+        path: Optional[str] = None,
+        input_size: int = 448,
+        intra_op_threads: int = 0,
+    ):
+        """
+        Initialize the OnnxBackend.
+
+        Args:
+            model (nn.Module): The gaze network.
+            path (Optional[str]): Where to write the exported graph, a temporary file if None.
+            input_size (int): Height and width of the network input.
+            intra_op_threads (int): ONNX Runtime threads per operator, 0 for its default.
+        """
+        try:
+            import onnx  # noqa: F401
+            import onnxruntime
+        except ImportError:
+            raise ImportError(
+                "The onnx backend requires onnx and onnxruntime: "
+                "pip install onnx onnxruntime"
+            ) from None
+
+        if path is None:
+            self._tmpdir = tempfile.TemporaryDirectory()
+            path = os.path.join(self._tmpdir.name, "gaze.onnx")
+        sample = torch.zeros(1, 3, input_size, input_size)
+        with torch.no_grad():
+            torch.onnx.export(
+                model.eval(),
+                (sample,),
+                path,
+                input_names=["images"],
+                output_names=["pitch", "yaw"],
+                dynamic_axes={"images": {0: "batch"}},
+                dynamo=False,
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def forward(self, images: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        pitch, yaw = self.session.run(None, {"images": images.cpu().numpy()})
+        return torch.from_numpy(pitch), torch.from_numpy(yaw)
+
+
+INFERENCE_BACKENDS = {
+    backend_class.name: backend_class
+    for backend_class in (EagerBackend, QuantizedBackend, CompiledBackend, OnnxBackend)
+}
+
+
+def create_inference_backend(name: str, model: nn.Module, **kwargs) -> InferenceBackend:
+    """
+    Create an inference backend by name.
+
+    Args:
+        name (str): One of the keys of INFERENCE_BACKENDS.
+        model (nn.Module): The gaze network.
+        **kwargs: Keyword arguments forwarded to the backend constructor.
+
+    Returns:
+        InferenceBackend: The new inference backend.
+    """
+    try:
+        backend_class = INFERENCE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown inference backend '{name}', expected one of "
+            f"{sorted(INFERENCE_BACKENDS)}."
+        ) from None
+    return backend_class(model, **kwargs)
+
+
+def validate_backend(
+    backend: InferenceBackend,
+    reference: InferenceBackend,
+    images: torch.Tensor,
+    tolerance: Optional[float] = None,
+) -> float:
+    """
+    Check a backend's gaze predictions against a reference backend.
+
+    Args:
+        backend (InferenceBackend): The backend to validate.
+        reference (InferenceBackend): The reference, usually an EagerBackend.
+        images (torch.Tensor): Preprocessed face crops to compare predictions on.
+        tolerance (Optional[float]): Maximum angular error in degrees, the backend's
+            ANGULAR_TOLERANCES entry if None.
+
+    Returns:
+        float: The largest angular error in degrees.
+
+    Raises:
+        BackendValidationError: If the largest error exceeds the tolerance.
+    """
+    if tolerance is None:
+        tolerance = ANGULAR_TOLERANCES[backend.name]
+    error = float(
+        np.max(
+            angular_error(
+                *backend.predict_gaze(images), *reference.predict_gaze(images)
+            )
+        )
+    )
+    if error > tolerance:
+        raise BackendValidationError(
+            f"The {backend.name} backend deviates from the reference by {error:.3f} "
+            f"degrees, more than the {tolerance} degrees tolerance."
+        )
+    return error
@@ -0,0 +1,331 @@
+import itertools
+import math
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# A frame travels as (slot, shape, dtype) when it fits in a slot of the worker's shared
+# memory region, as the array itself when it does not, and as None when it is missing.
+FrameRef = Optional[Tuple[Any, Tuple[int, ...], str]]
+
+
+def _worker_main(
+    worker_id: int,
+    predictor_factory: Callable[[], Any],
+    threads: int,
+    shm_name: str,
+    region_offset: int,
+    slot_size: int,
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+):
+    """Load a predictor, then run the batches sent to this worker until told to stop."""
+    import torch
+
+    torch.set_num_threads(threads)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        predictor = predictor_factory()
+    except Exception as e:
+        results.put((None, worker_id, e))
+        shm.close()
+        return
+    results.put((None, worker_id, "ready"))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, refs = task
+        frames = []
+        for ref in refs:
+            if ref is None or isinstance(ref[0], np.ndarray):
+                frames.append(ref if ref is None else ref[0])
+                continue
+            slot, shape, dtype = ref
+            # A view over the shared memory: the frame is not copied.
+            frames.append(
+                np.ndarray(
+                    shape,
+                    dtype=dtype,
+                    buffer=shm.buf,
+                    offset=region_offset + slot * slot_size,
+                )
+            )
+        try:
+            gaze_vectors = predictor.predict_gaze_vectors(frames)
+            result = [
+                tuple(None if v is None else float(v) for v in gaze_vector)
+                for gaze_vector in gaze_vectors
+            ]
+        except Exception as e:
+            result = e
+        del frames
+        results.put((request_id, worker_id, result))
+    shm.close()
+
+
+class InferencePool:
+    """
+    A pool of worker processes, each running its own gaze predictor.
+
+    Frames are written to a shared memory block in which every worker owns a region of
+    fixed-size slots, and only their location goes through the task queues. A worker
+    runs one task at a time, so a region is free again once its result is back.
+    Batches are split across the idle workers, and results are collected by a
+    background thread. Crashed workers are dropped, and once none is left the pool
+    fails: pending and later batches raise instead of waiting for a worker.
+    """
+
+    def __init__(
+        self,
+        predictor_factory: Callable[[], Any],
+        num_workers: int = 2,
+        threads_per_worker: int = 1,
+        slots_per_worker: int = 4,
+        slot_size: int = 1280 * 720 * 3,
+        on_failure: Optional[Callable[[Exception], None]] = None,
+    ):
+        """
+        Initialize the InferencePool.
+
+        Args:
+            predictor_factory (Callable): Picklable callable creating a predictor with a
+                predict_gaze_vectors method in a worker, e.g. a functools.partial of
+                GazePredictor.
+            num_workers (int): Number of worker processes.
+            threads_per_worker (int): PyTorch threads of each worker.
+            slots_per_worker (int): Maximum number of frames per worker task.
+            slot_size (int): Bytes per frame slot. Larger frames are pickled instead.
+            on_failure (Optional[Callable[[Exception], None]]): Called from the
+                collector thread when the last worker died, e.g. to fail readiness.
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers must be a positive integer.")
+        if slots_per_worker < 1:
+            raise ValueError("slots_per_worker must be a positive integer.")
+        self.predictor_factory = predictor_factory
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.slots_per_worker = slots_per_worker
+        self.slot_size = slot_size
+        self.on_failure = on_failure
+
+        self._context = multiprocessing.get_context("spawn")
+        self._shm = None
+        self._workers = []
+        self._tasks = []
+        self._results = None
+        self._collector = None
+        self._idle = queue.Queue()
+        self._pending: Dict[int, Tuple[int, Future]] = {}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._running = False
+        self._live = set()
+        self.error: Optional[Exception] = None
+
+    @property
+    def region_size(self) -> int:
+        return self.slots_per_worker * self.slot_size
+
+    def start(self, timeout: Optional[float] = None):
+        """
+        Start the workers and wait until all of them have loaded their predictor.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for each worker, None for no limit.
+        """
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self.num_workers * self.region_size
+        )
+        self._results = self._context.Queue()
+        for worker_id in range(self.num_workers):
+            tasks = self._context.Queue()
+            worker = self._context.Process(
+                target=_worker_main,
+                args=(
+                    worker_id,
+                    self.predictor_factory,
+                    self.threads_per_worker,
+                    self._shm.name,
+                    worker_id * self.region_size,
+                    self.slot_size,
+                    tasks,
+                    self._results,
+                ),
+                name=f"inference-{worker_id}",
+                daemon=True,
+            )
+            worker.start()
+            self._tasks.append(tasks)
+            self._workers.append(worker)
+
+        for _ in range(self.num_workers):
+            try:
+                _, worker_id, status = self._results.get(timeout=timeout)
+            except queue.Empty:
+                self.close()
+                raise RuntimeError("Inference workers did not start in time.") from None
+            if isinstance(status, Exception):
+                self.close()
+                raise RuntimeError(
+                    f"Inference worker {worker_id} failed to start."
+                ) from status
+            self._idle.put(worker_id)
+            self._live.add(worker_id)
+
+        self._running = True
+        self._collector = threading.Thread(
+            target=self._collect, name="inference-results", daemon=True
+        )
+        self._collector.start()
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        self._running = False
+        for tasks, worker in zip(self._tasks, self._workers):
+            if worker.is_alive():
+                tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        if self._collector is not None:
+            self._collector.join()
+            self._collector = None
+        self._fail_pending(RuntimeError("Inference pool closed."))
+        self._workers, self._tasks = [], []
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def predict_batch(
+        self, frames: List[Optional[np.ndarray]]
+    ) -> List[Tuple[float, float, float, float]]:
+        """
+        Predict the gaze vectors of several frames on the workers.
+
+        Args:
+            frames (List[Optional[np.ndarray]]): Input images (BGR).
+
+        Returns:
+            List[Tuple[float, float, float, float]]: Gaze vector per frame, in order,
+            as returned by the predictors' predict_gaze_vectors.
+        """
+        if self.error is not None:
+            raise self.error
+        if not self._running:
+            raise RuntimeError("Inference pool is not running.")
+        if not frames:
+            return []
+        chunk_size = min(
+            math.ceil(len(frames) / self.num_workers), self.slots_per_worker
+        )
+        futures = [
+            self._submit(frames[start : start + chunk_size])
+            for start in range(0, len(frames), chunk_size)
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def _submit(self, frames: List[Optional[np.ndarray]]) -> Future:
+        """Hand frames to the next idle worker, waiting for one if they are all busy."""
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                worker_id = self._idle.get(timeout=1)
+            except queue.Empty:
+                if not self._running:
+                    raise RuntimeError("Inference pool is not running.") from None
+                continue
+            if self._workers[worker_id].is_alive():
+                break
+            # A dead worker leaves the idle queue for good, see _check_workers.
+
+        refs: List[FrameRef] = []
+        for slot, frame in enumerate(frames):
+            if frame is None:
+                refs.append(None)
+            elif frame.nbytes > self.slot_size:
+                refs.append((frame, frame.shape, frame.dtype.str))
+            else:
+                offset = worker_id * self.region_size + slot * self.slot_size
+                self._write_frame(frame, offset)
+                refs.append((slot, frame.shape, frame.dtype.str))
+
+        future = Future()
+        request_id = next(self._request_ids)
+        with self._lock:
+            # Checked under the lock, as a failing pool fails the pending futures.
+            if self.error is not None:
+                raise self.error
+            self._pending[request_id] = (worker_id, future)
+        self._tasks[worker_id].put((request_id, refs))
+        return future
+
+    def _write_frame(self, frame: np.ndarray, offset: int):
+        destination = np.ndarray(
+            frame.shape, dtype=frame.dtype, buffer=self._shm.buf, offset=offset
+        )
+        destination[...] = frame
+
+    def _collect(self):
+        """Resolve the futures of finished tasks, and fail those of crashed workers."""
+        while self._running or self._pending:
+            # Checked on every pass, so a crash under load is noticed as well.
+            self._check_workers()
+            try:
+                request_id, worker_id, result = self._results.get(timeout=0.5)
+            except queue.Empty:
+                if not self._running or self.error is not None:
+                    return
+                continue
+            with self._lock:
+                _, future = self._pending.pop(request_id, (None, None))
+            self._idle.put(worker_id)
+            if future is None:
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _check_workers(self):
+        dead = {
+            worker_id
+            for worker_id in self._live
+            if not self._workers[worker_id].is_alive()
+        }
+        if not dead:
+            return
+        self._live -= dead
+        with self._lock:
+            crashed = [
+                (request_id, future)
+                for request_id, (worker_id, future) in self._pending.items()
+                if worker_id in dead
+            ]
+            for request_id, _ in crashed:
+                del self._pending[request_id]
+        for _, future in crashed:
+            future.set_exception(RuntimeError("Inference worker died."))
+        if not self._live and self._running:
+            with self._lock:
+                self.error = RuntimeError("All inference workers died.")
+            self._fail_pending(self.error)
+            if self.on_failure is not None:
+                self.on_failure(self.error)
+
+    def _fail_pending(self, error: Exception):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for _, future in pending.values():
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,197 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+
+from src.backend.metrics import BATCH_SIZE, STAGE_SECONDS
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a frame is submitted while the inference queue is full."""
+
+
+@dataclass
+class InferenceTiming:
+    """
+    Timing of a single request going through the InferenceScheduler.
+    """
+
+    queue_time: float  # Seconds between submission and the start of its batch.
+    compute_time: float  # Seconds spent running the batch.
+    batch_size: int  # Number of frames in the batch.
+
+    def server_timing(self) -> str:
+        """Format the timing as a Server-Timing HTTP header value."""
+        return (
+            f"queue;dur={self.queue_time * 1000:.3f}, "
+            f"compute;dur={self.compute_time * 1000:.3f};desc=batch_{self.batch_size}"
+        )
+
+
+class InferenceScheduler:
+    """
+    A dynamic micro-batching scheduler for gaze inference.
+
+    Requests enqueue a frame and await the result. A worker collects queued frames until
+    either the maximum batch size or the maximum wait is reached, and runs them as one
+    batch on a dedicated inference thread so the event loop is never blocked.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[np.ndarray]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.005,
+        max_queue_size: int = 64,
+    ):
+        """
+        Initialize the InferenceScheduler.
+
+        Args:
+            predict_batch (Callable): Function mapping a list of frames to a list of results,
+                e.g. GazePredictor.predict_gaze_vectors.
+            max_batch_size (int): Maximum number of frames per batch.
+            max_wait (float): Maximum time in seconds to wait for a batch to fill up.
+            max_queue_size (int): Maximum number of frames waiting for inference.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be a positive integer.")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue_size = max_queue_size
+
+        self._queue = None
+        self._worker = None
+        self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of frames currently waiting for inference."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Start the batching worker on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        # A single inference thread: batches run one at a time, in order.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="inference"
+        )
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail any frame still waiting for inference."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler stopped."))
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def submit(self, frame: np.ndarray) -> Tuple[Any, InferenceTiming]:
+        """
+        Submit a frame for inference and wait for its result.
+
+        Args:
+            frame (np.ndarray): The input image.
+
+        Returns:
+            Tuple[Any, InferenceTiming]: The result for the frame and its timing.
+
+        Raises:
+            QueueFullError: If the queue already holds max_queue_size frames.
+        """
+        if self._worker is None:
+            raise RuntimeError("Inference scheduler is not running.")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((frame, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise QueueFullError("Inference queue is full.") from None
+        return await future
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run a function on the inference thread, in between scheduled batches.
+
+        Args:
+            fn (Callable): The function to run, e.g. an already batched prediction.
+            *args: Positional arguments for the function.
+
+        Returns:
+            Any: The return value of the function.
+        """
+        if self._worker is None:
+            raise RuntimeError("Inference scheduler is not running.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def _collect_batch(self, batch: list):
+        """Wait for a first frame, then gather more until the batch is full or stale."""
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect_batch(batch)
+                frames = [frame for frame, _, _ in batch]
+
+                start = time.perf_counter()
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, self.predict_batch, frames
+                    )
+                except Exception as e:
+                    # Drop this coroutine's own frame from the traceback: callers may
+                    # clear the frames of the exception they receive, and a cleared
+                    # suspended frame would close the worker.
+                    error = e.with_traceback(e.__traceback__.tb_next)
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                compute_time = time.perf_counter() - start
+                STAGE_SECONDS.observe(compute_time, stage="inference_batch")
+                BATCH_SIZE.observe(len(batch))
+
+                for (_, future, submitted), result in zip(batch, results):
+                    STAGE_SECONDS.observe(start - submitted, stage="inference_queue")
+                    if not future.done():
+                        timing = InferenceTiming(
+                            queue_time=start - submitted,
+                            compute_time=compute_time,
+                            batch_size=len(batch),
+                        )
+                        future.set_result((result, timing))
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference scheduler stopped."))
+            raise
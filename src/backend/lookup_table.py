@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class LookupTable:
+    """
+    A dense per-axis grid of precomputed screen coordinates.
+
+    Axis 0 maps (head_x, theta) to monitor_x and axis 1 maps (head_y, phi) to monitor_y.
+    Lookups outside of the grid bounds are clamped to its edges, see contains.
+    """
+
+    position_bounds: np.ndarray  # (2, 2): [axis, (low, high)] head positions.
+    angle_bounds: np.ndarray  # (2, 2): [axis, (low, high)] gaze angles.
+    values: np.ndarray  # (2, resolution, resolution): [axis, position, angle].
+    num_points: int  # Size of the calibration map the table was built from.
+    position_interpolation_weight: float
+    # Deviations from exact interpolation measured at the grid cell centres during
+    # validation: the largest one, and the one at the agent's tolerance quantile.
+    max_error: float
+    quantile_error: float
+    # Parameters of the agent that built the table: initial resolution, max resolution,
+    # tolerance, tolerance quantile and margin. None when unknown, for older profiles.
+    build_parameters: Optional[Tuple[float, ...]] = None
+
+    @property
+    def resolution(self) -> int:
+        return self.values.shape[-1]
+
+    @staticmethod
+    def grid_coordinates(
+        position_bounds: np.ndarray, angle_bounds: np.ndarray, resolution: int
+    ):
+        """
+        Return the node coordinates of a grid for both axes.
+
+        Args:
+            position_bounds (np.ndarray): Per-axis (low, high) head positions, shape (2, 2).
+            angle_bounds (np.ndarray): Per-axis (low, high) gaze angles, shape (2, 2).
+            resolution (int): Number of nodes along each grid dimension.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Node positions and angles, each (2, resolution).
+        """
+        steps = np.linspace(0.0, 1.0, resolution)
+        positions = position_bounds[:, :1] + steps * np.diff(position_bounds, axis=1)
+        angles = angle_bounds[:, :1] + steps * np.diff(angle_bounds, axis=1)
+        return positions, angles
+
+    def contains(self, positions: np.ndarray, angles: np.ndarray) -> np.ndarray:
+        """
+        Return whether queries lie within the grid bounds on both axes.
+
+        Args:
+            positions (np.ndarray): Head position per axis, shape (2, ...).
+            angles (np.ndarray): Gaze angle per axis, shape (2, ...), broadcastable
+                against positions.
+
+        Returns:
+            np.ndarray: Whether each query can be looked up, shape (...).
+        """
+        positions, angles = np.asarray(positions), np.asarray(angles)
+        shape = (2,) + (1,) * (max(positions.ndim, angles.ndim) - 1)
+        position_bounds = self.position_bounds.reshape(shape + (2,))
+        angle_bounds = self.angle_bounds.reshape(shape + (2,))
+        inside = (
+            (positions >= position_bounds[..., 0])
+            & (positions <= position_bounds[..., 1])
+            & (angles >= angle_bounds[..., 0])
+            & (angles <= angle_bounds[..., 1])
+        )
+        return inside.all(axis=0)
+
+    def lookup(self, positions: np.ndarray, angles: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly interpolate screen coordinates for both axes.
+
+        Args:
+            positions (np.ndarray): Head position per axis, shape (2, ...).
+            angles (np.ndarray): Gaze angle per axis, shape (2, ...), broadcastable
+                against positions.
+
+        Returns:
+            np.ndarray: Screen coordinates per axis, shape (2, ...).
+        """
+        positions, angles = np.asarray(positions), np.asarray(angles)
+        shape = (2,) + (1,) * (max(positions.ndim, angles.ndim) - 1)
+        position_low = self.position_bounds[:, 0].reshape(shape)
+        position_span = np.diff(self.position_bounds, axis=1).reshape(shape)
+        angle_low = self.angle_bounds[:, 0].reshape(shape)
+        angle_span = np.diff(self.angle_bounds, axis=1).reshape(shape)
+
+        last = self.resolution - 1
+        u = np.clip((positions - position_low) / position_span * last, 0, last)
+        v = np.clip((angles - angle_low) / angle_span * last, 0, last)
+        u, v = np.broadcast_arrays(u, v)
+        i = np.minimum(u.astype(np.intp), last - 1)
+        j = np.minimum(v.astype(np.intp), last - 1)
+        du, dv = u - i, v - j
+
+        axes = np.arange(2).reshape(shape)
+        values = self.values
+        top = (1 - dv) * values[axes, i, j] + dv * values[axes, i, j + 1]
+        bottom = (1 - dv) * values[axes, i + 1, j] + dv * values[axes, i + 1, j + 1]
+        return (1 - du) * top + du * bottom
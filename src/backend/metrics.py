@@ -0,0 +1,315 @@
+"""
+Latency histograms and counters of the gaze pipeline, in the Prometheus text format.
+
+Metrics are off by default: timers then return a shared no-op context manager and
+counters return at once, so instrumented code pays a flag check only. Call
+METRICS.enable() (the app does when METRICS_ENABLED=1) to start recording.
+
+Metrics are recorded per process. With inference worker processes (INFERENCE_WORKERS),
+the detection and forward stages run in the workers and are not recorded, while the
+scheduler's batch timing still covers them.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond calibration queries to slow forwards.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+_NOOP = nullcontext()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self, registry: "MetricsRegistry", name: str, documentation: str, labelnames=()
+    ):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}."
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. of frames without a face."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            # Unlabeled counters start at zero, so rates work from the first scrape.
+            values = [((), 0)]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. the inference queue depth."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: str) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """A distribution of observed values in cumulative buckets, e.g. stage latencies."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: counts per bucket (the last one is +Inf) and the sum.
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def _timer(self, labels: Dict[str, str]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def time(self, **labels: str):
+        """Return a context manager observing the seconds spent in it."""
+        if not self.registry.enabled:
+            return _NOOP
+        return self._timer(labels)
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [
+                (key, list(counts), self._sums[key])
+                for key, counts in sorted(self._counts.items())
+            ]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    A set of metrics rendered together, disabled until enable() is called.
+
+    Collectors are functions run before rendering, to set gauges from the current state
+    of components, e.g. the queue depth of the inference scheduler.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], None]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram(self, name, documentation, labelnames, buckets=buckets)
+        )
+
+    def add_collector(self, name: str, collector: Callable[[], None]):
+        """Run a function before each render, replacing any collector of that name."""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def remove_collector(self, name: str):
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            collectors = list(self._collectors.values())
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    "gaze_stage_duration_seconds",
+    "Duration of the processing stages of a frame.",
+    labelnames=("stage",),
+)
+BATCH_SIZE = METRICS.histogram(
+    "gaze_inference_batch_size",
+    "Number of frames per batch of the inference scheduler.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+FRAMES_WITHOUT_FACE = METRICS.counter(
+    "gaze_frames_without_face_total", "Frames in which no face was detected."
+)
+EMPTY_PROFILE_QUERIES = METRICS.counter(
+    "gaze_empty_profile_queries_total",
+    "Point of regard queries against an empty calibration profile.",
+)
+PROFILES_NOT_FOUND = METRICS.counter(
+    "gaze_profiles_not_found_total", "Profile loads of a missing profile."
+)
+
+QUEUE_DEPTH = METRICS.gauge(
+    "gaze_inference_queue_depth", "Frames waiting for the inference scheduler."
+)
+READY = METRICS.gauge("gaze_ready", "Whether the gaze model is ready to serve.")
+STARTUP_STAGE_SECONDS = METRICS.gauge(
+    "gaze_startup_stage_duration_seconds",
+    "Duration of the startup stages of the inference stack.",
+    labelnames=("stage",),
+)
+MOTION_GATE_SKIP_RATE = METRICS.gauge(
+    "gaze_motion_gate_skip_rate",
+    "Fraction of frames served from the motion gate cache.",
+)
+CALIBRATION_SESSIONS = METRICS.gauge(
+    "gaze_calibration_sessions", "Calibration sessions held in memory."
+)
+
+
+def time_stage(stage: str):
+    """Return a context manager recording the duration of a stage, when enabled."""
+    if not METRICS.enabled:
+        return _NOOP
+    return STAGE_SECONDS._timer({"stage": stage})
@@ -0,0 +1,76 @@
+"""
+Conversion of gaze network weights to a memory-mappable checkpoint.
+
+The original L2CS weights are a pickle that torch.load reads and copies into memory in
+full. Converted weights are a plain state dict of contiguous tensors in the zip
+checkpoint format, which torch.load memory-maps: tensors are paged in from the file on
+first use and the page cache is shared between processes and restarts.
+
+Usage:
+    python -m src.backend.model_weights models/L2CSNet_gaze360.pkl models/L2CSNet_gaze360.pt
+"""
+
+import argparse
+import zipfile
+from contextlib import contextmanager
+
+import torch
+from torch import nn
+
+try:
+    from torch.utils.serialization import config as serialization_config
+except ImportError:  # Older torch versions cannot mmap through torch.load defaults.
+    serialization_config = None
+
+
+def convert_weights(source: str, destination: str):
+    """
+    Convert a weights file to a memory-mappable state dict checkpoint.
+
+    Args:
+        source (str): The original weights, a pickled state dict or model.
+        destination (str): Where to write the converted weights.
+    """
+    weights = torch.load(source, map_location="cpu", weights_only=False)
+    if isinstance(weights, nn.Module):
+        weights = weights.state_dict()
+    torch.save(
+        {name: tensor.contiguous() for name, tensor in weights.items()}, destination
+    )
+
+
+def is_mappable(path: str) -> bool:
+    """Whether a weights file is in the zip checkpoint format torch.load can mmap."""
+    return zipfile.is_zipfile(path)
+
+
+@contextmanager
+def mmap_loading(path: str):
+    """
+    Make torch.load memory-map a weights file while in the context.
+
+    Used around code loading weights by path itself, such as the L2CS Pipeline. Has no
+    effect on files in the legacy format, nor on torch versions without
+    torch.utils.serialization.config.
+    """
+    if serialization_config is None or not is_mappable(path):
+        yield
+        return
+    previous = serialization_config.load.mmap
+    serialization_config.load.mmap = True
+    try:
+        yield
+    finally:
+        serialization_config.load.mmap = previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="Original weights file.")
+    parser.add_argument("destination", help="Converted weights file.")
+    args = parser.parse_args()
+    convert_weights(args.source, args.destination)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+GazeVector = Tuple[float, float, float, float]
+
+
+class MotionGate:
+    """
+    Skips gaze inference for frames that barely differ from the last inferred frame.
+
+    Frames are compared through a small grayscale thumbnail: each thumbnail cell averages
+    a block of pixels, which smooths out sensor noise, while a moving pupil or head still
+    changes the cells it covers. When no cell changed by more than the threshold, the
+    gaze vector of the last inferred frame is reused. Every `max_skips` consecutive skips,
+    inference runs anyway.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 4.0,
+        max_skips: int = 30,
+        signature_size: Tuple[int, int] = (64, 36),
+    ):
+        """
+        Initialize the MotionGate.
+
+        Args:
+            threshold (float): Largest change of a thumbnail cell, in gray levels (0-255),
+                for a frame to count as unchanged.
+            max_skips (int): Maximum number of consecutive frames served from the cache.
+            signature_size (Tuple[int, int]): Width and height of the thumbnail.
+        """
+        self.threshold = threshold
+        self.max_skips = max_skips
+        self.signature_size = signature_size
+
+        self._signature = None
+        self._gaze_vector = None
+        self._consecutive_skips = 0
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.skipped = 0
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        """Return the grayscale thumbnail a frame is compared by."""
+        if frame.ndim == 3 and frame.shape[2] == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(frame, self.signature_size, interpolation=cv2.INTER_AREA)
+        return thumbnail.astype(np.int16)
+
+    def lookup(
+        self, frame: Optional[np.ndarray]
+    ) -> Tuple[Optional[GazeVector], Optional[np.ndarray]]:
+        """
+        Look up the cached gaze vector for a frame.
+
+        Args:
+            frame (Optional[np.ndarray]): The incoming frame.
+
+        Returns:
+            Tuple[Optional[GazeVector], Optional[np.ndarray]]: The cached gaze vector,
+            or None if the frame must be inferred, and the frame signature for update.
+        """
+        signature = self.signature(frame) if frame is not None else None
+        with self._lock:
+            self.frames += 1
+            if (
+                signature is not None
+                and self._signature is not None
+                and self._consecutive_skips < self.max_skips
+                and np.max(np.abs(signature - self._signature)) <= self.threshold
+            ):
+                self._consecutive_skips += 1
+                self.skipped += 1
+                return self._gaze_vector, signature
+        return None, signature
+
+    def update(self, signature: Optional[np.ndarray], gaze_vector: GazeVector):
+        """
+        Record the gaze vector inferred for a frame.
+
+        Args:
+            signature (Optional[np.ndarray]): The frame signature returned by lookup.
+            gaze_vector (GazeVector): The inferred gaze vector.
+        """
+        with self._lock:
+            self._consecutive_skips = 0
+            if signature is None or gaze_vector[0] is None:
+                # Keep looking for a face on every frame.
+                self._signature, self._gaze_vector = None, None
+                return
+            self._signature, self._gaze_vector = signature, gaze_vector
+
+    @property
+    def skip_rate(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+
+class MotionGates:
+    """
+    A bounded LRU collection of motion gates, one per session or stream.
+
+    Counters of removed and evicted gates are kept, so stats cover all frames.
+    """
+
+    def __init__(self, capacity: int = 1024, **gate_kwargs):
+        """
+        Initialize the MotionGates.
+
+        Args:
+            capacity (int): Maximum number of gates kept.
+            **gate_kwargs: Keyword arguments of the MotionGate constructor.
+        """
+        self.capacity = capacity
+        self.gate_kwargs = gate_kwargs
+        self._gates: "OrderedDict[str, MotionGate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._skipped = 0
+
+    def get(self, key: str) -> MotionGate:
+        """Return the gate of a session, creating it if needed."""
+        with self._lock:
+            gate = self._gates.get(key)
+            if gate is None:
+                gate = self._gates[key] = MotionGate(**self.gate_kwargs)
+            self._gates.move_to_end(key)
+            while len(self._gates) > self.capacity:
+                self._retire(self._gates.popitem(last=False)[1])
+            return gate
+
+    def remove(self, key: str):
+        """Drop the gate of a session, e.g. when its stream closes."""
+        with self._lock:
+            gate = self._gates.pop(key, None)
+            if gate is not None:
+                self._retire(gate)
+
+    def _retire(self, gate: MotionGate):
+        self._frames += gate.frames
+        self._skipped += gate.skipped
+
+    def stats(self) -> Dict[str, float]:
+        """Return the frame counters over all gates."""
+        with self._lock:
+            frames = self._frames + sum(gate.frames for gate in self._gates.values())
+            skipped = self._skipped + sum(gate.skipped for gate in self._gates.values())
+            return {
+                "gates": len(self._gates),
+                "frames": frames,
+                "skipped": skipped,
+                "skip_rate": skipped / frames if frames else 0.0,
+            }
@@ -0,0 +1,116 @@
+from typing import Sequence
+
+import cv2
+import numpy as np
+import torch
+
+# Normalization of the ImageNet-pretrained L2CS backbone, per RGB channel.
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class FacePreprocessor:
+    """
+    Turns face regions of frames into the input tensor of the gaze network, in place.
+
+    Faces are cropped and resized into a preallocated uint8 batch, upsampled to the
+    network input size, and normalized into a float tensor that is also allocated once,
+    so steady-state preprocessing allocates no image-sized arrays. The result matches
+    the L2CS preprocessing of Pipeline.step: a 224x224 crop converted to RGB, resized
+    to 448x448 and normalized.
+
+    Buffers are reused by every batch, so a preprocessor must not prepare two batches
+    at once.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 8,
+        crop_size: int = 224,
+        input_size: int = 448,
+        mean: Sequence[float] = IMAGENET_MEAN,
+        std: Sequence[float] = IMAGENET_STD,
+        device: torch.device = torch.device("cpu"),
+    ):
+        """
+        Initialize the FacePreprocessor.
+
+        Args:
+            max_batch_size (int): Number of faces the buffers hold.
+            crop_size (int): Height and width of the face crops.
+            input_size (int): Height and width of the network input.
+            mean (Sequence[float]): Per-channel mean subtracted from inputs in [0, 1].
+            std (Sequence[float]): Per-channel standard deviation inputs are divided by.
+            device (torch.device): Device of the network input.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be a positive integer.")
+        self.max_batch_size = max_batch_size
+        self.crop_size = crop_size
+        self.input_size = input_size
+
+        # RGB face crops, the BGR or grayscale resize goes through a scratch crop.
+        self.crops = np.empty((max_batch_size, crop_size, crop_size, 3), np.uint8)
+        self._bgr_crop = np.empty((crop_size, crop_size, 3), np.uint8)
+        self._gray_crop = np.empty((crop_size, crop_size), np.uint8)
+        self._resized = np.empty((max_batch_size, input_size, input_size, 3), np.uint8)
+        with torch.inference_mode():
+            # NHWC uint8 view of the resized crops, shares their memory.
+            self._resized_tensor = torch.from_numpy(self._resized)
+            self._input = torch.empty(
+                (max_batch_size, 3, input_size, input_size),
+                dtype=torch.float32,
+                device=device,
+            )
+            # (x / 255 - mean) / std as a single multiply-add.
+            std = torch.tensor(std, dtype=torch.float32, device=device)
+            mean = torch.tensor(mean, dtype=torch.float32, device=device)
+            self._scale = (1 / (255 * std)).view(1, 3, 1, 1)
+            self._offset = (-mean / std).view(1, 3, 1, 1)
+
+    def crop(self, index: int, image: np.ndarray, box: Sequence[float]):
+        """
+        Cut a face out of an image into a slot of the batch, as an RGB crop.
+
+        Args:
+            index (int): Slot of the face in the batch, below max_batch_size.
+            image (np.ndarray): Image (BGR, or grayscale with 2 dims or 1 channel).
+            box (Sequence[float]): Bounding box [x_min, y_min, x_max, y_max].
+        """
+        x_min, y_min = max(int(box[0]), 0), max(int(box[1]), 0)
+        x_max, y_max = int(box[2]), int(box[3])
+        face = image[y_min:y_max, x_min:x_max]
+        size = (self.crop_size, self.crop_size)
+        if face.ndim == 3 and face.shape[2] == 3:
+            # The network was trained on RGB crops, as produced by Pipeline.step.
+            cv2.resize(face, size, dst=self._bgr_crop)
+            cv2.cvtColor(self._bgr_crop, cv2.COLOR_BGR2RGB, dst=self.crops[index])
+        else:
+            # Raw grayscale frames: only the crop is converted to three channels.
+            cv2.resize(face, size, dst=self._gray_crop)
+            cv2.cvtColor(self._gray_crop, cv2.COLOR_GRAY2RGB, dst=self.crops[index])
+
+    def prepare(self, count: int) -> torch.Tensor:
+        """
+        Convert the first crops of the batch to the network input.
+
+        Call under torch.inference_mode(), the buffers are inference tensors.
+
+        Args:
+            count (int): Number of crops to convert.
+
+        Returns:
+            torch.Tensor: A (count, 3, input_size, input_size) view of the input
+            buffer, overwritten by the next call.
+        """
+        size = (self.input_size, self.input_size)
+        for index in range(count):
+            cv2.resize(
+                self.crops[index],
+                size,
+                dst=self._resized[index],
+                interpolation=cv2.INTER_LINEAR,
+            )
+        images = self._input[:count]
+        images.copy_(self._resized_tensor[:count].permute(0, 3, 1, 2))
+        return images.mul_(self._scale).add_(self._offset)
@@ -0,0 +1,168 @@
+import cProfile
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+
+PROFILING_MODES = ("cprofile", "torch", "both")
+
+# Trace files are named <stem>.pstats or <stem>.trace.json, stems sort by time.
+TRACE_FILENAME = re.compile(r"^(\d{8}-\d{6}-\d{6}-[\w-]+)\.(pstats|trace\.json)$")
+
+
+class RequestProfiler:
+    """
+    Profiles one in every N sampled calls and keeps the most recent traces on disk.
+
+    Sampled calls run under cProfile (a .pstats file, for pstats or snakeviz) and/or the
+    PyTorch profiler (a .trace.json file, for chrome://tracing or Perfetto). The trace
+    directory is a ring: beyond max_traces sampled calls, the oldest traces are deleted.
+    With sample_every set to 0, sample() returns False on a single comparison.
+    """
+
+    def __init__(
+        self,
+        directory: str = "profiles",
+        sample_every: int = 0,
+        mode: str = "cprofile",
+        max_traces: int = 20,
+    ):
+        """
+        Initialize the RequestProfiler.
+
+        Args:
+            directory (str): Where traces are written, created on first use.
+            sample_every (int): Profile one in every sample_every calls, 0 disables.
+            mode (str): One of PROFILING_MODES.
+            max_traces (int): Number of sampled calls whose traces are kept.
+        """
+        self.directory = directory
+        self.configure(sample_every=sample_every, mode=mode, max_traces=max_traces)
+        self._calls = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        sample_every: Optional[int] = None,
+        mode: Optional[str] = None,
+        max_traces: Optional[int] = None,
+    ):
+        """Change the sampling settings, leaving those passed as None unchanged."""
+        if sample_every is not None:
+            if sample_every < 0:
+                raise ValueError("sample_every must be 0 (disabled) or positive.")
+            self.sample_every = sample_every
+        if mode is not None:
+            if mode not in PROFILING_MODES:
+                raise ValueError(
+                    f"Unknown profiling mode '{mode}', expected one of "
+                    f"{', '.join(PROFILING_MODES)}."
+                )
+            self.mode = mode
+        if max_traces is not None:
+            if max_traces < 1:
+                raise ValueError("max_traces must be positive.")
+            self.max_traces = max_traces
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_every > 0
+
+    def sample(self) -> bool:
+        """Count a call, and return whether it is to be profiled."""
+        if self.sample_every <= 0:
+            return False
+        with self._lock:
+            self._calls += 1
+            return self._calls % self.sample_every == 0
+
+    def _next_stem(self, label: str) -> str:
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        label = re.sub(r"[^\w-]", "_", label) or "call"
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{sequence % 1000000:06d}-{label}"
+
+    def profile_call(self, label: str, fn: Callable, *args) -> Tuple[Any, str]:
+        """
+        Run a function under the profilers and write its traces.
+
+        The cProfile profiler only sees the calling thread, so call this on the thread
+        doing the work, e.g. the inference thread of the scheduler.
+
+        Args:
+            label (str): Name of the profiled call in the trace filenames, e.g. the route.
+            fn (Callable): The function to profile.
+            *args: Positional arguments for the function.
+
+        Returns:
+            Tuple[Any, str]: The return value of the function and the trace stem.
+        """
+        stem = self._next_stem(label)
+        use_torch = self.mode in ("torch", "both")
+        use_cprofile = self.mode in ("cprofile", "both")
+        with ExitStack() as stack:
+            torch_profiler = None
+            if use_torch:
+                activities = [torch.profiler.ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(torch.profiler.ProfilerActivity.CUDA)
+                torch_profiler = stack.enter_context(
+                    torch.profiler.profile(activities=activities, record_shapes=True)
+                )
+            if use_cprofile:
+                python_profiler = cProfile.Profile()
+                python_profiler.enable()
+                stack.callback(python_profiler.disable)
+            result = fn(*args)
+
+        os.makedirs(self.directory, exist_ok=True)
+        if use_cprofile:
+            python_profiler.dump_stats(os.path.join(self.directory, f"{stem}.pstats"))
+        if torch_profiler is not None:
+            torch_profiler.export_chrome_trace(
+                os.path.join(self.directory, f"{stem}.trace.json")
+            )
+        self._prune()
+        return result, stem
+
+    def traces(self) -> List[str]:
+        """Return the trace filenames in the directory, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.directory) if TRACE_FILENAME.match(name)
+        )
+
+    def trace_path(self, name: str) -> str:
+        """Return the path of a trace by filename, or raise KeyError if it is unknown."""
+        if name not in self.traces():
+            raise KeyError(name)
+        return os.path.join(self.directory, name)
+
+    def _prune(self):
+        # Traces of a sampled call share a stem, the oldest stems go first.
+        stems: Dict[str, List[str]] = {}
+        for name in self.traces():
+            stems.setdefault(TRACE_FILENAME.match(name).group(1), []).append(name)
+        for stem in sorted(stems)[: -self.max_traces]:
+            for name in stems[stem]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_every": self.sample_every,
+            "mode": self.mode,
+            "max_traces": self.max_traces,
+            "directory": self.directory,
+            "traces": self.traces(),
+        }
@@ -1,10 +1,19 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
+from starlette.concurrency import run_in_threadpool
 
 from src.backend.calibration_agents import CalibrationAgent
-from src.backend.calibration_profile_store import CalibrationProfileStore
-from src.backend.gaze_predictor import GazePredictor
+from src.backend.calibration_profile_store import AsyncCalibrationProfileStore
+from src.backend.calibration_session_cache import CalibrationSessionCache
+from src.backend.gaze_predictor import FaceTracker, GazePredictor
+from src.backend.metrics import (
+    EMPTY_PROFILE_QUERIES,
+    FRAMES_WITHOUT_FACE,
+    PROFILES_NOT_FOUND,
+    time_stage,
+)
+from src.backend.motion_gate import MotionGate
 
 
 class VisionTrackingEngine:
@@ -16,7 +25,8 @@ class VisionTrackingEngine:
         self,
         gaze_predictor: GazePredictor,
         cal_agent: CalibrationAgent,
-        cps=CalibrationProfileStore,
+        cps=AsyncCalibrationProfileStore,
+        sessions: Optional[CalibrationSessionCache] = None,
     ):
         """
         Initialize the VisionTrackingEngine.
@@ -24,81 +34,266 @@ class VisionTrackingEngine:
         Args:
             gaze_predictor (GazePredictor): An instance of GazePredictor for predicting gaze vectors.
             cal_agent (CalibrationAgent): An instance of CalibrationAgent for calibration tasks.
-            cps (CalibrationProfileStore): An instance of CalibrationProfileStore for storing and retrieving calibration profiles.
+            cps (AsyncCalibrationProfileStore): An instance of AsyncCalibrationProfileStore for storing and retrieving calibration profiles.
+            sessions (Optional[CalibrationSessionCache]): Calibration agents of named sessions.
+                Without a session id, the engine uses cal_agent.
         """
         self.gaze_predictor = gaze_predictor
         self.cal_agent = cal_agent
         self.cps = cps
+        self.sessions = sessions
 
-    def save_profile(self, name):
-        self.cps.save_profile(name, self.cal_agent.calibration_map)
+    async def get_agent(self, session_id: Optional[str] = None) -> CalibrationAgent:
+        """
+        Return the calibration agent of a session.
+
+        Args:
+            session_id (Optional[str]): The session identifier, None for the default agent.
+
+        Returns:
+            CalibrationAgent: The calibration agent of the session.
+        """
+        if session_id is None:
+            return self.cal_agent
+        if self.sessions is None:
+            raise ValueError("Calibration sessions are not enabled.")
+        return await self.sessions.get_agent(session_id)
+
+    async def save_profile(self, name, session_id: Optional[str] = None):
+        cal_agent = await self.get_agent(session_id)
+        # Building a lookup table takes a while, keep it off the event loop.
+        await run_in_threadpool(cal_agent.finalize_cal_map)
+        await self.cps.save_profile(
+            name, cal_agent.calibration_map, agent_type=cal_agent.agent_type
+        )
+
+    async def load_profile(self, id, session_id: Optional[str] = None) -> bool:
+        calibration_map = await self.cps.load_profile(id)
+        if calibration_map is None:
+            print("Profile not found.")
+            PROFILES_NOT_FOUND.inc()
+            return False
+        cal_agent = await self.get_agent(session_id)
+        cal_agent.calibration_map = calibration_map
+        # E.g. rebuilds a lookup table built with other parameters, off the event loop.
+        await run_in_threadpool(cal_agent.finalize_cal_map)
+        return True
 
-    def load_profile(self, id):
-        self.cal_agent.calibration_map = self.cps.load_profile(id)
+    async def reset_profile(self, session_id: Optional[str] = None):
+        (await self.get_agent(session_id)).initialize_cal_map()
 
-    def list_profiles(self):
-        return self.cps.list_profiles()
+    async def list_profiles(self):
+        return await self.cps.list_profiles()
 
-    def delete_profile(self, id):
-        self.cps.delete_profile(id)
+    async def delete_profile(self, id):
+        await self.cps.delete_profile(id)
+
+    def add_calibration_point(
+        self,
+        monitor_x: float,
+        monitor_y: float,
+        gaze_vector: Tuple[float, float, float, float],
+        cal_agent: Optional[CalibrationAgent] = None,
+    ) -> bool:
+        """
+        Add a calibration point from an already predicted gaze vector.
+
+        Args:
+            monitor_x (float): X coordinate on the screen.
+            monitor_y (float): Y coordinate on the screen.
+            gaze_vector (Tuple[float, float, float, float]): Head position and gaze angles.
+            cal_agent (Optional[CalibrationAgent]): The agent of a calibration session,
+                see get_agent. Defaults to the engine's own agent.
+
+        Returns:
+            bool: Whether the point was added, i.e. a face was detected.
+        """
+        head_x, head_y, theta, phi = gaze_vector
+        if theta is None:
+            print("No face detected.")
+            FRAMES_WITHOUT_FACE.inc()
+            return False
+        (cal_agent or self.cal_agent).calibration_step(
+            monitor_x, monitor_y, head_x, head_y, theta, phi
+        )
+        return True
 
     def run_single_calibration_step(
-        self, head_x: float, head_y: float, frame: np.ndarray
-    ):
+        self,
+        monitor_x: float,
+        monitor_y: float,
+        frame: np.ndarray,
+        tracker: Optional[FaceTracker] = None,
+    ) -> bool:
         """
         Perform a single calibration step using GazePredictor and CalibrationAgent.
 
         Args:
-            x (float): X coordinate on the screen.
-            y (float): Y coordinate on the screen.
+            monitor_x (float): X coordinate on the screen.
+            monitor_y (float): Y coordinate on the screen.
             frame (np.ndarray): The input image for gaze prediction.
+            tracker (Optional[FaceTracker]): Face tracking state for streamed frames.
+
+        Returns:
+            bool: Whether the point was added, i.e. a face was detected.
         """
-        monitor_x, monitor_y, theta, phi = self.gaze_predictor.predict_gaze_vector(
-            frame
-        )
-        self.cal_agent.calibration_step(
-            head_x, head_y, monitor_x, monitor_y, theta, phi
-        )
+        gaze_vector = self.gaze_predictor.predict_gaze_vector(frame, tracker)
+        return self.add_calibration_point(monitor_x, monitor_y, gaze_vector)
+
+    def add_calibration_points(
+        self,
+        monitor_points: List[Tuple[float, float]],
+        gaze_vectors: List[Tuple[float, float, float, float]],
+        cal_agent: Optional[CalibrationAgent] = None,
+    ) -> List[bool]:
+        """
+        Add several calibration points from already predicted gaze vectors at once.
+
+        Points whose frame had no face are skipped, and the others are added together,
+        so the calibration never holds part of them.
+
+        Args:
+            monitor_points (List[Tuple[float, float]]): Screen coordinates (x, y).
+            gaze_vectors (List[Tuple[float, float, float, float]]): Head position and
+                gaze angles per point.
+            cal_agent (Optional[CalibrationAgent]): The agent of a calibration session,
+                see get_agent. Defaults to the engine's own agent.
+
+        Returns:
+            List[bool]: Whether each point was added, i.e. a face was detected.
+        """
+        added = [gaze_vector[2] is not None for gaze_vector in gaze_vectors]
+        FRAMES_WITHOUT_FACE.inc(len(added) - sum(added))
+        points = [
+            (*monitor_point, *gaze_vector)
+            for monitor_point, gaze_vector, face in zip(
+                monitor_points, gaze_vectors, added
+            )
+            if face
+        ]
+        if points:
+            (cal_agent or self.cal_agent).calibration_steps(
+                np.array(points, dtype=np.float64).T
+            )
+        return added
 
     def run_calibration_steps(
         self, calibration_data: List[Tuple[int, int, np.ndarray]]
-    ):
+    ) -> List[bool]:
         """
         Perform calibration steps for provided data.
 
+        Gaze vectors of all frames are predicted in one batch, and the points are added
+        at once.
+
         Args:
             calibration_data (List[Tuple[int, int, np.ndarray]]): List of tuples containing
             x, y screen coordinates and corresponding image data.
+
+        Returns:
+            List[bool]: Whether each point was added, i.e. a face was detected.
         """
-        for calibration_point in calibration_data:
-            try:
-                self.run_single_calibration_step(
-                    calibration_point[0], calibration_point[1], calibration_point[2]
-                )
-            except Exception as e:
-                print(f"Calibration step failed for point {calibration_point}: {e}")
+        if not calibration_data:
+            return []
+        gaze_vectors = self.gaze_predictor.predict_gaze_vectors(
+            [frame for _, _, frame in calibration_data]
+        )
+        return self.add_calibration_points(
+            [(x, y) for x, y, _ in calibration_data], gaze_vectors
+        )
 
-    def predict_gaze_position(self, image: np.ndarray) -> Tuple[float, float]:
+    def estimate_point_of_regard(
+        self,
+        gaze_vector: Tuple[float, float, float, float],
+        cal_agent: Optional[CalibrationAgent] = None,
+    ) -> Tuple[float, float]:
         """
-        Predict the gaze position on the screen for a given image.
+        Estimate the point of regard for an already predicted gaze vector.
 
         Args:
-            image (np.ndarray): The input image for gaze prediction.
+            gaze_vector (Tuple[float, float, float, float]): Head position and gaze angles.
+            cal_agent (Optional[CalibrationAgent]): The agent of a calibration session,
+                see get_agent. Defaults to the engine's own agent.
 
         Returns:
             Tuple[float, float]: The predicted screen coordinates (x, y).
         """
-        head_x, head_y, theta, phi = self.gaze_predictor.predict_gaze_vector(image)
+        head_x, head_y, theta, phi = gaze_vector
 
         try:
-            screen_x, screen_y = self.cal_agent.calculate_point_of_regard(
-                head_x, head_y, theta, phi
-            )
+            with time_stage("interpolate"):
+                screen_x, screen_y = (
+                    cal_agent or self.cal_agent
+                ).calculate_point_of_regard(head_x, head_y, theta, phi)
 
         except ZeroDivisionError:
             print("Calibration profile is empty.")
+            EMPTY_PROFILE_QUERIES.inc()
             screen_x, screen_y = None, None
         except TypeError:
             print("No face detected.")
+            FRAMES_WITHOUT_FACE.inc()
             screen_x, screen_y = None, None
         return screen_x, screen_y
+
+    def estimate_points_of_regard(
+        self,
+        gaze_vectors: List[Tuple[float, float, float, float]],
+        cal_agent: Optional[CalibrationAgent] = None,
+    ) -> List[Tuple[float, float]]:
+        """
+        Estimate the points of regard for several already predicted gaze vectors.
+
+        Args:
+            gaze_vectors (List[Tuple[float, float, float, float]]): Head positions and gaze angles.
+            cal_agent (Optional[CalibrationAgent]): The agent of a calibration session,
+                see get_agent. Defaults to the engine's own agent.
+
+        Returns:
+            List[Tuple[float, float]]: The predicted screen coordinates (x, y) per vector.
+        """
+        return [
+            self.estimate_point_of_regard(vector, cal_agent) for vector in gaze_vectors
+        ]
+
+    def predict_gaze_position(
+        self,
+        image: np.ndarray,
+        tracker: Optional[FaceTracker] = None,
+        gate: Optional[MotionGate] = None,
+    ) -> Tuple[float, float]:
+        """
+        Predict the gaze position on the screen for a given image.
+
+        Args:
+            image (np.ndarray): The input image for gaze prediction.
+            tracker (Optional[FaceTracker]): Face tracking state for streamed frames.
+            gate (Optional[MotionGate]): Reuses the gaze vector of the last inferred
+                frame when the image barely changed.
+
+        Returns:
+            Tuple[float, float]: The predicted screen coordinates (x, y).
+        """
+        gaze_vector, signature = gate.lookup(image) if gate else (None, None)
+        if gaze_vector is None:
+            gaze_vector = self.gaze_predictor.predict_gaze_vector(image, tracker)
+            if gate:
+                gate.update(signature, gaze_vector)
+        return self.estimate_point_of_regard(gaze_vector)
+
+    def predict_gaze_positions(
+        self, images: List[np.ndarray], cal_agent: Optional[CalibrationAgent] = None
+    ) -> List[Tuple[float, float]]:
+        """
+        Predict the gaze positions on the screen for several images at once.
+
+        Args:
+            images (List[np.ndarray]): The input images for gaze prediction.
+            cal_agent (Optional[CalibrationAgent]): The agent of a calibration session,
+                see get_agent. Defaults to the engine's own agent.
+
+        Returns:
+            List[Tuple[float, float]]: The predicted screen coordinates (x, y) per image.
+        """
+        gaze_vectors = self.gaze_predictor.predict_gaze_vectors(images)
+        return self.estimate_points_of_regard(gaze_vectors, cal_agent)
@@ -0,0 +1,179 @@
+import csv
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from src.app.batch_processing import (
+    FramePrefetcher,
+    checkpoint_path,
+    image_records,
+    list_images,
+    load_frame,
+    process_recording,
+)
+from src.backend.calibration_agents import InterpolationAgent
+
+
+class FakePredictor:
+    """Reports the mean of each frame as its head position, dark frames have no face."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.frames = 0
+
+    def predict_gaze_vectors(self, images):
+        self.frames += len(images)
+        if self.fail_after is not None and self.frames > self.fail_after:
+            raise RuntimeError("Interrupted.")
+        return [
+            (None, None, None, None)
+            if image is None or image.mean() < 20
+            else (float(image.mean()), 1.0, 0.1, 0.2)
+            for image in images
+        ]
+
+    @staticmethod
+    def scale_gaze_vector(gaze_vector, scale):
+        x, y, pitch, yaw = gaze_vector
+        if x is None:
+            return gaze_vector
+        return x * scale, y * scale, pitch, yaw
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+class TestBatchProcessing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.video = os.path.join(self.tmpdir.name, "session.avi")
+        writer = cv2.VideoWriter(
+            self.video, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48)
+        )
+        # Every fifth frame is dark, i.e. has no face.
+        for index in range(23):
+            value = 0 if index % 5 == 0 else 40 + 5 * index
+            writer.write(np.full((48, 64, 3), value, dtype=np.uint8))
+        writer.release()
+
+        self.agent = InterpolationAgent()
+        self.agent.calibration_steps(
+            np.array([[0, 100], [0, 50], [40, 160], [1, 1], [0.1, 0.1], [0.2, 0.2]])
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def output(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_video_to_csv(self):
+        output = self.output("gaze.csv")
+
+        processed = process_recording(
+            self.video, output, FakePredictor(), self.agent, batch_size=4, prefetch=3
+        )
+
+        rows = read_rows(output)
+        self.assertEqual(processed, 23)
+        self.assertEqual([int(row["frame"]) for row in rows], list(range(23)))
+        self.assertEqual(rows[5]["face"], "False")
+        self.assertEqual(rows[5]["screen_x"], "")
+        self.assertEqual(rows[6]["face"], "True")
+        self.assertGreater(float(rows[6]["timestamp_ms"]), 0)
+        expected = self.agent.calculate_point_of_regard(
+            float(rows[6]["head_x"]), 1.0, 0.1, 0.2
+        )
+        self.assertAlmostEqual(float(rows[6]["screen_x"]), expected[0])
+        self.assertFalse(os.path.exists(checkpoint_path(output)))
+
+    def test_resume_after_interruption(self):
+        expected = self.output("expected.csv")
+        process_recording(self.video, expected, FakePredictor(), self.agent)
+        output = self.output("gaze.csv")
+
+        with self.assertRaises(RuntimeError):
+            process_recording(
+                self.video,
+                output,
+                FakePredictor(fail_after=12),
+                self.agent,
+                batch_size=4,
+                checkpoint_every=8,
+            )
+        self.assertTrue(os.path.exists(checkpoint_path(output)))
+        with self.assertRaises(ValueError):
+            process_recording(self.video, output, FakePredictor(), self.agent)
+
+        predictor = FakePredictor()
+        processed = process_recording(
+            self.video, output, predictor, self.agent, resume=True, batch_size=4
+        )
+
+        self.assertEqual(processed, 11)
+        self.assertEqual(predictor.frames, 11)
+        self.assertEqual(read_rows(output), read_rows(expected))
+
+    def test_image_folder_with_downscale(self):
+        frames = os.path.join(self.tmpdir.name, "frames")
+        os.mkdir(frames)
+        for index in range(5):
+            image = np.full((64, 96, 3), 50 + index, dtype=np.uint8)
+            cv2.imwrite(os.path.join(frames, f"frame_{index:03d}.png"), image)
+        with open(os.path.join(frames, "notes.txt"), "w") as f:
+            f.write("not an image")
+        output = self.output("gaze.csv")
+
+        process_recording(frames, output, FakePredictor(), None, downscale=2)
+
+        rows = read_rows(output)
+        self.assertEqual(
+            [row["name"] for row in rows][:2], ["frame_000.png", "frame_001.png"]
+        )
+        self.assertAlmostEqual(float(rows[1]["head_x"]), 2 * 51)
+        self.assertEqual(rows[1]["screen_x"], "")
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet"),
+        "Parquet output requires pyarrow or fastparquet.",
+    )
+    def test_video_to_parquet(self):
+        import pandas
+
+        output = self.output("gaze.parquet")
+        process_recording(
+            self.video, output, FakePredictor(), self.agent, checkpoint_every=8
+        )
+
+        results = pandas.read_parquet(output)
+        self.assertEqual(list(results["frame"]), list(range(23)))
+        self.assertFalse(results["face"][10])
+        self.assertFalse(os.path.exists(f"{output}.parts"))
+
+    def test_prefetcher_stops_early(self):
+        frames = os.path.join(self.tmpdir.name, "frames")
+        os.mkdir(frames)
+        for index in range(50):
+            cv2.imwrite(
+                os.path.join(frames, f"{index:03d}.png"), np.zeros((8, 8, 3), np.uint8)
+            )
+
+        with FramePrefetcher(
+            image_records(list_images(frames)), load_frame, depth=4
+        ) as prefetcher:
+            first = [record.index for _, (record, _) in zip(range(3), prefetcher)]
+
+        self.assertEqual(first, [0, 1, 2])
+        # The reader gave up on the rest of the folder instead of blocking.
+        self.assertFalse(prefetcher._thread.is_alive())
+        self.assertLessEqual(prefetcher._queue.qsize(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from benchmarks.suite import compare_runs, measure, summarize
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_summarize(self):
+        summary = summarize([0.001] * 99 + [0.101], items=4)
+
+        self.assertEqual(summary["iterations"], 100)
+        self.assertAlmostEqual(summary["p50_ms"], 1.0)
+        self.assertGreater(summary["p99_ms"], summary["p95_ms"])
+        self.assertAlmostEqual(summary["mean_ms"], 2.0)
+        self.assertAlmostEqual(summary["throughput"], 400 / 0.2)
+
+    def test_measure_bounds_iterations(self):
+        calls = []
+        summary = measure(lambda: calls.append(1), min_time=0, warmup=2)
+
+        self.assertEqual(summary["iterations"], 5)
+        self.assertEqual(len(calls), 7)
+
+        summary = measure(lambda: None, min_time=10, max_iterations=20, warmup=0)
+        self.assertEqual(summary["iterations"], 20)
+
+    def test_compare_runs(self):
+        baseline = {"results": {"a": {"p50_ms": 10.0}, "b": {"p50_ms": 10.0}}}
+        candidate = {
+            "results": {
+                "a": {"p50_ms": 12.0},
+                "b": {"p50_ms": 8.0},
+                "c": {"p50_ms": 1.0},
+            }
+        }
+
+        rows = {row["name"]: row for row in compare_runs(baseline, candidate, 0.1)}
+
+        self.assertEqual(rows["a"]["status"], "regression")
+        self.assertAlmostEqual(rows["a"]["change"], 0.2)
+        self.assertEqual(rows["b"]["status"], "improvement")
+        self.assertEqual(rows["c"]["status"], "added")
+        rows = compare_runs(baseline, candidate, threshold=0.25)
+        self.assertEqual({row["status"] for row in rows}, {"ok", "added"})
+
+
+if __name__ == "__main__":
+    unittest.main()
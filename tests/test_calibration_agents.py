@@ -1,7 +1,18 @@
+import pickle
 import random
+import threading
 import unittest
+from unittest.mock import patch
 
-from src.backend.calibration_agents import InterpolationAgent
+import numpy as np
+
+from src.backend.calibration_agents import (
+    InterpolationAgent,
+    LookupTableAgent,
+    NearestNeighbourAgent,
+    RegressionAgent,
+    create_calibration_agent,
+)
 
 
 class TestInterpolationAgent(unittest.TestCase):
@@ -82,3 +93,335 @@ class TestInterpolationAgent(unittest.TestCase):
             calibration_angles,
         )
         self.assertAlmostEqual(interpolated_coordinate, 2 * random_monitor_coordinate)
+
+    def test_calculate_point_of_regard_matches_per_axis_interpolation(self):
+        self.ca = InterpolationAgent(position_interpolation_weight=0.5)
+        for i in range(40):
+            self.ca.calibration_step(
+                10 * i, 1000 - 7 * i, 100 + i, 200 - i, 0.01 * i, -0.02 * i
+            )
+
+        x_screen, y_screen = self.ca.calculate_point_of_regard(120, 190, 0.13, -0.3)
+
+        cal_map = self.ca.calibration_map
+        self.assertAlmostEqual(
+            x_screen,
+            self.ca._interpolate(
+                120,
+                0.13,
+                cal_map.monitor_x_values.tolist(),
+                cal_map.head_x_values.tolist(),
+                cal_map.theta_values.tolist(),
+            ),
+        )
+        self.assertAlmostEqual(
+            y_screen,
+            self.ca._interpolate(
+                190,
+                -0.3,
+                cal_map.monitor_y_values.tolist(),
+                cal_map.head_y_values.tolist(),
+                cal_map.phi_values.tolist(),
+            ),
+        )
+
+    def test_calculate_point_of_regard_errors(self):
+        self.ca = InterpolationAgent()
+
+        # An empty calibration profile cannot be interpolated.
+        with self.assertRaises(ZeroDivisionError):
+            self.ca.calculate_point_of_regard(0, 0, 0, 0)
+
+        # A missing gaze vector (no face detected) is rejected.
+        self.ca.calibration_step(1, 1, 1, 1, 1, 1)
+        with self.assertRaises(TypeError):
+            self.ca.calculate_point_of_regard(None, None, None, None)
+
+
+class TestConcurrentCalibration(unittest.TestCase):
+    def test_queries_run_during_calibration_and_loads(self):
+        rng = random.Random(3)
+        points = [tuple(rng.uniform(-1, 1) for _ in range(6)) for _ in range(300)]
+        for agent_class in (InterpolationAgent, NearestNeighbourAgent, RegressionAgent):
+            agent = agent_class()
+            agent.calibration_step(*points[0])
+            loaded = agent.calibration_map.with_points(np.array(points[:50]).T)
+            errors = []
+
+            def query():
+                try:
+                    for _ in range(300):
+                        agent.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+                except Exception as e:
+                    errors.append(e)
+
+            readers = [threading.Thread(target=query) for _ in range(4)]
+            for reader in readers:
+                reader.start()
+            for i, point in enumerate(points[1:]):
+                agent.calibration_step(*point)
+                if i % 100 == 0:
+                    agent.calibration_map = loaded
+            for reader in readers:
+                reader.join()
+
+            self.assertEqual(errors, [])
+            self.assertEqual(len(agent.calibration_map), 50 + 99)
+
+
+class TestNearestNeighbourAgent(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.points = [
+            (
+                rng.uniform(0, 1920),
+                rng.uniform(0, 1080),
+                rng.uniform(200, 400),
+                rng.uniform(150, 300),
+                rng.uniform(-0.5, 0.5),
+                rng.uniform(-0.5, 0.5),
+            )
+            for _ in range(30)
+        ]
+
+    def test_matches_interpolation_when_k_covers_all_points(self):
+        ia = InterpolationAgent(position_interpolation_weight=0.01)
+        nna = NearestNeighbourAgent(position_interpolation_weight=0.01, k=100)
+        for point in self.points:
+            ia.calibration_step(*point)
+            nna.calibration_step(*point)
+
+        expected = ia.calculate_point_of_regard(300, 200, 0.1, -0.2)
+        actual = nna.calculate_point_of_regard(300, 200, 0.1, -0.2)
+        self.assertAlmostEqual(actual[0], expected[0])
+        self.assertAlmostEqual(actual[1], expected[1])
+
+    def test_exact_anchor_and_lazy_rebuild(self):
+        nna = NearestNeighbourAgent(k=3)
+        for point in self.points[:10]:
+            nna.calibration_step(*point)
+        nna.calculate_point_of_regard(300, 200, 0.1, -0.2)
+
+        # A point added after the index was built must be found on the next query.
+        monitor_x, monitor_y, head_x, head_y, theta, phi = self.points[10]
+        nna.calibration_step(*self.points[10])
+        x_screen, y_screen = nna.calculate_point_of_regard(head_x, head_y, theta, phi)
+        self.assertAlmostEqual(x_screen, monitor_x, places=2)
+        self.assertAlmostEqual(y_screen, monitor_y, places=2)
+
+        # Resetting the map invalidates the index.
+        nna.initialize_cal_map()
+        with self.assertRaises(ZeroDivisionError):
+            nna.calculate_point_of_regard(head_x, head_y, theta, phi)
+
+
+class TestLookupTableAgent(unittest.TestCase):
+    def setUp(self):
+        # A coarse 5x5 calibration grid with a linear gaze to screen relation.
+        self.ia = InterpolationAgent()
+        self.la = LookupTableAgent(resolution=33, max_resolution=65, tolerance=5.0)
+        for i in range(5):
+            for j in range(5):
+                point = (400 * i, 250 * j, 300, 200, 0.1 * i, 0.1 * j)
+                self.ia.calibration_step(*point)
+                self.la.calibration_step(*point)
+
+    def test_lookup_matches_interpolation(self):
+        self.la.finalize_cal_map()
+        for query in [(300, 200, 0.15, 0.25), (300, 200, 0.33, 0.07)]:
+            expected = self.ia.calculate_point_of_regard(*query)
+            actual = self.la.calculate_point_of_regard(*query)
+            self.assertAlmostEqual(actual[0], expected[0], delta=25)
+            self.assertAlmostEqual(actual[1], expected[1], delta=25)
+
+    def test_queries_outside_the_table_use_exact_interpolation(self):
+        self.la.finalize_cal_map()
+        # Far beyond the calibrated angles, where the table would clamp to its edge.
+        queries = np.array([[300, 200, 0.15, 0.25], [300, 200, 1.2, -0.8]])
+
+        self.assertFalse(
+            self.la.calibration_map.lookup_table.contains(
+                queries[1, :2], queries[1, 2:]
+            )
+        )
+        self.assertEqual(
+            self.la.calculate_point_of_regard(*queries[1]),
+            self.ia.calculate_point_of_regard(*queries[1]),
+        )
+        points = self.la.calculate_points_of_regard(queries)
+        np.testing.assert_array_equal(
+            points[1], self.ia.calculate_points_of_regard(queries[1:])[0]
+        )
+        np.testing.assert_allclose(
+            points[0], self.ia.calculate_point_of_regard(*queries[0]), atol=25
+        )
+
+    def test_lookup_table_is_persisted_with_the_map(self):
+        self.la.finalize_cal_map()
+        table = self.la.calibration_map.lookup_table
+        self.assertIsNotNone(table)
+        self.assertEqual(table.num_points, 25)
+
+        # A reloaded profile reuses its table instead of rebuilding it.
+        restored = pickle.loads(pickle.dumps(self.la.calibration_map))
+        agent = LookupTableAgent(resolution=33, max_resolution=65, tolerance=5.0)
+        agent.calibration_map = restored
+        with patch.object(agent, "build_lookup_table") as build:
+            agent.calculate_point_of_regard(300, 200, 0.15, 0.25)
+        build.assert_not_called()
+
+        # Adding a calibration point makes the table stale, and queries are answered
+        # by exact interpolation until the map is finalized again.
+        agent.calibration_step(0, 0, 300, 200, 0.5, 0.5)
+        with patch.object(agent, "build_lookup_table") as build:
+            point = agent.calculate_point_of_regard(300, 200, 0.15, 0.25)
+        build.assert_not_called()
+        self.ia.calibration_step(0, 0, 300, 200, 0.5, 0.5)
+        self.assertEqual(point, self.ia.calculate_point_of_regard(300, 200, 0.15, 0.25))
+        agent.finalize_cal_map()
+        self.assertEqual(agent.calibration_map.lookup_table.num_points, 26)
+
+    def test_table_built_with_other_parameters_is_rebuilt(self):
+        self.la.finalize_cal_map()
+        table = self.la.calibration_map.lookup_table
+
+        agent = LookupTableAgent(resolution=17, max_resolution=17)
+        agent.calibration_map = self.la.calibration_map
+        self.assertEqual(
+            agent.calculate_point_of_regard(300, 200, 0.15, 0.25),
+            self.ia.calculate_point_of_regard(300, 200, 0.15, 0.25),
+        )
+        agent.finalize_cal_map()
+
+        rebuilt = agent.calibration_map.lookup_table
+        self.assertIsNot(rebuilt, table)
+        self.assertEqual(rebuilt.resolution, 17)
+        self.assertEqual(rebuilt.build_parameters, agent.build_parameters)
+
+
+class TestRegressionAgent(unittest.TestCase):
+    @staticmethod
+    def screen_position(head_x, head_y, theta, phi):
+        # A quadratic ground truth which a degree 2 regression can represent exactly.
+        return (
+            960 + 1500 * theta + 0.5 * head_x + 300 * theta * theta,
+            540 + 1200 * phi - 0.25 * head_y + 200 * theta * phi,
+        )
+
+    def test_fit_recovers_polynomial(self):
+        rng = random.Random(0)
+        ra = RegressionAgent(degree=2, ridge=1e-9)
+        for _ in range(60):
+            gaze = (
+                rng.uniform(200, 400),
+                rng.uniform(150, 300),
+                rng.uniform(-0.5, 0.5),
+                rng.uniform(-0.5, 0.5),
+            )
+            ra.calibration_step(*self.screen_position(*gaze), *gaze)
+
+        gaze = (310, 220, 0.12, -0.31)
+        expected = self.screen_position(*gaze)
+        actual = ra.calculate_point_of_regard(*gaze)
+        self.assertAlmostEqual(actual[0], expected[0], places=2)
+        self.assertAlmostEqual(actual[1], expected[1], places=2)
+
+    def test_incremental_updates_match_full_refit(self):
+        rng = random.Random(1)
+        incremental = RegressionAgent()
+        points = [tuple(rng.uniform(-1, 1) for _ in range(6)) for _ in range(20)]
+        for point in points:
+            incremental.calibration_step(*point)
+            incremental.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+
+        # Assigning a map (as load_profile does) refits from scratch.
+        refit = RegressionAgent()
+        refit.calibration_map = incremental.calibration_map
+        expected = refit.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+        actual = incremental.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+        self.assertAlmostEqual(actual[0], expected[0])
+        self.assertAlmostEqual(actual[1], expected[1])
+
+    def test_bulk_steps_match_single_steps(self):
+        rng = random.Random(2)
+        points = [tuple(rng.uniform(-1, 1) for _ in range(6)) for _ in range(20)]
+        single, bulk = RegressionAgent(), RegressionAgent()
+        single.calibration_step(*points[0])
+        bulk.calibration_step(*points[0])
+        single.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+        previous_map = bulk.calibration_map
+        for point in points[1:]:
+            single.calibration_step(*point)
+
+        bulk.calibration_steps(np.array(points[1:]).T)
+
+        # The points land on a new map, the previous one is left as it was.
+        self.assertEqual(len(previous_map), 1)
+        self.assertEqual(bulk.calibration_map, single.calibration_map)
+        expected = single.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+        actual = bulk.calculate_point_of_regard(0.1, 0.2, 0.3, 0.4)
+        self.assertAlmostEqual(actual[0], expected[0])
+        self.assertAlmostEqual(actual[1], expected[1])
+
+    def test_empty_profile(self):
+        with self.assertRaises(ZeroDivisionError):
+            RegressionAgent().calculate_point_of_regard(0, 0, 0, 0)
+
+
+class TestCalculatePointsOfRegard(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.points = np.vstack(
+            (
+                rng.uniform(0, 1920, 40),
+                rng.uniform(0, 1080, 40),
+                rng.uniform(200, 400, (2, 40)),
+                rng.uniform(-0.5, 0.5, (2, 40)),
+            )
+        )
+        self.queries = np.column_stack(
+            (rng.uniform(200, 400, (25, 2)), rng.uniform(-0.5, 0.5, (25, 2)))
+        )
+        self.queries[[3, 7]] = np.nan
+
+    def test_matches_single_queries(self):
+        for name in (
+            "interpolation",
+            "nearest_neighbour",
+            "lookup_table",
+            "regression",
+        ):
+            with self.subTest(agent=name):
+                agent = create_calibration_agent(name)
+                agent.calibration_steps(self.points)
+
+                with patch("src.backend.calibration_agents.QUERY_CHUNK_ELEMENTS", 100):
+                    points = agent.calculate_points_of_regard(self.queries)
+
+                self.assertEqual(points.shape, (25, 2))
+                self.assertTrue(np.isnan(points[[3, 7]]).all())
+                for query, point in zip(self.queries, points):
+                    if not np.isnan(query).any():
+                        np.testing.assert_allclose(
+                            point, agent.calculate_point_of_regard(*query)
+                        )
+
+    def test_empty_profile(self):
+        agent = InterpolationAgent()
+        self.assertTrue(
+            np.isnan(agent.calculate_points_of_regard(np.full((2, 4), np.nan))).all()
+        )
+        with self.assertRaises(ZeroDivisionError):
+            agent.calculate_points_of_regard(self.queries)
+
+
+class TestCreateCalibrationAgent(unittest.TestCase):
+    def test_create_by_name(self):
+        agent = create_calibration_agent("nearest_neighbour", k=4)
+        self.assertIsInstance(agent, NearestNeighbourAgent)
+        self.assertEqual(agent.k, 4)
+        self.assertIsInstance(create_calibration_agent("regression"), RegressionAgent)
+
+    def test_unknown_name(self):
+        with self.assertRaises(ValueError):
+            create_calibration_agent("unknown")
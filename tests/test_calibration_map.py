@@ -0,0 +1,77 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from src.backend.calibration_map import CalibrationMap
+
+
+class TestCalibrationMap(unittest.TestCase):
+    def test_add_calibration_point_grows_buffer(self):
+        cal_map = CalibrationMap(initial_capacity=2)
+
+        for i in range(50):
+            cal_map.add_calibration_point(i, 2 * i, 3 * i, 4 * i, 5 * i, 6 * i)
+
+        self.assertEqual(len(cal_map), 50)
+        self.assertEqual(cal_map.points.shape, (6, 50))
+        np.testing.assert_array_equal(cal_map.monitor_x_values, np.arange(50))
+        np.testing.assert_array_equal(cal_map.phi_values, 6 * np.arange(50))
+
+    def test_with_points_leaves_the_map_unchanged(self):
+        cal_map = CalibrationMap(dtype=np.float32)
+        cal_map.add_calibration_point(1, 2, 3, 4, 5, 6)
+
+        extended = cal_map.with_points(np.arange(12).reshape(6, 2))
+
+        self.assertEqual(len(cal_map), 1)
+        self.assertEqual(len(extended), 3)
+        self.assertEqual(extended.dtype, np.float32)
+        np.testing.assert_array_equal(extended.monitor_x_values, [1, 0, 1])
+
+    def test_snapshots_share_the_buffer_without_seeing_later_points(self):
+        first = CalibrationMap(initial_capacity=8).with_points(np.ones((6, 2)))
+        second = first.with_points(np.full((6, 1), 2.0))
+        # Branching from an older snapshot must not overwrite the newer one.
+        branch = first.with_points(np.full((6, 1), 3.0))
+
+        self.assertIs(second._data, first._data)
+        self.assertIsNot(branch._data, first._data)
+        self.assertEqual((len(first), len(second), len(branch)), (2, 3, 3))
+        np.testing.assert_array_equal(second.monitor_x_values, [1, 1, 2])
+        np.testing.assert_array_equal(branch.monitor_x_values, [1, 1, 3])
+        with self.assertRaises(ValueError):
+            second.points[0, 0] = 5
+
+    def test_pickle_round_trip(self):
+        cal_map = CalibrationMap()
+        cal_map.add_calibration_point(1, 2, 3, 4, 5, 6)
+
+        restored = pickle.loads(pickle.dumps(cal_map))
+
+        self.assertEqual(restored, cal_map)
+        restored.add_calibration_point(7, 8, 9, 10, 11, 12)
+        self.assertEqual(len(restored), 2)
+        self.assertEqual(len(cal_map), 1)
+
+    def test_restore_legacy_list_state(self):
+        # Profiles pickled before the map was array-backed carry six lists.
+        cal_map = CalibrationMap.__new__(CalibrationMap)
+        cal_map.__setstate__(
+            {
+                "monitor_x_values": [100, 200],
+                "monitor_y_values": [300, 400],
+                "head_x_values": [1, 2],
+                "head_y_values": [3, 4],
+                "theta_values": [0.1, 0.2],
+                "phi_values": [0.3, 0.4],
+            }
+        )
+
+        self.assertEqual(len(cal_map), 2)
+        np.testing.assert_array_equal(cal_map.monitor_y_values, [300, 400])
+        np.testing.assert_array_equal(cal_map.theta_values, [0.1, 0.2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import pickle
+import sqlite3
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.backend.calibration_agents import LookupTableAgent
+from src.backend.calibration_map import CalibrationMap
+from src.backend.calibration_map_codec import (
+    decode_calibration_map,
+    encode_calibration_map,
+    read_header,
+)
+from src.backend.calibration_profile_store import (
+    PICKLED_PROFILES,
+    CalibrationProfileStore,
+)
+
+
+def make_map(num_points: int, dtype=np.float64) -> CalibrationMap:
+    rng = np.random.default_rng(0)
+    return CalibrationMap.from_array(rng.normal(size=(6, num_points)).astype(dtype))
+
+
+class TestCalibrationMapCodec(unittest.TestCase):
+    def test_round_trip(self):
+        for dtype in (np.float32, np.float64):
+            cal_map = make_map(5, dtype)
+
+            blob = encode_calibration_map(cal_map, agent_type="interpolation")
+            header = read_header(blob)
+            restored = decode_calibration_map(blob)
+
+            self.assertEqual(header.num_points, 5)
+            self.assertEqual(header.agent_type, "interpolation")
+            self.assertEqual(restored.dtype, dtype)
+            self.assertEqual(restored, cal_map)
+
+    def test_decode_is_zero_copy_until_appended(self):
+        blob = encode_calibration_map(make_map(3))
+
+        restored = decode_calibration_map(blob)
+
+        self.assertFalse(restored.points.flags.writeable)
+        restored.add_calibration_point(1, 2, 3, 4, 5, 6)
+        self.assertEqual(len(restored), 4)
+        self.assertEqual(len(decode_calibration_map(blob)), 3)
+
+    def test_empty_map(self):
+        restored = decode_calibration_map(encode_calibration_map(CalibrationMap()))
+
+        self.assertEqual(len(restored), 0)
+        restored.add_calibration_point(1, 2, 3, 4, 5, 6)
+        self.assertEqual(len(restored), 1)
+
+    def test_lookup_table_round_trip(self):
+        agent = LookupTableAgent(resolution=8, max_resolution=8)
+        agent.calibration_map = make_map(10)
+        agent.finalize_cal_map()
+        table = agent.calibration_map.lookup_table
+
+        restored = decode_calibration_map(encode_calibration_map(agent.calibration_map))
+
+        np.testing.assert_array_equal(restored.lookup_table.values, table.values)
+        self.assertEqual(restored.lookup_table.num_points, 10)
+        self.assertEqual(restored.lookup_table.max_error, table.max_error)
+        self.assertEqual(restored.lookup_table.build_parameters, agent.build_parameters)
+
+    def test_lookup_table_of_version_1_has_unknown_build_parameters(self):
+        agent = LookupTableAgent(resolution=8, max_resolution=8)
+        agent.calibration_map = make_map(10)
+        agent.finalize_cal_map()
+        blob = bytearray(encode_calibration_map(agent.calibration_map))
+        # Version 1 had no build parameters after the three lookup table scalars.
+        struct.pack_into("<H", blob, 4, 1)
+        header = read_header(bytes(blob))
+        scalars = header.data_offset + 6 * 10 * 8 + 16 + 3 * 8
+        del blob[scalars : scalars + 5 * 8]
+
+        restored = decode_calibration_map(bytes(blob))
+
+        self.assertIsNone(restored.lookup_table.build_parameters)
+        np.testing.assert_array_equal(
+            restored.lookup_table.values, agent.calibration_map.lookup_table.values
+        )
+
+    def test_rejects_unknown_data(self):
+        with self.assertRaises(ValueError):
+            decode_calibration_map(b"not a calibration map")
+
+
+class TestCalibrationProfileStoreEncoding(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_url = f"sqlite:///{os.path.join(self.tmpdir.name, 'calibration.db')}"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_pickled_profiles_are_migrated(self):
+        cps = CalibrationProfileStore(db_url=self.db_url)
+        cal_map = make_map(4)
+        with cps.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO calibration_profiles (profile_name, calibration_map) "
+                    "VALUES ('legacy', :blob)"
+                ),
+                {"blob": pickle.dumps(cal_map)},
+            )
+        cps.engine.dispose()
+
+        cps = CalibrationProfileStore(db_url=self.db_url)
+
+        self.assertEqual(cps.migrate_pickled_profiles(), 0)
+        self.assertEqual(cps.load_profile_by_name("legacy"), cal_map)
+        cps.engine.dispose()
+
+    def test_migration_only_reads_pickled_profiles(self):
+        cps = CalibrationProfileStore(db_url=self.db_url)
+        cps.save_profile("encoded", make_map(2))
+        with cps.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO calibration_profiles (profile_name, calibration_map) "
+                    "VALUES ('legacy', :blob)"
+                ),
+                {"blob": pickle.dumps(make_map(4))},
+            )
+
+        with cps.Session() as session:
+            pickled = [p.profile_name for p in session.scalars(PICKLED_PROFILES)]
+        self.assertEqual(pickled, ["legacy"])
+        self.assertEqual(cps.migrate_pickled_profiles(), 1)
+        with cps.Session() as session:
+            self.assertIsNone(session.scalar(PICKLED_PROFILES))
+        cps.engine.dispose()
+
+    def test_read_only_store_leaves_the_database_untouched(self):
+        cps = CalibrationProfileStore(db_url=self.db_url, sqlite_pragmas={})
+        cal_map = make_map(4)
+        with cps.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO calibration_profiles (profile_name, calibration_map) "
+                    "VALUES ('legacy', :blob)"
+                ),
+                {"blob": pickle.dumps(cal_map)},
+            )
+        cps.engine.dispose()
+
+        cps = CalibrationProfileStore(db_url=self.db_url, read_only=True)
+        self.assertEqual(cps.load_profile_by_name("legacy"), cal_map)
+        with self.assertRaises(OperationalError):
+            cps.save_profile("new", cal_map)
+        cps.engine.dispose()
+
+        connection = sqlite3.connect(cps.engine.url.database)
+        blob = connection.execute("SELECT calibration_map FROM calibration_profiles")
+        self.assertEqual(blob.fetchone()[0], pickle.dumps(cal_map))
+        journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "delete")
+        connection.close()
+
+    def test_load_missing_profile(self):
+        cps = CalibrationProfileStore(db_url=self.db_url)
+
+        self.assertIsNone(cps.load_profile(1))
+        cps.engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from src.backend.calibration_map import CalibrationMap
+from src.backend.calibration_profile_store import (
+    AsyncCalibrationProfileStore,
+    CalibrationProfileStore,
+    ProfileCache,
+)
+
+
+def make_map(num_points: int) -> CalibrationMap:
+    cal_map = CalibrationMap()
+    for i in range(num_points):
+        cal_map.add_calibration_point(i, i, i, i, i, i)
+    return cal_map
+
+
+class TestCalibrationProfileStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, "calibration.db")
+        self.cps = CalibrationProfileStore(db_url=f"sqlite:///{db_path}")
+
+    def tearDown(self):
+        self.cps.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_sqlite_pragmas(self):
+        with self.cps.engine.connect() as connection:
+            journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+            synchronous = connection.execute(text("PRAGMA synchronous")).scalar()
+
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+    def test_repeated_loads_are_cached(self):
+        self.cps.save_profile("alice", make_map(2))
+        profile_id = self.cps.list_profiles()[0]["id"]
+
+        first = self.cps.load_profile(profile_id)
+        with patch.object(self.cps, "Session") as session:
+            second = self.cps.load_profile(profile_id)
+            session.assert_not_called()
+
+        self.assertEqual(first, second)
+        # Every load returns its own map.
+        second.add_calibration_point(1, 2, 3, 4, 5, 6)
+        self.assertEqual(len(first), 2)
+
+    def test_save_and_delete_invalidate(self):
+        self.assertIsNone(self.cps.load_profile_by_name("alice"))
+
+        self.cps.save_profile("alice", make_map(1))
+        profile_id = self.cps.list_profiles()[0]["id"]
+        self.assertEqual(len(self.cps.load_profile(profile_id)), 1)
+
+        self.cps.save_profile("alice", make_map(3))
+        self.assertEqual(len(self.cps.load_profile(profile_id)), 3)
+        self.assertEqual(len(self.cps.load_profile_by_name("alice")), 3)
+
+        self.cps.delete_profile(profile_id)
+        self.assertIsNone(self.cps.load_profile(profile_id))
+        self.assertIsNone(self.cps.load_profile_by_name("alice"))
+        self.assertEqual(self.cps.list_profiles(), [])
+
+
+class TestAsyncCalibrationProfileStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "calibration.db")
+        self.cps = AsyncCalibrationProfileStore(
+            db_url=f"sqlite+aiosqlite:///{self.db_path}"
+        )
+        await self.cps.initialize()
+
+    async def asyncTearDown(self):
+        await self.cps.dispose()
+        self.tmpdir.cleanup()
+
+    async def test_save_load_and_delete(self):
+        await self.cps.save_profile("alice", make_map(2), agent_type="interpolation")
+        await self.cps.save_profile("alice", make_map(3))
+        profiles = await self.cps.list_profiles()
+
+        self.assertEqual([p["profile_name"] for p in profiles], ["alice"])
+        profile_id = profiles[0]["id"]
+        self.assertEqual(len(await self.cps.load_profile(profile_id)), 3)
+        self.assertEqual(await self.cps.load_profile_by_name("alice"), make_map(3))
+
+        await self.cps.delete_profile(profile_id)
+        self.assertIsNone(await self.cps.load_profile(profile_id))
+        self.assertEqual(await self.cps.list_profiles(), [])
+
+    async def test_shares_the_synchronous_schema(self):
+        await self.cps.save_profile("alice", make_map(2))
+
+        cps = CalibrationProfileStore(db_url=f"sqlite:///{self.db_path}")
+        self.assertEqual(cps.load_profile_by_name("alice"), make_map(2))
+        cps.engine.dispose()
+
+
+class TestProfileCache(unittest.TestCase):
+    def test_capacity_and_ttl(self):
+        cache = ProfileCache(capacity=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("c", 3)
+
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+        with patch("time.monotonic", return_value=float("inf")):
+            self.assertEqual(cache.get("c"), (False, None))
+
+    def test_stale_put_is_ignored(self):
+        cache = ProfileCache()
+        generation = cache.generation
+        cache.invalidate("a")
+
+        cache.put("a", 1, generation)
+
+        self.assertEqual(cache.get("a"), (False, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
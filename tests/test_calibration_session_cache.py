@@ -0,0 +1,101 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from src.backend.calibration_agents import InterpolationAgent
+from src.backend.calibration_profile_store import AsyncCalibrationProfileStore
+from src.backend.calibration_session_cache import CalibrationSessionCache
+
+
+class TestCalibrationSessionCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, "calibration.db")
+        self.cps = AsyncCalibrationProfileStore(db_url=f"sqlite+aiosqlite:///{db_path}")
+        await self.cps.initialize()
+        self.cache = CalibrationSessionCache(self.cps, InterpolationAgent, capacity=2)
+
+    async def asyncTearDown(self):
+        await self.cps.dispose()
+        self.tmpdir.cleanup()
+
+    async def test_sessions_are_isolated(self):
+        agent = await self.cache.get_agent("alice")
+        agent.calibration_step(100, 200, 1, 2, 0.1, 0.2)
+
+        self.assertEqual(len((await self.cache.get_agent("alice")).calibration_map), 1)
+        self.assertEqual(len((await self.cache.get_agent("bob")).calibration_map), 0)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    async def test_lru_eviction_saves_back_to_the_store(self):
+        agent = await self.cache.get_agent("alice")
+        agent.calibration_step(100, 200, 1, 2, 0.1, 0.2)
+        await self.cache.get_agent("bob")
+        # Using alice makes bob the least recently used session.
+        await self.cache.get_agent("alice")
+        await self.cache.get_agent("carol")
+
+        self.assertNotIn("bob", self.cache)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        # Empty sessions are not saved.
+        self.assertIsNone(await self.cps.load_profile_by_name("bob"))
+
+        await self.cache.get_agent("dave")
+        self.assertNotIn("alice", self.cache)
+        self.assertEqual(len(await self.cps.load_profile_by_name("alice")), 1)
+
+        # An evicted session is restored from its profile.
+        agent = await self.cache.get_agent("alice")
+        self.assertEqual(agent.calibration_map.monitor_x_values.tolist(), [100])
+
+    async def test_session_evicted_during_its_save_is_not_reloaded(self):
+        agent = await self.cache.get_agent("alice")
+        agent.calibration_step(100, 200, 1, 2, 0.1, 0.2)
+        await self.cache.get_agent("bob")
+        saving, release = asyncio.Event(), asyncio.Event()
+        save_profile = self.cps.save_profile
+
+        async def slow_save_profile(*args, **kwargs):
+            saving.set()
+            await release.wait()
+            await save_profile(*args, **kwargs)
+
+        self.cps.save_profile = slow_save_profile
+        # Carol evicts alice, whose save is held up.
+        carol = asyncio.create_task(self.cache.get_agent("carol"))
+        await saving.wait()
+
+        revived = await self.cache.get_agent("alice")
+        revived.calibration_step(300, 400, 3, 4, 0.3, 0.4)
+        release.set()
+        await carol
+
+        self.assertIs(revived, agent)
+        self.assertIn("alice", self.cache)
+        self.assertEqual(len(revived.calibration_map), 2)
+
+    async def test_reset_survives_eviction(self):
+        agent = await self.cache.get_agent("alice")
+        agent.calibration_step(100, 200, 1, 2, 0.1, 0.2)
+        await self.cache.flush()
+
+        await self.cache.reset("alice")
+        await self.cache.get_agent("bob")
+        await self.cache.get_agent("carol")
+        self.assertNotIn("alice", self.cache)
+
+        self.assertEqual(len((await self.cache.get_agent("alice")).calibration_map), 0)
+
+    async def test_flush_saves_live_sessions(self):
+        agent = await self.cache.get_agent("alice")
+        agent.calibration_step(100, 200, 1, 2, 0.1, 0.2)
+        await self.cache.flush()
+
+        self.assertIn("alice", self.cache)
+        self.assertEqual(len(await self.cps.load_profile_by_name("alice")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,27 @@
 import unittest
 from unittest.mock import MagicMock, patch
 
-from src.backend.gaze_predictor import GazePredictor
+import cv2
+import numpy as np
+import torch
+from l2cs import Pipeline
+from torch import nn
+
+from src.backend.gaze_predictor import FaceGaze, FaceTracker, GazePredictor
+from src.backend.preprocessing import FacePreprocessor
+
+
+class ColorGazeNet(nn.Module):
+    """A tiny stand-in for the L2CS network, sensitive to the channel order."""
+
+    def __init__(self):
+        super().__init__()
+        self.pitch = nn.Linear(3, 90)
+        self.yaw = nn.Linear(3, 90)
+
+    def forward(self, images):
+        features = images.mean(dim=(2, 3))
+        return self.pitch(features), self.yaw(features)
 
 
 class TestGazePredictor(unittest.TestCase):
@@ -15,6 +35,9 @@ class TestGazePredictor(unittest.TestCase):
 
         # Create the GazePredictor instance
         self.gaze_predictor = GazePredictor(filepath="mock_weights.pth")
+        # Mock the gaze network, fed by the predictor's own preprocessing
+        self.gaze_predictor.backend = MagicMock()
+        self.network = self.gaze_predictor.backend
 
         # Save the mock for later assertions if needed
         self.mock_pipeline = mock_pipeline
@@ -24,6 +47,227 @@ class TestGazePredictor(unittest.TestCase):
         image_width = 100
         # TODO: Find transformation between bboxes and actual center
 
+    def test_predict_gaze_vectors_runs_one_batched_forward_pass(self):
+        pipeline = self.gaze_predictor.gaze_pipeline
+        pipeline.confidence_threshold = 0.5
+        pipeline.detector.side_effect = [
+            [(np.array([10, 20, 30, 40]), None, 0.9)],
+            None,  # No face in the second image.
+            [
+                (np.array([0, 0, 50, 50]), None, 0.2),  # Below the threshold.
+                (np.array([5, 5, 25, 25]), None, 0.8),
+            ],
+        ]
+        self.network.predict_gaze.return_value = (
+            np.array([0.1, 0.2]),
+            np.array([0.3, 0.4]),
+        )
+        images = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(3)]
+
+        result = self.gaze_predictor.predict_gaze_vectors(images)
+
+        # Both face crops go through the gaze network in a single batch.
+        self.network.predict_gaze.assert_called_once()
+        self.assertEqual(
+            self.network.predict_gaze.call_args[0][0].shape, (2, 3, 448, 448)
+        )
+        self.assertEqual(result[0], (80.0, 30.0, 0.1, 0.3))
+        self.assertEqual(result[1], (None, None, None, None))
+        self.assertEqual(result[2], (85.0, 15.0, 0.2, 0.4))
+
+    def test_predict_faces_returns_every_face_in_one_pass(self):
+        pipeline = self.gaze_predictor.gaze_pipeline
+        pipeline.confidence_threshold = 0.5
+        pipeline.detector.return_value = [
+            (np.array([10, 10, 50, 50]), None, 0.7),
+            (np.array([60, 10, 100, 50]), None, 0.3),  # Below the threshold.
+            (np.array([0, 60, 10, 70]), None, 0.95),  # Too small.
+            (np.array([50, 50, 100, 100]), None, 0.9),
+            (np.array([0, 0, 30, 30]), None, 0.6),
+        ]
+        self.network.predict_gaze.return_value = (
+            np.array([0.1, 0.2]),
+            np.array([0.3, 0.4]),
+        )
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+
+        faces = self.gaze_predictor.predict_faces(image, max_faces=2, min_face_size=20)
+
+        # The two most confident faces large enough, in a single batch.
+        self.network.predict_gaze.assert_called_once()
+        self.assertEqual(
+            self.network.predict_gaze.call_args[0][0].shape, (2, 3, 448, 448)
+        )
+        self.assertEqual(
+            faces,
+            [
+                FaceGaze((50.0, 50.0, 100.0, 100.0), 25.0, 75.0, 0.1, 0.3, 0.9),
+                FaceGaze((10.0, 10.0, 50.0, 50.0), 70.0, 30.0, 0.2, 0.4, 0.7),
+            ],
+        )
+        self.assertEqual(faces[1].gaze_vector, (70.0, 30.0, 0.2, 0.4))
+        self.assertEqual(faces[1].scaled(2).bounding_box, (20.0, 20.0, 100.0, 100.0))
+
+    @patch("src.backend.gaze_predictor.Pipeline")
+    def test_batches_larger_than_the_buffers_are_split(self, mock_pipeline):
+        gaze_predictor = GazePredictor(filepath="mock_weights.pth", max_batch_size=2)
+        gaze_predictor.backend = network = MagicMock()
+        pipeline = gaze_predictor.gaze_pipeline
+        pipeline.confidence_threshold = 0.5
+        pipeline.detector.return_value = [(np.array([10, 20, 30, 40]), None, 0.9)]
+        network.predict_gaze.side_effect = [
+            (np.array([0.1, 0.2]), np.array([0.4, 0.5])),
+            (np.array([0.3]), np.array([0.6])),
+        ]
+        images = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(3)]
+
+        result = gaze_predictor.predict_gaze_vectors(images)
+
+        self.assertEqual(
+            [call[0][0].shape[0] for call in network.predict_gaze.call_args_list],
+            [2, 1],
+        )
+        self.assertEqual(
+            [vector[2:] for vector in result], [(0.1, 0.4), (0.2, 0.5), (0.3, 0.6)]
+        )
+
+    def test_predict_faces_without_face(self):
+        self.gaze_predictor.gaze_pipeline.detector.return_value = None
+
+        faces = self.gaze_predictor.predict_faces(np.zeros((10, 10, 3), np.uint8))
+
+        self.assertEqual(faces, [])
+        self.network.predict_gaze.assert_not_called()
+
+    def test_warm_up_runs_detector_and_each_batch_size(self):
+        pipeline = self.gaze_predictor.gaze_pipeline
+        self.network.predict_gaze.return_value = (np.zeros(1), np.zeros(1))
+
+        self.gaze_predictor.warm_up(batch_sizes=(1, 4), frame_shape=(120, 160, 3))
+
+        self.assertEqual(pipeline.detector.call_args[0][0].shape, (120, 160, 3))
+        self.assertEqual(
+            [call[0][0].shape[0] for call in self.network.predict_gaze.call_args_list],
+            [1, 4],
+        )
+
+    def test_face_tracking_restricts_detection_to_the_tracked_region(self):
+        pipeline = self.gaze_predictor.gaze_pipeline
+        pipeline.confidence_threshold = 0.5
+        self.network.predict_gaze.return_value = (np.array([0.1]), np.array([0.2]))
+        image = np.zeros((400, 400, 3), dtype=np.uint8)
+        tracker = FaceTracker(redetect_interval=2, margin=0.5)
+
+        # First frame: full-frame detection.
+        pipeline.detector.side_effect = [[(np.array([100, 100, 200, 200]), None, 0.9)]]
+        self.gaze_predictor.predict_gaze_vector(image, tracker)
+        self.assertEqual(pipeline.detector.call_args[0][0].shape, (400, 400, 3))
+
+        # Second frame: detection on the box expanded by half its size on each side,
+        # with the detected box mapped back to full image coordinates.
+        pipeline.detector.side_effect = [[(np.array([60, 60, 160, 160]), None, 0.9)]]
+        result = self.gaze_predictor.predict_gaze_vector(image, tracker)
+        self.assertEqual(pipeline.detector.call_args[0][0].shape, (200, 200, 3))
+        self.assertEqual(result[:2], (400 - 160.0, 160.0))
+        np.testing.assert_array_equal(tracker.bounding_box, [110, 110, 210, 210])
+
+        # Third frame: the face is lost in the region, so the full frame is searched.
+        pipeline.detector.side_effect = [None, None]
+        result = self.gaze_predictor.predict_gaze_vector(image, tracker)
+        self.assertEqual(pipeline.detector.call_args[0][0].shape, (400, 400, 3))
+        self.assertEqual(result, (None, None, None, None))
+        self.assertIsNone(tracker.bounding_box)
+
+    def test_face_tracker_redetects_periodically(self):
+        tracker = FaceTracker(redetect_interval=2, margin=0)
+        self.assertIsNone(tracker.region_of_interest((100, 100, 3)))
+
+        tracker.update(np.array([10, 20, 30, 40]), full_frame=True)
+        self.assertEqual(tracker.region_of_interest((100, 100, 3)), (10, 20, 30, 40))
+        tracker.update(np.array([10, 20, 30, 40]), full_frame=False)
+        self.assertEqual(tracker.region_of_interest((100, 100, 3)), (10, 20, 30, 40))
+        tracker.update(np.array([10, 20, 30, 40]), full_frame=False)
+        self.assertIsNone(tracker.region_of_interest((100, 100, 3)))
+
+    def test_scale_gaze_vector(self):
+        self.assertEqual(
+            GazePredictor.scale_gaze_vector((40.0, 15.0, 0.1, 0.2), 2),
+            (80.0, 30.0, 0.1, 0.2),
+        )
+        self.assertEqual(
+            GazePredictor.scale_gaze_vector((None, None, None, None), 2),
+            (None, None, None, None),
+        )
+
+    def test_grayscale_frames_are_detected_in_color(self):
+        pipeline = self.gaze_predictor.gaze_pipeline
+        pipeline.confidence_threshold = 0.5
+        pipeline.detector.return_value = [(np.array([10, 20, 30, 40]), None, 0.9)]
+        self.network.predict_gaze.return_value = (np.array([0.1]), np.array([0.2]))
+
+        self.gaze_predictor.predict_gaze_vector(np.zeros((100, 100, 1), np.uint8))
+
+        self.assertEqual(pipeline.detector.call_args[0][0].shape, (100, 100, 3))
+
+    @patch("src.backend.gaze_predictor.validate_backend", return_value=0.01)
+    @patch("src.backend.gaze_predictor.create_inference_backend")
+    @patch("src.backend.gaze_predictor.Pipeline")
+    def test_selected_backend_runs_the_gaze_network(
+        self, mock_pipeline, create_backend, validate
+    ):
+        gaze_predictor = GazePredictor(filepath="mock_weights.pth", backend="onnx")
+        create_backend.assert_called_once_with(
+            "onnx", gaze_predictor.gaze_pipeline.model
+        )
+        validate.assert_called_once()
+
+        pipeline = gaze_predictor.gaze_pipeline
+        pipeline.confidence_threshold = 0.5
+        pipeline.detector.return_value = [(np.array([10, 20, 30, 40]), None, 0.9)]
+        backend = create_backend.return_value
+        backend.predict_gaze.return_value = (np.array([0.1]), np.array([0.3]))
+
+        image = np.random.default_rng(0).integers(0, 256, (100, 100, 3), np.uint8)
+
+        result = gaze_predictor.predict_gaze_vector(image)
+
+        self.assertEqual(result, (80.0, 30.0, 0.1, 0.3))
+        # The backend is fed the output of the predictor's FacePreprocessor.
+        preprocessor = FacePreprocessor(max_batch_size=1)
+        preprocessor.crop(0, image, (10, 20, 30, 40))
+        with torch.inference_mode():
+            expected = preprocessor.prepare(1)
+        backend.predict_gaze.assert_called_once()
+        self.assertTrue(torch.equal(backend.predict_gaze.call_args[0][0], expected))
+        pipeline.predict_gaze.assert_not_called()
+
+    @patch("src.backend.gaze_predictor.Pipeline")
+    def test_predictions_match_the_l2cs_pipeline(self, mock_pipeline):
+        torch.manual_seed(0)
+        box = np.array([40.0, 30.0, 200.0, 210.0])
+        reference = Pipeline.__new__(Pipeline)
+        reference.include_detector = True
+        reference.confidence_threshold = 0.5
+        reference.detector = MagicMock(return_value=[(box, np.zeros((5, 2)), 0.9)])
+        reference.device = torch.device("cpu")
+        reference.model = ColorGazeNet().eval()
+        reference.softmax = nn.Softmax(dim=1)
+        reference.idx_tensor = torch.arange(90, dtype=torch.float32)
+        mock_pipeline.return_value = reference
+        gaze_predictor = GazePredictor(filepath="mock_weights.pth")
+        # A fixed frame with very different color channels.
+        generator = np.random.default_rng(0)
+        frame = generator.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(frame, (9, 9), 0)
+        frame[..., 0] //= 4
+
+        expected = reference.step(frame)
+        pitch, yaw = gaze_predictor._predict_gaze([(frame, box)])
+
+        # Upsampling by OpenCV and PIL round differently, a BGR crop is off by 0.05.
+        np.testing.assert_allclose(pitch, expected.pitch, atol=2e-3)
+        np.testing.assert_allclose(yaw, expected.yaw, atol=2e-3)
+
     # def test_predict_gaze_vector(self, MockPipeline):
     #     """
     #     Test the predict_gaze_vector method with a mocked Pipeline.step.
@@ -0,0 +1,93 @@
+import importlib.util
+import unittest
+
+import numpy as np
+import torch
+from torch import nn
+
+from src.backend.inference_backends import (
+    BackendValidationError,
+    CompiledBackend,
+    EagerBackend,
+    OnnxBackend,
+    create_inference_backend,
+    logits_to_radians,
+    validate_backend,
+)
+
+
+class TinyGazeNet(nn.Module):
+    """A small network with the L2CS outputs: pitch and yaw logits over 90 bins."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.features = nn.Sequential(
+            nn.Conv2d(3, 8, 3, stride=4), nn.ReLU(), nn.AdaptiveAvgPool2d(1)
+        )
+        self.fc_pitch_gaze = nn.Linear(8, 90)
+        self.fc_yaw_gaze = nn.Linear(8, 90)
+
+    def forward(self, x):
+        features = torch.flatten(self.features(x), 1)
+        return self.fc_pitch_gaze(features), self.fc_yaw_gaze(features)
+
+
+class TestInferenceBackends(unittest.TestCase):
+    def setUp(self):
+        self.model = TinyGazeNet()
+        self.images = torch.randn(
+            4, 3, 64, 64, generator=torch.Generator().manual_seed(1)
+        )
+        self.reference = EagerBackend(self.model)
+
+    def test_logits_to_radians(self):
+        # All the mass on bin 45 is 45 * 4 - 180 = 0 degrees.
+        logits = torch.full((1, 90), -1e4)
+        logits[0, 45] = 0
+
+        np.testing.assert_allclose(logits_to_radians(logits), [0.0], atol=1e-6)
+
+    def test_quantized_backend_is_within_tolerance(self):
+        backend = create_inference_backend("quantized", self.model)
+
+        error = validate_backend(backend, self.reference, self.images)
+
+        self.assertLess(error, 2.0)
+        # The original model is left untouched.
+        self.assertIsInstance(self.model.fc_yaw_gaze, nn.Linear)
+
+    def test_compiled_backend_matches_eager(self):
+        backend = CompiledBackend(self.model, compile_backend="eager")
+
+        self.assertLess(validate_backend(backend, self.reference, self.images), 0.1)
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("onnx") and importlib.util.find_spec("onnxruntime"),
+        "onnx and onnxruntime are not installed",
+    )
+    def test_onnx_backend_matches_eager_for_any_batch_size(self):
+        backend = OnnxBackend(self.model, input_size=64)
+
+        self.assertLess(validate_backend(backend, self.reference, self.images), 0.1)
+        self.assertEqual(backend.predict_gaze(self.images[:1])[0].shape, (1,))
+
+    def test_validation_fails_beyond_tolerance(self):
+        other = EagerBackend(TinyGazeNet().apply(self._perturb))
+
+        with self.assertRaises(BackendValidationError):
+            validate_backend(other, self.reference, self.images, tolerance=0.1)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_inference_backend("tensorrt", self.model)
+
+    @staticmethod
+    def _perturb(module):
+        if isinstance(module, nn.Linear):
+            with torch.no_grad():
+                module.weight.mul_(-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import unittest
+
+import numpy as np
+
+from src.backend.inference_pool import InferencePool
+
+# Frames filled with this value crash the worker processing them.
+CRASH_VALUE = 13
+
+
+class FakePredictor:
+    """Reports the mean and size of each frame, and the worker that processed it."""
+
+    def predict_gaze_vectors(self, images):
+        if any(image is not None and image.size == 0 for image in images):
+            raise ValueError("Empty frame.")
+        if any(image is not None and image.mean() == CRASH_VALUE for image in images):
+            os._exit(1)
+        return [
+            (None, None, None, None)
+            if image is None
+            else (float(image.mean()), float(image.size), float(os.getpid()), 0.0)
+            for image in images
+        ]
+
+
+class FailingPredictor:
+    def __init__(self):
+        raise RuntimeError("No weights.")
+
+
+class TestInferencePool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = InferencePool(
+            FakePredictor, num_workers=2, slots_per_worker=2, slot_size=64 * 64 * 3
+        )
+        cls.pool.start(timeout=60)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_batches_are_split_across_workers_in_order(self):
+        frames = [np.full((32, 32, 3), i, dtype=np.uint8) for i in range(4)]
+        frames[2] = None
+
+        results = self.pool.predict_batch(frames)
+
+        self.assertEqual([r[0] for r in results], [0.0, 1.0, None, 3.0])
+        pids = {r[2] for r in results if r[2] is not None}
+        self.assertEqual(len(pids), 2)
+        self.assertNotIn(float(os.getpid()), pids)
+
+    def test_frames_larger_than_a_slot_are_still_processed(self):
+        frame = np.full((128, 128, 3), 7, dtype=np.uint8)
+
+        self.assertEqual(self.pool.predict_batch([frame])[0][:2], (7.0, frame.size))
+
+    def test_predictor_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            self.pool.predict_batch([np.zeros((0, 3), dtype=np.uint8)])
+
+        # The worker is available again afterwards.
+        frames = [np.ones((8, 8, 3), dtype=np.uint8)] * 4
+        self.assertEqual(len(self.pool.predict_batch(frames)), 4)
+
+
+class TestInferencePoolCrashes(unittest.TestCase):
+    def test_pool_fails_once_every_worker_died(self):
+        failures = []
+        pool = InferencePool(FakePredictor, num_workers=2, on_failure=failures.append)
+        pool.start(timeout=60)
+        self.addCleanup(pool.close)
+        crash = np.full((8, 8, 3), CRASH_VALUE, dtype=np.uint8)
+        frame = np.ones((8, 8, 3), dtype=np.uint8)
+
+        with self.assertRaises(RuntimeError):
+            pool.predict_batch([crash])
+        # The other worker takes over.
+        self.assertEqual(pool.predict_batch([frame, frame])[0][0], 1.0)
+        self.assertEqual(failures, [])
+
+        with self.assertRaises(RuntimeError):
+            pool.predict_batch([crash])
+        # Without workers, batches fail instead of waiting for one forever.
+        with self.assertRaises(RuntimeError):
+            pool.predict_batch([frame])
+        self.assertEqual(len(failures), 1)
+
+
+class TestInferencePoolStartup(unittest.TestCase):
+    def test_worker_startup_failure(self):
+        pool = InferencePool(FailingPredictor, num_workers=1)
+
+        with self.assertRaises(RuntimeError):
+            pool.start(timeout=60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import unittest
+
+from src.backend.inference_scheduler import InferenceScheduler, QueueFullError
+
+
+class TestInferenceScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.batches = []
+        self.scheduler = InferenceScheduler(
+            self.predict_batch, max_batch_size=4, max_wait=0.05, max_queue_size=8
+        )
+        await self.scheduler.start()
+
+    async def asyncTearDown(self):
+        await self.scheduler.stop()
+
+    def predict_batch(self, frames):
+        self.batches.append(list(frames))
+        return [2 * frame for frame in frames]
+
+    async def test_concurrent_requests_are_batched(self):
+        results = await asyncio.gather(*(self.scheduler.submit(i) for i in range(6)))
+
+        # Results come back in order, from batches no larger than max_batch_size.
+        self.assertEqual([result for result, _ in results], [0, 2, 4, 6, 8, 10])
+        self.assertEqual(self.batches, [[0, 1, 2, 3], [4, 5]])
+        _, timing = results[0]
+        self.assertEqual(timing.batch_size, 4)
+        self.assertGreaterEqual(timing.queue_time, 0)
+        self.assertGreaterEqual(timing.compute_time, 0)
+        self.assertIn("queue;dur=", timing.server_timing())
+
+    async def test_errors_are_propagated_to_the_batch(self):
+        def fail(frames):
+            raise ValueError("boom")
+
+        self.scheduler.predict_batch = fail
+        with self.assertRaises(ValueError):
+            await self.scheduler.submit(1)
+
+        # The worker survives a failing batch.
+        self.scheduler.predict_batch = self.predict_batch
+        result, _ = await self.scheduler.submit(1)
+        self.assertEqual(result, 2)
+
+    async def test_full_queue_is_rejected(self):
+        release = threading.Event()
+
+        def blocking_predict(frames):
+            release.wait()
+            return frames
+
+        self.scheduler.predict_batch = blocking_predict
+        # One batch in flight, then enough frames to fill the queue.
+        pending = [asyncio.ensure_future(self.scheduler.submit(0))]
+        await asyncio.sleep(0.1)
+        pending += [
+            asyncio.ensure_future(self.scheduler.submit(i)) for i in range(1, 9)
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(self.scheduler.queue_depth, 8)
+        with self.assertRaises(QueueFullError):
+            await self.scheduler.submit(99)
+
+        release.set()
+        results = await asyncio.gather(*pending)
+        self.assertEqual([result for result, _ in results], list(range(9)))
+
+
+if __name__ == "__main__":
+    unittest.main()
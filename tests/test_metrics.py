@@ -0,0 +1,60 @@
+import unittest
+
+from src.backend.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.registry.enable()
+
+    def test_disabled_metrics_record_nothing(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.")
+        counter = registry.counter("events_total", "Events.")
+
+        with histogram.time():
+            pass
+        counter.inc()
+
+        self.assertEqual(histogram.count(), 0)
+        self.assertEqual(counter.value(), 0)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram(
+            "latency_seconds", "Latency.", labelnames=("stage",), buckets=(0.1, 1.0)
+        )
+        for value in (0.05, 0.5, 0.5, 2.0):
+            histogram.observe(value, stage="detect")
+
+        lines = self.registry.render().splitlines()
+
+        self.assertIn("# TYPE latency_seconds histogram", lines)
+        self.assertIn('latency_seconds_bucket{stage="detect",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{stage="detect",le="1.0"} 3', lines)
+        self.assertIn('latency_seconds_bucket{stage="detect",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_sum{stage="detect"} 3.05', lines)
+        self.assertIn('latency_seconds_count{stage="detect"} 4', lines)
+
+    def test_counters_gauges_and_collectors(self):
+        counter = self.registry.counter("frames_total", "Frames.")
+        gauge = self.registry.gauge("queue_depth", "Queue depth.")
+        self.registry.add_collector("queue", lambda: gauge.set(3))
+        counter.inc()
+        counter.inc(2)
+
+        lines = self.registry.render().splitlines()
+
+        self.assertIn("frames_total 3", lines)
+        self.assertIn("queue_depth 3", lines)
+
+    def test_label_validation(self):
+        counter = self.registry.counter("events_total", "Events.", ("kind",))
+        with self.assertRaises(ValueError):
+            counter.inc(other="x")
+        with self.assertRaises(ValueError):
+            self.registry.counter("events_total", "Events.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+import torch
+from torch import nn
+
+from src.backend import model_weights
+from src.backend.model_weights import convert_weights, is_mappable, mmap_loading
+
+
+class TestModelWeights(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.model = nn.Linear(4, 3)
+        self.source = os.path.join(self.tmpdir.name, "weights.pkl")
+        self.destination = os.path.join(self.tmpdir.name, "weights.pt")
+
+    def test_convert_legacy_state_dict(self):
+        torch.save(
+            self.model.state_dict(),
+            self.source,
+            _use_new_zipfile_serialization=False,
+        )
+        self.assertFalse(is_mappable(self.source))
+
+        convert_weights(self.source, self.destination)
+
+        self.assertTrue(is_mappable(self.destination))
+        state_dict = torch.load(self.destination, mmap=True, weights_only=True)
+        self.assertEqual(state_dict.keys(), self.model.state_dict().keys())
+        torch.testing.assert_close(state_dict["weight"], self.model.weight.detach())
+
+    def test_convert_pickled_model(self):
+        torch.save(self.model, self.source)
+
+        convert_weights(self.source, self.destination)
+
+        state_dict = torch.load(self.destination, weights_only=True)
+        torch.testing.assert_close(state_dict["bias"], self.model.bias.detach())
+
+    @unittest.skipIf(
+        model_weights.serialization_config is None,
+        "torch.load cannot be configured to mmap",
+    )
+    def test_mmap_loading_only_applies_to_mappable_files(self):
+        config = model_weights.serialization_config.load
+        torch.save(self.model.state_dict(), self.destination)
+        torch.save(
+            self.model.state_dict(),
+            self.source,
+            _use_new_zipfile_serialization=False,
+        )
+
+        with mmap_loading(self.destination):
+            self.assertTrue(config.mmap)
+            torch.load(self.destination, weights_only=True)
+        self.assertFalse(config.mmap)
+        with mmap_loading(self.source):
+            self.assertFalse(config.mmap)
+            torch.load(self.source, weights_only=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+from src.backend.motion_gate import MotionGate, MotionGates
+
+
+class TestMotionGate(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 256, (360, 640, 3), dtype=np.uint8)
+        self.gaze_vector = (0.1, 0.2, 320.0, 180.0)
+
+    def test_skips_identical_frames(self):
+        gate = MotionGate(threshold=4.0)
+        cached, signature = gate.lookup(self.frame)
+        self.assertIsNone(cached)
+        gate.update(signature, self.gaze_vector)
+
+        cached, _ = gate.lookup(self.frame.copy())
+
+        self.assertEqual(cached, self.gaze_vector)
+        self.assertEqual(gate.skipped, 1)
+        self.assertEqual(gate.skip_rate, 0.5)
+
+    def test_local_change_is_inferred(self):
+        gate = MotionGate(threshold=4.0)
+        gate.update(gate.lookup(self.frame)[1], self.gaze_vector)
+
+        # A small bright patch, e.g. a moving pupil, changes a few thumbnail cells.
+        moved = self.frame.copy()
+        moved[100:120, 200:220] = 255
+        cached, _ = gate.lookup(moved)
+
+        self.assertIsNone(cached)
+
+    def test_max_skips_forces_inference(self):
+        gate = MotionGate(threshold=4.0, max_skips=2)
+        gate.update(gate.lookup(self.frame)[1], self.gaze_vector)
+
+        results = [gate.lookup(self.frame)[0] for _ in range(3)]
+
+        self.assertEqual(results, [self.gaze_vector, self.gaze_vector, None])
+
+    def test_frames_without_face_are_not_cached(self):
+        gate = MotionGate(threshold=4.0)
+        gate.update(gate.lookup(self.frame)[1], (None, None, None, None))
+
+        self.assertIsNone(gate.lookup(self.frame)[0])
+
+    def test_missing_frame_is_inferred(self):
+        gate = MotionGate()
+
+        self.assertEqual(gate.lookup(None), (None, None))
+
+
+class TestMotionGates(unittest.TestCase):
+    def test_stats_include_removed_and_evicted_gates(self):
+        frame = np.zeros((36, 64), dtype=np.uint8)
+        gates = MotionGates(capacity=1, threshold=1.0)
+        for key in ("a", "b"):
+            gate = gates.get(key)
+            gate.update(gate.lookup(frame)[1], (0.0, 0.0, 0.0, 0.0))
+            gate.lookup(frame)
+        gates.remove("b")
+
+        stats = gates.stats()
+
+        self.assertEqual(stats["gates"], 0)
+        self.assertEqual((stats["frames"], stats["skipped"]), (4, 2))
+        self.assertEqual(stats["skip_rate"], 0.5)
+
+    def test_get_returns_the_same_gate(self):
+        gates = MotionGates()
+
+        self.assertIs(gates.get("a"), gates.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
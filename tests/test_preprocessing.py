@@ -0,0 +1,89 @@
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+import torch
+from l2cs import Pipeline
+from l2cs.utils import prep_input_numpy
+
+from src.backend.preprocessing import FacePreprocessor
+
+
+class TestFacePreprocessor(unittest.TestCase):
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        self.image = cv2.GaussianBlur(
+            generator.integers(0, 256, (300, 400, 3), dtype=np.uint8), (5, 5), 0
+        )
+        # The second box sticks out of the image.
+        self.boxes = [(10, 20, 150, 180), (-5, -3, 100, 90), (200, 100, 390, 290)]
+        self.preprocessor = FacePreprocessor(max_batch_size=4)
+
+    def crop_all(self, image):
+        for index, box in enumerate(self.boxes):
+            self.preprocessor.crop(index, image, box)
+
+    def pipeline_crops(self, image):
+        """Crops that L2CS Pipeline.step feeds to its gaze network."""
+        pipeline = Pipeline.__new__(Pipeline)
+        pipeline.include_detector = True
+        pipeline.confidence_threshold = 0.5
+        pipeline.detector = MagicMock(
+            return_value=[(np.array(box), np.zeros((5, 2)), 1.0) for box in self.boxes]
+        )
+        pipeline.predict_gaze = MagicMock(return_value=(np.zeros(3), np.zeros(3)))
+        pipeline.step(image)
+        return pipeline.predict_gaze.call_args.args[0]
+
+    def test_matches_l2cs_preprocessing(self):
+        self.crop_all(self.image)
+        with torch.inference_mode():
+            images = self.preprocessor.prepare(len(self.boxes))
+
+        crops = self.pipeline_crops(self.image)
+        np.testing.assert_array_equal(self.preprocessor.crops[:3], crops)
+        self.assertEqual(images.shape, (3, 3, 448, 448))
+        # Upsampling by OpenCV and PIL round differently, by at most one level.
+        reference = prep_input_numpy(crops, "cpu")
+        self.assertLess(float((images - reference).abs().max()), 1.01 / 255 / 0.224)
+
+    def test_grayscale_crops_are_converted_to_color(self):
+        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        self.crop_all(gray[..., None])
+        gray_crops = self.preprocessor.crops[:3].copy()
+
+        np.testing.assert_array_equal(
+            gray_crops, self.pipeline_crops(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+        )
+
+    def test_steady_state_reuses_buffers(self):
+        def step():
+            self.crop_all(self.image)
+            with torch.inference_mode():
+                return self.preprocessor.prepare(len(self.boxes))
+
+        first = step()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in range(10):
+                images = step()
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # A single 224x224 crop is 150 KB, an upsampled one 600 KB.
+        self.assertLess(peak - before, 16 * 1024)
+        self.assertLess(after - before, 4 * 1024)
+        self.assertEqual(images.data_ptr(), first.data_ptr())
+
+    def test_rejects_empty_buffers(self):
+        with self.assertRaises(ValueError):
+            FacePreprocessor(max_batch_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+import torch
+
+from src.backend.profiling import RequestProfiler
+
+
+def workload(size):
+    return torch.ones(size, size).matmul(torch.ones(size, size)).sum().item()
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmpdir.name, "profiles")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_samples_one_in_n(self):
+        profiler = RequestProfiler(self.directory, sample_every=3)
+        self.assertEqual(
+            [profiler.sample() for _ in range(6)], [False, False, True] * 2
+        )
+
+        profiler.configure(sample_every=0)
+        self.assertFalse(any(profiler.sample() for _ in range(6)))
+
+    def test_writes_traces(self):
+        profiler = RequestProfiler(self.directory, sample_every=1, mode="both")
+
+        result, stem = profiler.profile_call("predict", workload, 8)
+
+        self.assertEqual(result, 512.0)
+        self.assertEqual(profiler.traces(), [f"{stem}.pstats", f"{stem}.trace.json"])
+        stats = pstats.Stats(profiler.trace_path(f"{stem}.pstats"))
+        self.assertTrue(any(key[2] == "workload" for key in stats.stats))
+        with self.assertRaises(KeyError):
+            profiler.trace_path("../calibration.db")
+
+    def test_keeps_most_recent_traces(self):
+        profiler = RequestProfiler(self.directory, sample_every=1, max_traces=2)
+
+        stems = [profiler.profile_call("predict", workload, 2)[1] for _ in range(4)]
+
+        self.assertEqual(profiler.traces(), [f"{stem}.pstats" for stem in stems[2:]])
+
+    def test_invalid_settings(self):
+        profiler = RequestProfiler(self.directory)
+        with self.assertRaises(ValueError):
+            profiler.configure(mode="perf")
+        with self.assertRaises(ValueError):
+            profiler.configure(sample_every=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import unittest
+import zipfile
+
+import cv2
+import numpy as np
+
+from src.app.decoding import decode_image, decode_raw_frame, extract_archive
+from src.app.streaming import FrameMailbox, StreamItem
+
+
+class TestFrameMailbox(unittest.IsolatedAsyncioTestCase):
+    async def test_latest_frame_wins(self):
+        mailbox = FrameMailbox()
+        for sequence in range(1, 4):
+            mailbox.put_latest(StreamItem(action="predict", sequence=sequence))
+
+        item = await mailbox.get()
+        self.assertEqual(item.sequence, 3)
+        self.assertEqual(mailbox.dropped, 2)
+
+    async def test_ordered_items_are_never_dropped(self):
+        mailbox = FrameMailbox()
+        mailbox.put_latest(StreamItem(action="predict", sequence=1))
+        mailbox.put(StreamItem(action="calibrate", sequence=2))
+        mailbox.put(StreamItem(action="reset"))
+        mailbox.put_latest(StreamItem(action="predict", sequence=3))
+
+        actions = [(await mailbox.get()).action for _ in range(3)]
+        self.assertEqual(actions, ["calibrate", "reset", "predict"])
+        self.assertEqual(mailbox.dropped, 1)
+
+
+class TestDecodeRawFrame(unittest.TestCase):
+    def test_wraps_raw_bytes_without_copy(self):
+        data = bytes(range(24))
+        frame = decode_raw_frame(data, width=4, height=2, frame_format="BGR")
+
+        self.assertEqual(frame.shape, (2, 4, 3))
+        self.assertFalse(frame.flags.owndata)
+        np.testing.assert_array_equal(frame[1, 0], [12, 13, 14])
+
+    def test_rejects_mismatched_size(self):
+        with self.assertRaises(ValueError):
+            decode_raw_frame(bytes(10), width=4, height=2, frame_format="gray")
+        with self.assertRaises(ValueError):
+            decode_raw_frame(bytes(8), width=4, height=2, frame_format="rgba")
+
+
+class TestDecodeImage(unittest.TestCase):
+    def test_reduced_resolution_decode(self):
+        _, encoded = cv2.imencode(".jpg", np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+        self.assertEqual(decode_image(encoded.tobytes()).shape, (1080, 1920, 3))
+        self.assertEqual(decode_image(encoded.tobytes(), 2).shape, (540, 960, 3))
+        self.assertEqual(decode_image(encoded.tobytes(), 4).shape, (270, 480, 3))
+        with self.assertRaises(ValueError):
+            decode_image(encoded.tobytes(), 3)
+
+
+class TestExtractArchive(unittest.TestCase):
+    def archive(self, files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, content in files:
+                archive.writestr(name, content)
+        return buffer.getvalue()
+
+    def test_reads_files_in_order(self):
+        archive = self.archive(
+            [("points/", b""), ("points/x_1_y_2.jpg", b"a"), ("x_3_y_4.jpg", b"b")]
+        )
+
+        self.assertEqual(
+            extract_archive(archive),
+            [("points/x_1_y_2.jpg", b"a"), ("x_3_y_4.jpg", b"b")],
+        )
+
+    def test_limits(self):
+        archive = self.archive([("a.jpg", bytes(100)), ("b.jpg", bytes(100))])
+
+        with self.assertRaises(ValueError):
+            extract_archive(archive, max_entries=1)
+        with self.assertRaises(ValueError):
+            extract_archive(archive, max_size=150)
+        with self.assertRaises(ValueError):
+            extract_archive(b"not a zip")
+
+
+if __name__ == "__main__":
+    unittest.main()
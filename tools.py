@@ -4,6 +4,7 @@ import cv2
 import torch
 from l2cs import Pipeline, render
 
+from src.app.batch_processing import calibrate_from_directory
 from src.backend.calibration_agents import InterpolationAgent
 from src.backend.gaze_predictor import GazePredictor
 
@@ -40,23 +41,7 @@ def camera_capture(cap, filepath):
 
 
 def update_calibration_map(ca: InterpolationAgent, net: GazePredictor, filepath):
-    image_names = sorted(
-        [
-            os.path.join(filepath, f)
-            for f in os.listdir(filepath)
-            if f.endswith((".jpg"))
-        ]
-    )
-
-    for image in image_names:
-        image_name = image.split("/")[-1]
-        x, y = image_name.split("_")[1], image_name.split("_")[3].split(".")[0]
-        x, y = int(x), int(y)
-
-        frame = cv2.imread(image)
-        _, _, theta, phi = net.predict_gaze_vector(frame)
-
-        ca.calibration_step(x, y, theta, phi)
+    calibrate_from_directory(ca, net, filepath)
 
 
 def infer_point_of_regard(cap, ca: InterpolationAgent, net: GazePredictor):
@@ -77,8 +62,8 @@ def infer_point_of_regard(cap, ca: InterpolationAgent, net: GazePredictor):
             break
         elif key == ord("c"):
             # Capture the picture
-            _, _, theta, phi = net.predict_gaze_vector(frame)
-            prediction = ca.calculate_point_of_regard(theta, phi)
+            head_x, head_y, theta, phi = net.predict_gaze_vector(frame)
+            prediction = ca.calculate_point_of_regard(head_x, head_y, theta, phi)
             print(prediction)
 
     # Release the camera and close all OpenCV windows